@@ -0,0 +1,4 @@
+from backend.app.asgi import create_asgi_app
+
+# Async serving mode: uvicorn asgi:app (the WSGI entry point stays main:app)
+app = create_asgi_app()
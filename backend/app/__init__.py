@@ -2,8 +2,10 @@ from flask import Flask, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import text
 from .utils.config import settings
+from .services.replicas import RoutingSession, replicas
 
-db = SQLAlchemy()
+# Sessions bind to the request's read replica under @replica_read (services/replicas.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 def create_app():
     app = Flask(__name__)
@@ -11,30 +13,69 @@ def create_app():
     # Load database URL from environment/.env via pydantic Settings
     app.config['SQLALCHEMY_DATABASE_URI'] = settings.DATABASE_URL
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    # Improve resilience to dropped connections
-    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'pool_pre_ping': True,
-    }
+    # Pool sizing, pre-ping and fail-fast checkout timeout (services/database.py)
+    from .services import database
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database.engine_options()
     
     db.init_app(app)
+    # Statement timeouts, 503/504 on pool exhaustion or cancelled queries
+    database.init_app(app, db)
+    # Per-route latency/phase histograms, served at /metrics
+    from .services import metrics
+    metrics.init_app(app, db)
+    # Opt-in slow-query ring buffer with sampled EXPLAIN plans (SLOW_QUERY_MS)
+    from .services.slow_queries import slow_queries
+    slow_queries.init_app(app, db)
+    # Optional read replicas for history/export/aggregation views (DATABASE_REPLICA_URLS)
+    replicas.init_app(app)
+
+    # In-memory registry of sensXX tables (loaded lazily on first use)
+    from .services.catalog import catalog
+    catalog.init_app(app)
+
+    # 1m/1h/1d aggregate tiers used by the downsample path
+    from .services.rollups import rollups
+    rollups.init_app(app)
+
+    # Valve open-time limit violations from the map manifests (/api/events)
+    from .services.events import events
+    events.init_app(app)
+
+    # Maintenance commands (flask --app main:app <group> <command>)
+    from .cli import register_cli
+    register_cli(app)
     
     # Import and register the API blueprint
     from .routes.api import api_bp
     app.register_blueprint(api_bp, url_prefix='/api')
+
+    # Server-Sent Events push of new rows (/api/stream)
+    from .sockets.realtime import realtime_bp, hub
+    hub.init_app(app)
+    app.register_blueprint(realtime_bp, url_prefix='/api')
     
     # Define a default route for the homepage
     @app.route('/')
     def home():
         return "Welcome to the SCADA API!"
     
-    # Health endpoint (checks DB if available)
+    # Health endpoint (checks DB if available, reports sensor table index health)
+    from .services import indexes
+
     @app.route('/health')
     def health():
         try:
             with db.engine.connect() as conn:
                 conn.execute(text('SELECT 1'))
-            return jsonify({"status": "ok", "db": "up"}), 200
         except Exception as ex:
             return jsonify({"status": "degraded", "db": "down", "error": str(ex)}), 503
+        try:
+            index_health = indexes.summary(catalog.tables())
+        except Exception as ex:
+            index_health = {"error": str(ex)}
+        body = {"status": "ok", "db": "up", "indexes": index_health, **database.health(db.engine)}
+        if replicas.enabled:
+            body["replicas"] = replicas.status()
+        return jsonify(body), 200
 
     return app
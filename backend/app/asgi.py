@@ -0,0 +1,472 @@
+"""Optional ASGI serving mode for the read-heavy API.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000     (or BACKEND_SERVER=asgi npm run start:back)
+
+These endpoints run natively on async SQLAlchemy engines backed by asyncpg,
+so a slow history query parks a coroutine instead of pinning a worker:
+
+    GET  /api/sensors
+    GET  /api/sensor-data/range
+    GET  /api/sensor-data/snapshot
+    GET  /api/sensor-data/newest
+    GET  /api/sensor-data/by-table   (every mode: raw, compact, binary, buckets, lttb/minmax/m4)
+    GET  /api/sensor-data/pivot
+    GET  /api/sensor-data/gaps
+    POST /api/sensor-data/batch
+    GET  /api/sensor-data/recent?format=...    and /filtered?format=... (NDJSON/CSV export)
+    GET  /api/stream                 (Server-Sent Events)
+
+Request parsing and SQL are shared with the Flask routes (services/queries.py
+and friends) and run on the async connection through `run_sync`; rows that
+are folded or reshaped in NumPy (shape-preserving downsampling, pivots) are
+streamed from a server-side cursor and handed to a worker thread chunk by
+chunk, so the event loop never runs the reducers. by-table, pivot and gaps
+responses go through the same response cache as the Flask views
+(services/cache.py): closed windows are served from it as immutable and
+conditional requests are answered with 304. With read replicas configured,
+the routes the Flask app runs under @replica_read pick a healthy replica the
+same way, on an async engine of their own. /api/stream subscribes to the
+same pollers as the Flask route, but a client waits on an asyncio queue
+instead of a thread.
+
+Every other route (the rest of `api_bp`, /health, /metrics, ...) is served by
+the Flask app behind a WSGI bridge of `ASGI_WSGI_THREADS` threads, so both
+modes expose the same endpoints. The async pools use the same DB_POOL_*
+settings and DB_STATEMENT_TIMEOUT_MS as the Flask one. Native requests are
+not counted in /metrics or Server-Timing.
+
+Requires the packages in backend/requirements-asgi.txt.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from backend.app import create_app
+from backend.app.models.sensor_data import SensorData
+from backend.app.services import cache, columnar, compact, export, guard, pivot
+from backend.app.services.catalog import catalog, SENSOR_TABLE_RE
+from backend.app.services.database import is_statement_timeout
+from backend.app.services.downsampling import (
+    CHUNK_ROWS, SeriesReducer, chunk_arrays, series_columns, series_rows, window_bounds, window_sql,
+)
+from backend.app.services.latest import latest_values
+from backend.app.services.queries import (
+    ByTableArgs, FilteredArgs, GapsArgs, PivotArgs, batch_specs, bucket_columnar, bucket_rows, columns_meta,
+    export_select, gap_report, latest_dicts, newest_rows, page_payload, raw_columnar, raw_columns, spec_args,
+)
+from backend.app.services.replicas import replicas
+from backend.app.sockets import realtime
+from backend.app.utils.config import settings
+
+log = logging.getLogger(__name__)
+
+
+def async_database_url(url: str):
+    return make_url(url).set(drivername='postgresql+asyncpg')
+
+
+def create_async_db_engine(url: str):
+    timeout_ms = int(settings.DB_STATEMENT_TIMEOUT_MS or 0)
+    connect_args = {'server_settings': {'statement_timeout': str(timeout_ms)}} if timeout_ms > 0 else {}
+    return create_async_engine(
+        async_database_url(url),
+        pool_pre_ping=True,
+        pool_size=max(1, int(settings.DB_POOL_SIZE)),
+        max_overflow=max(0, int(settings.DB_MAX_OVERFLOW)),
+        pool_timeout=max(1, int(settings.DB_POOL_TIMEOUT)),
+        pool_recycle=int(settings.DB_POOL_RECYCLE),
+        connect_args=connect_args,
+    )
+
+
+def _media(request) -> str:
+    """Binary media type negotiated from the Accept header, None for JSON."""
+    return columnar.negotiate(SimpleNamespace(
+        accept_mimetypes=parse_accept_header(request.headers.get('accept'), MIMEAccept)
+    ))
+
+
+def _compact(payload: dict, **headers) -> Response:
+    return Response(compact.dumps(payload), media_type='application/json', headers=headers or None)
+
+
+def _error(message: str, status: int, **headers) -> JSONResponse:
+    return JSONResponse({'error': message}, status_code=status, headers=headers or None)
+
+
+async def _json(payload, compact_json: bool = False, **headers) -> Response:
+    """JSON (or compact JSON) response, encoded in a worker thread."""
+    if compact_json:
+        body = await run_in_threadpool(compact.dumps, payload)
+        return Response(body, media_type='application/json', headers=headers or None)
+    return await run_in_threadpool(lambda: JSONResponse(payload, headers=headers or None))
+
+
+def _fold(reducer: SeriesReducer, part):
+    reducer.add(*chunk_arrays(part))
+
+
+class AsyncAPI:
+    """ASGI app: native async handlers for the read paths, Flask for the rest."""
+
+    def __init__(self, flask_app=None, engine=None):
+        self.flask_app = flask_app or create_app()
+        self.engine = engine or create_async_db_engine(settings.DATABASE_URL)
+        # Replica health is tracked by the Flask app's checker; failures here take a replica out too
+        self.replica_engines = {}
+        for replica in replicas.replicas:
+            replica_engine = create_async_db_engine(replica.url)
+            replicas.watch(replica, replica_engine.sync_engine)
+            self.replica_engines[replica.name] = replica_engine
+        # Concurrent batch specs across requests, like the Flask app's batch thread pool
+        self.batch_slots = asyncio.Semaphore(max(1, int(settings.BATCH_MAX_WORKERS)))
+        self.wsgi = WSGIMiddleware(self.flask_app, workers=max(1, int(settings.ASGI_WSGI_THREADS)))
+        self.routes = {
+            ('GET', '/api/sensors'): self.sensors,
+            ('GET', '/api/sensor-data/range'): self.sensor_range,
+            ('GET', '/api/sensor-data/snapshot'): self.snapshot,
+            ('GET', '/api/sensor-data/newest'): self.newest,
+            ('GET', '/api/sensor-data/by-table'): self.by_table,
+            ('GET', '/api/sensor-data/pivot'): self.pivot,
+            ('GET', '/api/sensor-data/gaps'): self.gaps,
+            ('POST', '/api/sensor-data/batch'): self.batch,
+            ('GET', '/api/sensor-data/recent'): self.recent,
+            ('GET', '/api/sensor-data/filtered'): self.filtered,
+            ('GET', '/api/stream'): self.stream,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] == 'http':
+            handler = self.routes.get((scope['method'], scope['path']))
+            if handler is not None:
+                response = await self._run(handler, Request(scope, receive))
+                if response is not None:
+                    await response(scope, receive, send)
+                    return
+        await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self._in_app(catalog.ensure_loaded)
+                except Exception:
+                    log.exception("Sensor catalog could not be loaded at startup")
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                for replica_engine in self.replica_engines.values():
+                    await replica_engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _run(self, handler, request):
+        try:
+            return await handler(request)
+        except exc.TimeoutError:
+            return _error('Database is busy, retry shortly', 503, **{'Retry-After': '1'})
+        except exc.DBAPIError as ex:
+            if is_statement_timeout(ex):
+                return _error('Query took too long; narrow the time window or use downsample', 504)
+            raise
+
+    def _in_app(self, fn, *args):
+        """Run sync code that needs the Flask app context (catalog, caches) off the event loop."""
+
+        def call():
+            with self.flask_app.app_context():
+                return fn(*args)
+
+        return run_in_threadpool(call)
+
+    def _read_engine(self):
+        """Engine for a heavy read: a healthy replica's when configured (as @replica_read), else the primary's."""
+        replica = replicas.pick() if replicas.enabled else None
+        return self.replica_engines[replica.name] if replica is not None else self.engine
+
+    async def _cached(self, request, media, build):
+        """Serve `build()` through the response cache, as @cached_response does for the Flask views."""
+        window = await self._in_app(cache.window, request.url.path, request.query_params.multi_items(), media)
+        if window is None:
+            return await build()
+        if_none_match = request.headers.get('if-none-match')
+        if_modified_since = request.headers.get('if-modified-since')
+
+        def finish(resp, etag):
+            resp.headers.update(window.headers(etag))
+            if cache.not_modified(window, etag, if_none_match, if_modified_since):
+                return Response(status_code=304, headers=window.headers(etag))
+            return resp
+
+        entry = window.lookup()
+        if entry is not None:
+            return finish(Response(entry.body, status_code=entry.status, headers=entry.headers), entry.etag)
+        etag = window.static_etag
+        # Revalidation against a tag we can compute without running the query
+        if etag is not None and cache.not_modified(window, etag, if_none_match, None):
+            return Response(status_code=304, headers=window.headers(etag))
+
+        resp = await build()
+        if resp.status_code != 200 or isinstance(resp, StreamingResponse):
+            return resp
+        return finish(resp, window.store(resp.body, resp.status_code, resp.headers))
+
+    async def _downsample(self, conn, args: ByTableArgs):
+        """Shape-preserving reduction of `args`' window; chunks are folded in worker threads as they arrive."""
+        t0, t1 = window_bounds(args.start, args.end)
+        reducer = SeriesReducer(t0, t1, args.target_points, args.algorithm)
+        result = await conn.stream(window_sql(args.sensor), {'start': args.start, 'end': args.end})
+        async for part in result.partitions(CHUNK_ROWS):
+            await run_in_threadpool(_fold, reducer, part)
+        return await run_in_threadpool(reducer.series)
+
+    # ---- handlers ----------------------------------------------------------
+    # Returning None hands the request to the Flask app.
+
+    async def sensors(self, request):
+        return JSONResponse(await self._in_app(catalog.sensors))
+
+    async def sensor_range(self, request):
+        sensor = request.query_params.get('sensor')
+        if not sensor or not SENSOR_TABLE_RE.fullmatch(sensor):
+            return _error("Invalid or missing 'sensor' (expected like sens00)", 400)
+        info = await self._in_app(catalog.get, sensor)
+        if info is None:
+            return _error(f"Unknown sensor table '{sensor}'", 404)
+        return JSONResponse(info.as_range())
+
+    async def snapshot(self, request):
+        tables = request.query_params.getlist('sensor') or None
+        if tables and not all(SENSOR_TABLE_RE.fullmatch(t) for t in tables):
+            return _error("Invalid 'sensor' (expected like sens00)", 400)
+        if compact.wanted(request.query_params):
+            rows = await self._in_app(latest_values.rows, tables)
+            return _compact({'generated_at': datetime.utcnow().isoformat(), **compact.snapshot_payload(rows)})
+        values = await self._in_app(latest_values.snapshot, tables)
+        return JSONResponse({'generated_at': datetime.utcnow().isoformat(), 'values': values})
+
+    async def newest(self, request):
+        table = SensorData.__tablename__
+        # Served from the last-value cache when sens00 is a discovered sensor table
+        if await self._in_app(catalog.get, table) is not None:
+            values = await self._in_app(latest_values.values, table)
+            rows = [(t, name, value, quality) for name, (t, value, quality) in sorted(values.items())]
+        else:
+            async with self.engine.connect() as conn:
+                rows = await conn.run_sync(newest_rows)
+        if compact.wanted(request.query_params):
+            return _compact(compact.latest_payload(rows))
+        return await _json(latest_dicts(rows))
+
+    async def by_table(self, request):
+        media = _media(request)
+        try:
+            args = await self._in_app(ByTableArgs.parse, request.query_params)
+        except ValueError as ex:
+            return _error(str(ex), 400)
+        # Warms the catalog entry the query helpers consult (numeric column, rollups)
+        if await self._in_app(catalog.get, args.sensor) is None:
+            return _error(f"Unknown sensor table '{args.sensor}'", 404)
+        return await self._cached(request, media, lambda: self._by_table(args, media))
+
+    async def _by_table(self, args: ByTableArgs, media):
+        async with self._read_engine().connect() as conn:
+            # Oversized raw reads become bucketed downsamples (services/guard.py)
+            try:
+                estimate = await conn.run_sync(guard.guard_by_table, args)
+            except guard.QueryTooLarge as ex:
+                return JSONResponse({'error': str(ex), 'estimated_rows': ex.estimate.rows}, status_code=400)
+            headers = dict(estimate.headers()) if estimate is not None else {}
+            if args.offset and not args.downsample:
+                # OFFSET costs O(offset); keep it working for small pages but steer clients to cursor
+                headers['Deprecation'] = 'true'
+
+            if args.downsample and args.algorithm:
+                series = await self._downsample(conn, args)
+                if media:
+                    body = await run_in_threadpool(lambda: columnar.encode(media, series_columns(series)))
+                    return Response(body, media_type=media, headers=headers or None)
+                if args.compact:
+                    return await _json(await run_in_threadpool(
+                        lambda: compact.columns_payload(series_columns(series))
+                    ), True, **headers)
+                return await _json(await run_in_threadpool(series_rows, series), **headers)
+
+            if media:
+                if args.downsample:
+                    rows = await conn.run_sync(
+                        bucket_rows, args.sensor, args.where_sql, args.params, args.start, args.end,
+                        args.target_points, args.use_rollups,
+                    )
+                    body = await run_in_threadpool(lambda: columnar.encode(media, bucket_columnar(rows)))
+                else:
+                    rows = await conn.run_sync(
+                        raw_columns, args.sensor, args.where_sql, args.params, args.order, args.limit, args.offset
+                    )
+                    meta = columns_meta(rows, args.order, args.limit, args.offset)
+                    body = await run_in_threadpool(lambda: columnar.encode(media, raw_columnar(rows), meta))
+                return Response(body, media_type=media, headers=headers or None)
+
+            payload = await conn.run_sync(page_payload, args)
+        return await _json(payload, args.compact, **headers)
+
+    async def pivot(self, request):
+        try:
+            args = PivotArgs.parse(request.query_params)
+        except ValueError as ex:
+            return _error(str(ex), 400)
+        if await self._in_app(catalog.get, args.sensor) is None:
+            return _error(f"Unknown sensor table '{args.sensor}'", 404)
+
+        async def build():
+            async with self._read_engine().connect() as conn:
+                rows = await conn.run_sync(
+                    pivot.pivot_rows, args.sensor, "WHERE mt_time >= :start AND mt_time <= :end",
+                    {"start": args.start, "end": args.end}, args.names,
+                )
+            payload = await run_in_threadpool(pivot.payload, rows, args.by, args.compact)
+            return await _json(payload, args.compact)
+
+        return await self._cached(request, _media(request), build)
+
+    async def gaps(self, request):
+        try:
+            args = GapsArgs.parse(request.query_params)
+        except ValueError as ex:
+            return _error(str(ex), 400)
+        for sensor in args.sensors:
+            if await self._in_app(catalog.get, sensor) is None:
+                return _error(f"Unknown sensor table '{sensor}'", 404)
+
+        async def build():
+            async with self._read_engine().connect() as conn:
+                report = await conn.run_sync(gap_report, args)
+            return await _json(report)
+
+        return await self._cached(request, _media(request), build)
+
+    async def batch(self, request):
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        try:
+            specs = batch_specs(body)
+        except ValueError as ex:
+            return _error(str(ex), 400)
+        engine = self._read_engine()
+
+        async def run(i, spec):
+            line = {'index': i, 'sensor': spec.get('sensor')}
+            try:
+                async with self.batch_slots:
+                    line['data'], estimate = await self._batch_spec(engine, spec)
+                if estimate is not None:
+                    line['query_guard'], line['estimated_rows'] = 'downsampled', estimate.rows
+            except Exception as ex:
+                line['error'] = str(ex)
+            return compact.dumps(line) + b'\n'
+
+        async def lines():
+            tasks = [asyncio.ensure_future(run(i, spec)) for i, spec in enumerate(specs)]
+            try:
+                for done in asyncio.as_completed(tasks):
+                    yield await done
+            finally:
+                # Client went away: don't run queries nobody will read
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(lines(), media_type='application/x-ndjson')
+
+    async def _batch_spec(self, engine, spec):
+        """One batch spec on `engine`: a JSON-ready payload and the query guard's estimate."""
+        args = await self._in_app(ByTableArgs.parse, spec_args(spec))
+        async with engine.connect() as conn:
+            # Same QUERY_MAX_ROWS guard as by-table; QueryTooLarge is reported as the spec's error
+            estimate = await conn.run_sync(guard.guard_by_table, args)
+            if args.downsample and args.algorithm:
+                series = await self._downsample(conn, args)
+                if args.compact:
+                    return await run_in_threadpool(lambda: compact.columns_payload(series_columns(series))), estimate
+                return await run_in_threadpool(series_rows, series), estimate
+            return await conn.run_sync(page_payload, args), estimate
+
+    async def recent(self, request):
+        fmt = request.query_params.get('format')
+        if not fmt:
+            return None
+        if fmt not in export.EXPORT_FORMATS:
+            return _error(f"Invalid format; use one of {', '.join(export.EXPORT_FORMATS)}", 400)
+        start = datetime.utcnow() - timedelta(days=1)
+        return self._export(self.engine, export_select(SensorData.mt_time >= start), fmt, 'sensor-data-recent')
+
+    async def filtered(self, request):
+        fmt = request.query_params.get('format')
+        if not fmt:
+            return None
+        try:
+            args = FilteredArgs.parse(request.query_params)
+        except ValueError as ex:
+            return _error(str(ex), 400)
+        if fmt not in export.EXPORT_FORMATS:
+            return _error(f"Invalid format; use one of {', '.join(export.EXPORT_FORMATS)}", 400)
+        return self._export(self._read_engine(), export_select(*args.filters), fmt, 'sensor-data')
+
+    def _export(self, engine, stmt, fmt: str, filename: str) -> StreamingResponse:
+        """Stream `stmt` as NDJSON/CSV from a server-side cursor (services/export.py)."""
+        header, encode = export.encoder(fmt)
+
+        async def body():
+            if header:
+                yield header
+            async with engine.connect() as conn:
+                result = await conn.stream(stmt)
+                async for part in result.partitions(export.FETCH_ROWS):
+                    yield await run_in_threadpool(encode, part)
+
+        return StreamingResponse(body(), media_type=export.MIMETYPES[fmt], headers=export.headers(fmt, filename))
+
+    async def stream(self, request):
+        tables = list(dict.fromkeys(request.query_params.getlist('sensor')))
+        error = await self._in_app(realtime.check_tables, tables)
+        if error is not None:
+            return _error(*error)
+        sub = realtime.hub.attach(realtime.AsyncSubscription(tables, asyncio.get_running_loop()))
+
+        async def events():
+            try:
+                yield 'retry: 3000\n\n'
+                while True:
+                    try:
+                        message = await asyncio.wait_for(sub.queue.get(), realtime._KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        yield ': keep-alive\n\n'
+                        continue
+                    yield realtime.event(message)
+                    if message is realtime._OVERFLOW:
+                        return
+            finally:
+                realtime.hub.unsubscribe(sub)
+
+        return StreamingResponse(events(), media_type='text/event-stream', headers=realtime.STREAM_HEADERS)
+
+
+def create_asgi_app() -> AsyncAPI:
+    return AsyncAPI()
@@ -0,0 +1,217 @@
+"""Maintenance commands, available as `flask --app main:app <group> <command>`."""
+
+import click
+from flask.cli import AppGroup
+
+from backend.app.services.catalog import catalog, SENSOR_TABLE_RE
+
+rollups_cli = AppGroup('rollups', help='Maintain 1m/1h/1d rollup tables.')
+sensors_cli = AppGroup('sensors', help='Maintain the sensXX tables themselves.')
+events_cli = AppGroup('events', help='Scan sensor tables for valve open-time limit violations.')
+bench_cli = AppGroup('bench', help='Seed synthetic data and benchmark the API.')
+
+
+def _tables(tables):
+    """Validate explicit table names, or default to every discovered table."""
+    if not tables:
+        return [info.table for info in catalog.tables()]
+    for t in tables:
+        if not SENSOR_TABLE_RE.fullmatch(t):
+            raise click.BadParameter(f"'{t}' does not match SENSOR_TABLE_PATTERN")
+    return list(tables)
+
+
+@rollups_cli.command('refresh')
+@click.argument('tables', nargs=-1)
+def rollups_refresh(tables):
+    """Incrementally refresh rollups (all discovered tables by default)."""
+    from backend.app.services.rollups import rollups
+
+    for t in _tables(tables):
+        click.echo(f"Refreshing rollups for {t}")
+        rollups.refresh_table(t)
+
+
+@rollups_cli.command('rebuild')
+@click.argument('tables', nargs=-1)
+def rollups_rebuild(tables):
+    """Recompute rollups from scratch, e.g. after back-filling history."""
+    from backend.app.services.rollups import rollups
+
+    for t in _tables(tables):
+        click.echo(f"Rebuilding rollups for {t}")
+        rollups.rebuild_table(t)
+
+
+@events_cli.command('refresh')
+@click.argument('tables', nargs=-1)
+def events_refresh(tables):
+    """Scan new rows past each table's watermark (all discovered tables by default)."""
+    from backend.app.services.events import events
+
+    for t in _tables(tables):
+        click.echo(f"{t}: {events.refresh_table(t)} events written")
+
+
+@events_cli.command('rebuild')
+@click.argument('tables', nargs=-1)
+def events_rebuild(tables):
+    """Drop stored events and rescan whole tables, e.g. after changing limits or back-filling."""
+    from backend.app.services.events import events
+
+    for t in _tables(tables):
+        click.echo(f"{t}: {events.rebuild_table(t)} events written")
+
+
+@sensors_cli.command('add-numeric')
+@click.argument('tables', nargs=-1)
+def sensors_add_numeric(tables):
+    """Add the generated mt_value_num column (rewrites each table under an exclusive lock)."""
+    from backend.app import db
+    from backend.app.services.numeric import add_numeric_column, NUMERIC_COLUMN
+
+    for t in _tables(tables):
+        with db.engine.begin() as conn:
+            added = add_numeric_column(conn, t)
+        click.echo(f"{t}: {'added' if added else 'already has'} {NUMERIC_COLUMN}")
+    catalog.refresh()
+
+
+@sensors_cli.command('indexes')
+@click.argument('tables', nargs=-1)
+@click.option('--create', is_flag=True, help='Build missing indexes (CREATE INDEX CONCURRENTLY).')
+@click.option('--brin', is_flag=True, help='Also want a BRIN index on mt_time.')
+def sensors_indexes(tables, create, brin):
+    """Report (and optionally create) missing mt_time / (mt_name, mt_time) indexes."""
+    from backend.app import db
+    from backend.app.services import indexes
+
+    catalog.refresh()
+    names = _tables(tables)
+    for t in names:
+        info = catalog.get(t)
+        if info is None:
+            click.echo(f"{t}: not found")
+            continue
+        todo = indexes.missing(info, brin=brin)
+        invalid = [i.name for i in info.indexes if not i.usable]
+        status = "ok" if not todo else "missing " + ", ".join(spec.key for spec in todo)
+        if invalid:
+            status += f" (invalid/partial: {', '.join(invalid)})"
+        click.echo(f"{t}: {status}")
+        if create:
+            for spec in todo:
+                click.echo(f"  creating {spec.index_name(t)}")
+                indexes.create_index(db.engine, t, spec)
+    if create:
+        catalog.refresh()
+
+
+@sensors_cli.command('ingest')
+@click.argument('files', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--table', help='Target table (required for CSV/text; filters the tables of a dump).')
+@click.option('--format', 'fmt', type=click.Choice(['auto', 'csv', 'text', 'dump']), default='auto', show_default=True)
+@click.option('--columns', default='mt_name,mt_time,mt_value,mt_quality', show_default=True,
+              help='Column order of headerless text files.')
+@click.option('--batch-rows', default=500_000, show_default=True, help='Rows per COPY batch (one transaction each).')
+@click.option('--create', is_flag=True, help='Create missing tables.')
+@click.option('--partition', type=click.Choice(['none', 'monthly']), default='none', show_default=True,
+              help='Create new tables range-partitioned by month.')
+def sensors_ingest(files, table, fmt, columns, batch_rows, create, partition):
+    """Bulk-load CSV, COPY text or pg_dump files through COPY, skipping rows already present."""
+    import time
+    from backend.app import db
+    from backend.app.services import ingest
+
+    if table and not SENSOR_TABLE_RE.fullmatch(table):
+        raise click.BadParameter(f"'{table}' does not match SENSOR_TABLE_PATTERN")
+    loaded = {}
+    for path in files:
+        started = time.perf_counter()
+        per_file = {}
+        try:
+            for stats, created in ingest.ingest_file(db.engine, path, table, fmt, columns.split(','),
+                                                     max(1, batch_rows), create, partition):
+                per_file[stats.table] = stats
+                for name in created:
+                    click.echo(f"  created partition {name}")
+                rate = stats.rows / max(time.perf_counter() - started, 1e-6)
+                click.echo(f"{path} -> {stats.table}: {stats.rows} rows read, {stats.inserted} new ({rate:,.0f} rows/s)")
+        except ValueError as ex:
+            raise click.ClickException(str(ex))
+        if not per_file:
+            click.echo(f"{path}: no rows to load")
+        for name, stats in per_file.items():
+            loaded.setdefault(name, ingest.IngestStats(name)).merge(stats)
+    for stats in loaded.values():
+        ingest.finish(db.engine, stats)
+        click.echo(f"{stats.table}: {stats.inserted} rows added, {stats.skipped} duplicates skipped"
+                   + (f", {stats.min_time} .. {stats.max_time}" if stats.min_time else ''))
+    # Rows may predate a table's known range: read MIN(mt_time) of the loaded tables again
+    catalog.refresh(list(loaded), rescan_min=True)
+
+
+@bench_cli.command('seed')
+@click.option('--tables', default=4, show_default=True, help='Number of sensXX tables.')
+@click.option('--first', default=0, show_default=True, help='Number of the first table (sens<first>).')
+@click.option('--sensors', default=8, show_default=True, help='Measuring points per table (AI + I1 channel each).')
+@click.option('--days', default=14.0, show_default=True, help='Days of history per table.')
+@click.option('--interval', default=60, show_default=True, help='Seconds between readings.')
+@click.option('--replace', is_flag=True, help='Drop and recreate tables that already exist.')
+def bench_seed(tables, first, sensors, days, interval, replace):
+    """Fill sensXX tables with deterministic synthetic MT-517 readings."""
+    from backend.app import db
+    from backend.bench import generator
+
+    names = generator.table_names(tables, first)
+    for t in names:
+        if not SENSOR_TABLE_RE.fullmatch(t):
+            raise click.BadParameter(f"'{t}' does not match SENSOR_TABLE_PATTERN")
+    for t, rows in generator.seed(db.engine, names, sensors, days, interval, replace=replace):
+        click.echo(f"{t}: {'exists, skipped (use --replace)' if rows is None else f'{rows} rows'}")
+    catalog.refresh()
+
+
+@bench_cli.command('run')
+@click.argument('tables', nargs=-1)
+@click.option('--url', help='Benchmark a running server (e.g. http://localhost:5000) instead of the app in-process.')
+@click.option('--concurrency', default=8, show_default=True)
+@click.option('--requests', 'count', default=1000, show_default=True, help='Measured requests.')
+@click.option('--warmup', default=50, show_default=True, help='Unmeasured requests sent first.')
+@click.option('--seed', default=42, show_default=True, help='Workload random seed.')
+@click.option('--endpoint', 'endpoints', multiple=True, help='Only these scenarios (repeatable).')
+@click.option('--save-baseline', type=click.Path(dir_okay=False), help='Write the report to this file.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help='Compare against this report; exit 1 on regression.')
+@click.option('--tolerance', default=0.2, show_default=True, help='Allowed relative p95 growth before flagging.')
+def bench_run(tables, url, concurrency, count, warmup, seed, endpoints, save_baseline, baseline, tolerance):
+    """Replay dashboard traffic and report p50/p95/p99, throughput and DB time per endpoint."""
+    from flask import current_app
+    from backend.bench import runner, workload
+
+    catalog.refresh()
+    infos = [catalog.get(t) for t in _tables(tables)]
+    try:
+        requests = workload.build([i for i in infos if i is not None], count + warmup, seed, endpoints)
+    except ValueError as ex:
+        raise click.ClickException(str(ex))
+    client = runner.HttpClient(url) if url else runner.AppClient(current_app._get_current_object())
+    report = runner.run(client, requests, concurrency, warmup)
+    report['seed'] = seed
+    click.echo(runner.format_report(report))
+    if save_baseline:
+        runner.save_baseline(report, save_baseline)
+        click.echo(f"Baseline written to {save_baseline}")
+    if baseline:
+        regressions = runner.compare(report, runner.load_baseline(baseline), tolerance)
+        for line in regressions:
+            click.echo(f"REGRESSION {line}", err=True)
+        if regressions:
+            raise SystemExit(1)
+        click.echo(f"No regressions against {baseline}")
+
+
+def register_cli(app):
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(sensors_cli)
+    app.cli.add_command(events_cli)
+    app.cli.add_command(bench_cli)
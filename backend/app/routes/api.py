@@ -1,25 +1,93 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from sqlalchemy import func, text
 from backend.app.models.sensor_data import SensorData
 from backend.app import db
 from backend.app.utils.config import settings
-import re
+from backend.app.services import columnar, compact
+from backend.app.services.cache import cached_response
+from backend.app.services.catalog import catalog, SENSOR_TABLE_RE
+from backend.app.services.database import statement_timeout, statement_timeout_scope
+from backend.app.services.events import events
+from backend.app.services import guard
+from backend.app.services.export import EXPORT_FORMATS, stream_export
+from backend.app.services.latest import latest_values
+from backend.app.services.locations import locations
+from backend.app.services.metrics import phase
+from backend.app.services import pivot
+from backend.app.services.replicas import replica_read, replicas
+from backend.app.services.numeric import value_sql
+from backend.app.services.queries import (
+    ByTableArgs, FilteredArgs, GapsArgs, PivotArgs, batch_specs, bucket_columnar, bucket_dicts, bucket_rows,
+    columns_meta, export_select, gap_report, latest_dicts, newest_rows, page_payload, raw_columnar, raw_columns,
+    raw_page, raw_rows, spec_args,
+)
+from backend.app.services.downsampling import downsample_columns, downsample_table
 
-# Validate schema name to avoid injection, default to 'public' if invalid
-_SCHEMA_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
-SCHEMA = settings.DB_SCHEMA if _SCHEMA_RE.fullmatch(getattr(settings, 'DB_SCHEMA', 'public')) else 'public'
+api_bp = Blueprint('api', __name__)
 
-# Compile sensor table name pattern from settings
-SENSOR_TABLE_RE = re.compile(getattr(settings, 'SENSOR_TABLE_PATTERN', r"^sens\d+$"))
+def _compact_rows(*filters, limit=None):
+    """sens00 rows matching `filters` as a compact=1 response."""
+    stmt = compact.orm_select(SensorData, value_sql(SensorData.__tablename__), *filters).limit(limit)
+    rows = db.session.execute(stmt)
+    with phase('fetch'):
+        rows = rows.all()
+    with phase('serialize'):
+        return compact.response(compact.raw_payload(rows))
 
-api_bp = Blueprint('api', __name__)
+def _guarded_sens00(pattern=None, start=None, end=None):
+    """
+    Bucketed response when an unlimited sens00 read (mt_name ILIKE `pattern`,
+    [start, end]) is estimated past QUERY_MAX_ROWS, see services/guard.py;
+    None to run the read as asked.
+    """
+    table = SensorData.__tablename__
+
+    def clause(start, end):
+        where, params = [], {}
+        if pattern:
+            where.append("mt_name ILIKE :pattern"); params["pattern"] = pattern
+        if start:
+            where.append("mt_time >= :start"); params["start"] = start
+        if end:
+            where.append("mt_time <= :end"); params["end"] = end
+        return ("WHERE " + " AND ".join(where)) if where else "", params
+
+    conn = db.session.connection()
+    where_sql, params = clause(start, end)
+    try:
+        estimate = guard.check(conn, table, where_sql, params, start, end)
+    except guard.QueryTooLarge as ex:
+        return jsonify({'error': str(ex), 'estimated_rows': ex.estimate.rows}), 400
+    if estimate is None:
+        return None
+    start, end = guard.window(table, start, end)
+    where_sql, params = clause(start, end)
+    # Rollups carry no mt_name filter
+    rows = bucket_rows(conn, table, where_sql, params, start, end, guard.TARGET_POINTS, use_rollups=not pattern)
+    with phase('serialize'):
+        resp = _buckets_response(rows, compact_json=compact.wanted(request.args))
+    resp.headers.update(estimate.headers())
+    return resp
+
+def _buckets_response(rows, media=None, compact_json=False):
+    """AVG/MIN/MAX bucket rows (raw SQL or rollup) as JSON, compact JSON or binary columns."""
+    if compact_json and not media:
+        return compact.response(compact.bucket_payload(rows))
+    if media:
+        return columnar.response(media, bucket_columnar(rows))
+    return jsonify(bucket_dicts(rows))
 
 @api_bp.route('/sensor-data', methods=['GET'])
+@statement_timeout()
 def get_sensor_data():
     """
     Simple endpoint to return all sensor data rows.
+    Params:
+      compact: optional bool; parallel t/n/v/q arrays with epoch-ms times
     """
+    if compact.wanted(request.args):
+        return _compact_rows(limit=100)
     data = SensorData.query.limit(100).all()  # limit for demonstration
     # Convert the SQLAlchemy objects to a list of dicts for JSON
     result = []
@@ -35,12 +103,27 @@ def get_sensor_data():
     return jsonify(result)
 
 @api_bp.route('/sensor-data/recent', methods=['GET'])
+@statement_timeout()
 def get_recent_sensor_data():
     # Get the current time (assuming your timestamps are in UTC)
     now = datetime.utcnow()
     # Define the start time as 24 hours ago
     start_time = now - timedelta(days=1)
     
+    # Streaming export (NDJSON/CSV) through a server-side cursor
+    fmt = request.args.get('format')
+    if fmt:
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'error': f"Invalid format; use one of {', '.join(EXPORT_FORMATS)}"}), 400
+        return stream_export(export_select(SensorData.mt_time >= start_time), fmt, 'sensor-data-recent')
+
+    guarded = _guarded_sens00(start=start_time)
+    if guarded is not None:
+        return guarded
+
+    if compact.wanted(request.args):
+        return _compact_rows(SensorData.mt_time >= start_time)
+
     # Query for all sensor data from the last day
     data = SensorData.query.filter(SensorData.mt_time >= start_time).all()
     
@@ -55,31 +138,27 @@ def get_recent_sensor_data():
     return jsonify(result)
 
 @api_bp.route('/sensor-data/filtered', methods=['GET'])
+@replica_read
+@statement_timeout()
 def get_filtered_sensor_data():
-    sensor_type = request.args.get('sensor_type')  # e.g., "I1", "Analog", etc.
-    start_time_str = request.args.get('start')
-    end_time_str = request.args.get('end')
-    
-    filters = []
-    
-    # Apply sensor type filter if provided
-    if sensor_type:
-        filters.append(SensorData.mt_name.ilike(f'%{sensor_type}%'))
-    
-    # Apply time range filter if provided
-    if start_time_str:
-        try:
-            start_time = datetime.fromisoformat(start_time_str)
-            filters.append(SensorData.mt_time >= start_time)
-        except Exception:
-            return jsonify({'error': 'Invalid start time format'}), 400
+    try:
+        args = FilteredArgs.parse(request.args)
+    except ValueError as ex:
+        return jsonify({'error': str(ex)}), 400
+    filters = args.filters
 
-    if end_time_str:
-        try:
-            end_time = datetime.fromisoformat(end_time_str)
-            filters.append(SensorData.mt_time <= end_time)
-        except Exception:
-            return jsonify({'error': 'Invalid end time format'}), 400
+    fmt = request.args.get('format')
+    if fmt:
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'error': f"Invalid format; use one of {', '.join(EXPORT_FORMATS)}"}), 400
+        return stream_export(export_select(*filters), fmt, 'sensor-data')
+
+    guarded = _guarded_sens00(args.pattern, args.start, args.end)
+    if guarded is not None:
+        return guarded
+
+    if compact.wanted(request.args):
+        return _compact_rows(*filters)
 
     data = SensorData.query.filter(*filters).all()
     result = [{
@@ -92,72 +171,122 @@ def get_filtered_sensor_data():
     return jsonify(result)
 
 @api_bp.route('/sensor-data/newest', methods=['GET'])
+@statement_timeout()
 def get_newest_sensor_data():
-    # Subquery: get the latest time for each sensor (grouped by mt_name)
-    subq = db.session.query(
-        SensorData.mt_name,
-        func.max(SensorData.mt_time).label('latest_time')
-    ).group_by(SensorData.mt_name).subquery()
-
-    # Join the SensorData table with the subquery on mt_name and mt_time
-    query = SensorData.query.join(
-        subq,
-        (SensorData.mt_name == subq.c.mt_name) & (SensorData.mt_time == subq.c.latest_time)
-    )
-
-    data = query.all()
-    result = [{
-        'mt_name': row.mt_name,
-        'mt_value': row.mt_value,
-        'mt_time': row.mt_time.isoformat() if row.mt_time else None,
-        'mt_quality': row.mt_quality
-    } for row in data]
+    # Served from the last-value cache when sens00 is a discovered sensor table
+    if catalog.get(SensorData.__tablename__) is not None:
+        values = latest_values.values(SensorData.__tablename__)
+        rows = [(t, name, value, quality) for name, (t, value, quality) in sorted(values.items())]
+    else:
+        rows = newest_rows(db.session.connection())
+    if compact.wanted(request.args):
+        return compact.response(compact.latest_payload(rows))
+    return jsonify(latest_dicts(rows))
+
+@api_bp.route('/sensor-data/snapshot', methods=['GET'])
+@statement_timeout()
+def get_sensor_snapshot():
+    """
+    Latest value of every mt_name across all discovered sensXX tables,
+    served from the in-memory last-value cache.
+    Params:
+      sensor:  optional, repeatable; restrict to these tables
+      compact: optional bool; parallel s/t/n/v/q arrays (s = table) with epoch-ms times
+    Response: { generated_at, values: [{table, mt_name, mt_time, mt_value, mt_quality}, ...] }
+    """
+    tables = request.args.getlist('sensor') or None
+    if tables and not all(SENSOR_TABLE_RE.fullmatch(t) for t in tables):
+        return jsonify({"error": "Invalid 'sensor' (expected like sens00)"}), 400
+    if compact.wanted(request.args):
+        return compact.response({
+            'generated_at': datetime.utcnow().isoformat(),
+            **compact.snapshot_payload(latest_values.rows(tables)),
+        })
+    return jsonify({
+        'generated_at': datetime.utcnow().isoformat(),
+        'values': latest_values.snapshot(tables),
+    })
 
-    return jsonify(result)
+@api_bp.route('/locations', methods=['GET'])
+def list_locations():
+    """
+    Map locations with a sensor manifest (<name>.sensors.json).
+    Response: [{ name, source, sensors }, ...]
+    """
+    return jsonify([{'name': loc.name, 'source': loc.source, 'sensors': len(loc.sensors)} for loc in locations.locations()])
+
+@api_bp.route('/locations/<name>/status', methods=['GET'])
+@statement_timeout()
+def get_location_status(name):
+    """
+    Current value, quality and age of every sensor on a location's map, in
+    one call, served from the last-value cache.
+    Response: { location, generated_at, matched, sensors: [{idx, code, name, kp, kg, limit, table,
+                value, quality, time, age_seconds, channels: {AI: {mt_name, value, quality, time}, ...}}, ...] }
+    """
+    location = locations.get(name)
+    if location is None:
+        return jsonify({"error": f"Unknown location '{name}'"}), 404
+    return jsonify(locations.status(location))
+
+@api_bp.route('/events', methods=['GET'])
+@statement_timeout()
+def list_events():
+    """
+    Valve open-time limit violations found by the event scanner, newest first.
+    Params:
+      sensor:   optional, e.g. sens01
+      location: optional map name, e.g. Deblin
+      name:     optional, repeatable mt_name
+      start:    optional ISO datetime; events still open at or after it
+      end:      optional ISO datetime; events started at or before it
+      open:     optional bool; only intervals that are still open
+      limit:    optional (default 500, max 10000)
+    Response: { events: [{id, table_name, mt_name, location, sensor_idx, code, kind, started_at,
+                ended_at, duration_seconds, limit_seconds}, ...], watermarks: {table: scanned up to} }
+    """
+    sensor = request.args.get('sensor')
+    if sensor and not SENSOR_TABLE_RE.fullmatch(sensor):
+        return jsonify({"error": "Invalid 'sensor' (expected like sens00)"}), 400
+    try:
+        start_time = datetime.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end_time = datetime.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid start/end time format'}), 400
+    try:
+        limit = min(int(request.args.get('limit', 500)), 10000)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    ongoing = request.args.get('open', 'false').lower() in ('1', 'true', 'yes')
+
+    conn = db.session.connection()
+    rows = events.query(conn, sensor, request.args.get('location'), request.args.getlist('name'),
+                        start_time, end_time, ongoing, limit)
+    for row in rows:
+        row['started_at'] = row['started_at'].isoformat()
+        row['ended_at'] = row['ended_at'].isoformat() if row['ended_at'] else None
+    return jsonify({
+        'events': rows,
+        'watermarks': {t: wm.isoformat() for t, wm in events.watermarks(conn).items()},
+    })
 
 @api_bp.route('/sensors', methods=['GET'])
 def list_sensors():
     """
-    Discover sensXX tables dynamically and return basic metadata for each:
+    Return basic metadata for each discovered sensXX table, served from the
+    in-memory sensor catalog:
     - table (real DB table name)
     - name  (display name; currently same as table, replace later if you add a metadata table)
     - approx_rows (fast approximate rowcount from pg_stat_user_tables)
-    - latest (exact latest mt_time)
+    - latest (latest mt_time, refreshed incrementally in the background)
     """
-    # Fast approximate counts for sensXX tables
-    rows = db.session.execute(
-        text(
-            """
-        SELECT relname AS table_name, n_live_tup AS approx_rows
-        FROM pg_stat_user_tables
-        WHERE schemaname = :schema AND relname ~ :pattern
-        ORDER BY relname
-    """
-        ),
-        {"schema": SCHEMA, "pattern": SENSOR_TABLE_RE.pattern},
-    ).mappings().all()
-
-    sensors = []
-    for r in rows:
-        t = r["table_name"]
-
-        # exact latest timestamp from each table (safe-ish dynamic SQL; we validate the name)
-        latest = db.session.execute(text(f'SELECT MAX(mt_time) FROM "{SCHEMA}"."{t}"')).scalar()
-
-        sensors.append({
-            "table": t,
-            "name": t,  # placeholder; later you can override from a sensors_meta table
-            "approx_rows": r["approx_rows"],
-            "latest": latest.isoformat() if latest else None,
-            "notes": "",
-        })
-
-    return jsonify(sensors)
+    return jsonify(catalog.sensors())
 
 @api_bp.route('/sensor-data/range', methods=['GET'])
 def get_sensor_time_range():
     """
     Return min/max mt_time for a specific sensor table, plus approx row count.
+    Served from the sensor catalog.
     Params:
       sensor: required (e.g., sens00)
     Response: { min_time, max_time, approx_rows }
@@ -166,28 +295,15 @@ def get_sensor_time_range():
     if not sensor or not SENSOR_TABLE_RE.fullmatch(sensor):
         return jsonify({"error": "Invalid or missing 'sensor' (expected like sens00)"}), 400
 
-    # min/max times
-    q_range = text(f'''SELECT MIN(mt_time) AS min_time, MAX(mt_time) AS max_time FROM "{SCHEMA}"."{sensor}"''')
-    row = db.session.execute(q_range).mappings().first()
-    min_time = row['min_time']
-    max_time = row['max_time']
-
-    # approx rows from pg_stat_user_tables
-    q_count = text("""
-        SELECT n_live_tup AS approx_rows
-        FROM pg_stat_user_tables
-        WHERE schemaname = :schema AND relname = :table
-    """)
-    c = db.session.execute(q_count, {"schema": SCHEMA, "table": sensor}).mappings().first()
-    approx_rows = c['approx_rows'] if c else None
-
-    return jsonify({
-        'min_time': min_time.isoformat() if min_time else None,
-        'max_time': max_time.isoformat() if max_time else None,
-        'approx_rows': approx_rows,
-    })
+    info = catalog.get(sensor)
+    if info is None:
+        return jsonify({"error": f"Unknown sensor table '{sensor}'"}), 404
+    return jsonify(info.as_range())
 
 @api_bp.route('/sensor-data/by-table', methods=['GET'])
+@cached_response
+@replica_read
+@statement_timeout()
 def get_sensor_data_by_table():
     """
     Query a specific sensXX table.
@@ -196,125 +312,207 @@ def get_sensor_data_by_table():
       start:  optional ISO datetime
       end:    optional ISO datetime
       limit:  optional int (default 1000)
+      cursor: optional opaque keyset cursor (next_cursor of the previous page);
+              preferred over offset, which is deprecated and capped on large tables
+      downsample:    optional bool; requires start and end
+      target_points: optional int (default 2000, at most 20000)
+      algorithm:     optional lttb|minmax|m4 for shape-preserving downsampling;
+                     without it downsample returns AVG/MIN/MAX buckets
+      compact:       optional bool; parallel arrays with epoch-ms times instead of
+                     one object per row, see services/compact.py
+    Send `Accept: application/vnd.mtrix.columns` (or
+    `application/vnd.apache.arrow.stream` when pyarrow is installed) to get
+    column buffers instead of JSON; see services/columnar.py.
+    Responses are cached and carry ETag/Last-Modified; windows ending before
+    the table's latest mt_time are treated as immutable.
+    A limit whose window is estimated past QUERY_MAX_ROWS rows comes back as
+    buckets with `X-Query-Guard: downsampled` (or a 400); see services/guard.py.
     Example:
       /api/sensor-data/by-table?sensor=sens01&start=2023-02-01T00:00:00&end=2023-02-28T23:59:59&limit=500
     """
-    sensor = request.args.get('sensor')
-    if not sensor or not SENSOR_TABLE_RE.fullmatch(sensor):
-        return jsonify({"error": "Invalid or missing 'sensor' (expected like sens00)"}), 400
-
-    start_time_str = request.args.get('start')
-    end_time_str = request.args.get('end')
-    limit = int(request.args.get('limit', 1000))
-    offset = int(request.args.get('offset', 0))
-    order = request.args.get('order', 'asc').lower()
-    # Optional cursor-style pagination parameters
-    after_str = request.args.get('after')   # return rows with mt_time > after (for asc)
-    before_str = request.args.get('before') # return rows with mt_time < before (for desc)
-    if order not in ("asc", "desc"):
-        return jsonify({'error': 'Invalid order; use asc or desc'}), 400
-
-    params, where = {}, []
-    start_time = None
-    end_time = None
-    if start_time_str:
-        try:
-            start_time = datetime.fromisoformat(start_time_str)
-            where.append("mt_time >= :start"); params["start"] = start_time
-        except Exception:
-            return jsonify({'error': 'Invalid start time format'}), 400
+    try:
+        args = ByTableArgs.parse(request.args)
+    except ValueError as ex:
+        return jsonify({'error': str(ex)}), 400
+    # A limit past QUERY_MAX_ROWS becomes a downsample (or a 400) when the window holds that many rows
+    try:
+        estimate = guard.guard_by_table(db.session.connection(), args)
+    except guard.QueryTooLarge as ex:
+        return jsonify({'error': str(ex), 'estimated_rows': ex.estimate.rows}), 400
+    sensor, where_sql, params = args.sensor, args.where_sql, args.params
+    order, limit, offset = args.order, args.limit, args.offset
+
+    # Binary columnar output when the client asks for it via Accept
+    media = columnar.negotiate(request)
 
-    if end_time_str:
-        try:
-            end_time = datetime.fromisoformat(end_time_str)
-            where.append("mt_time <= :end"); params["end"] = end_time
-        except Exception:
-            return jsonify({'error': 'Invalid end time format'}), 400
+    # Downsample path
+    if args.downsample:
+        # Shape-preserving reduction (keeps spikes) computed in NumPy
+        if args.algorithm:
+            with replicas.engine().connect() as conn:
+                if media or args.compact:
+                    columns = downsample_columns(conn, sensor, args.start, args.end, args.target_points, args.algorithm)
+                    with phase('serialize'):
+                        if not media:
+                            return compact.response(compact.columns_payload(columns))
+                        return columnar.response(media, columns)
+                rows = downsample_table(conn, sensor, args.start, args.end, args.target_points, args.algorithm)
+            with phase('serialize'):
+                return jsonify(rows)
+
+        # Prefer the coarsest rollup tier that still yields target_points buckets
+        rows = bucket_rows(db.session.connection(), sensor, where_sql, params, args.start, args.end,
+                           args.target_points, use_rollups=args.use_rollups)
+        with phase('serialize'):
+            resp = _buckets_response(rows, media, args.compact)
+        if estimate is not None:
+            resp.headers.update(estimate.headers())
+        return resp
 
-    if after_str:
-        try:
-            after_time = datetime.fromisoformat(after_str)
-            where.append("mt_time > :after"); params["after"] = after_time
-        except Exception:
-            return jsonify({'error': 'Invalid after cursor format'}), 400
+    # Raw rows path with cursor/offset support
+    if media or args.compact:
+        rows = raw_columns(db.session.connection(), sensor, where_sql, params, order, limit, offset)
+        meta = columns_meta(rows, order, limit, offset)
+        with phase('serialize'):
+            if not media:
+                resp = compact.response(compact.raw_payload(rows, **meta))
+            else:
+                resp = columnar.response(media, raw_columnar(rows), meta)
+        if offset:
+            resp.headers['Deprecation'] = 'true'
+        return resp
+
+    rows = raw_rows(db.session.connection(), sensor, where_sql, params, order, limit, offset)
+    with phase('serialize'):
+        resp = jsonify(raw_page(rows, order, limit, offset))
+    if offset:
+        # OFFSET costs O(offset); keep it working for small pages but steer clients to cursor
+        resp.headers['Deprecation'] = 'true'
+    return resp
+
+
+@api_bp.route('/sensor-data/pivot', methods=['GET'])
+@cached_response
+@replica_read
+@statement_timeout()
+def get_sensor_data_pivot():
+    """
+    Wide view of a sensXX table: one row per mt_time, one column per channel.
+    Params:
+      sensor:  required, e.g. sens00
+      start:   required ISO datetime
+      end:     required ISO datetime
+      by:      optional channel|name (default channel: last segment of mt_name)
+      name:    optional, repeatable; only these mt_names
+      compact: optional bool; {t: [epoch ms], series: {column: [values]}}
+    Response: { columns: ["mt_time", col...], rows: [[mt_time, value...], ...], truncated }
+    Values are numeric (null when missing or not numeric).
+    """
+    try:
+        args = PivotArgs.parse(request.args)
+    except ValueError as ex:
+        return jsonify({'error': str(ex)}), 400
+    if catalog.get(args.sensor) is None:
+        return jsonify({"error": f"Unknown sensor table '{args.sensor}'"}), 404
+
+    rows = pivot.pivot_rows(db.session.connection(), args.sensor, "WHERE mt_time >= :start AND mt_time <= :end",
+                            {"start": args.start, "end": args.end}, args.names)
+    with phase('serialize'):
+        payload = pivot.payload(rows, args.by, args.compact)
+        return compact.response(payload) if args.compact else jsonify(payload)
+
+
+@api_bp.route('/sensor-data/gaps', methods=['GET'])
+@cached_response
+@replica_read
+@statement_timeout()
+def get_sensor_data_gaps():
+    """
+    Intervals without readings longer than min_gap, per mt_name or per table.
+    Params:
+      sensor:  required, repeatable, e.g. sens00
+      start:   required ISO datetime
+      end:     required ISO datetime
+      min_gap: optional seconds (default 600)
+      by:      optional name|table (default name; table = no reading from any mt_name)
+      name:    optional, repeatable; only these mt_names
+    Response: { min_gap, by, tables: { sens00: { source, total_seconds, truncated,
+                gaps: [{mt_name, start, end, seconds, leading, trailing}, ...] } } }
+    Gaps are clipped to [start, end]; leading/trailing mark gaps bounded by the window.
+    """
+    try:
+        args = GapsArgs.parse(request.args)
+    except ValueError as ex:
+        return jsonify({'error': str(ex)}), 400
+    unknown = [s for s in args.sensors if catalog.get(s) is None]
+    if unknown:
+        return jsonify({"error": f"Unknown sensor table '{unknown[0]}'"}), 404
 
-    if before_str:
-        try:
-            before_time = datetime.fromisoformat(before_str)
-            where.append("mt_time < :before"); params["before"] = before_time
-        except Exception:
-            return jsonify({'error': 'Invalid before cursor format'}), 400
+    report = gap_report(db.session.connection(), args)
+    with phase('serialize'):
+        return jsonify(report)
 
-    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
 
-    # Downsample path
-    downsample = request.args.get('downsample', 'false').lower() in ('1', 'true', 'yes')
-    if downsample:
-        if not (start_time and end_time):
-            return jsonify({'error': 'downsample requires start and end params'}), 400
-        target_points = int(request.args.get('target_points', 2000))
-        if target_points <= 0:
-            target_points = 2000
-        duration_seconds = max(1, int((end_time - start_time).total_seconds()))
-        bucket = max(1, duration_seconds // target_points)
-
-        q = text(
-            f'''
-            SELECT
-                to_timestamp(floor(extract(epoch from mt_time)/:bucket)::bigint * :bucket) AS bucket_start,
-                mt_name,
-                AVG(CASE WHEN mt_value ~ '^[+-]?\d+(\.\d+)?$' THEN mt_value::double precision END) AS avg,
-                MIN(CASE WHEN mt_value ~ '^[+-]?\d+(\.\d+)?$' THEN mt_value::double precision END) AS min,
-                MAX(CASE WHEN mt_value ~ '^[+-]?\d+(\.\d+)?$' THEN mt_value::double precision END) AS max,
-                COUNT(*) AS count
-            FROM "{SCHEMA}"."{sensor}"
-            {where_sql}
-            GROUP BY bucket_start, mt_name
-            ORDER BY bucket_start ASC, mt_name ASC
-            LIMIT :max_buckets
-            '''
-        )
-        params["bucket"] = bucket
-        params["max_buckets"] = target_points + 5
-        rows = db.session.execute(q, params).mappings().all()
-        return jsonify([{ 'bucket_start': (r['bucket_start'].isoformat() if r['bucket_start'] else None), 'mt_name': r['mt_name'], 'avg': r['avg'], 'min': r['min'], 'max': r['max'], 'count': r['count'] } for r in rows])
+# Shared, bounded pool for batch queries; each worker checks out its own
+# connection from the SQLAlchemy engine pool.
+_batch_executor = ThreadPoolExecutor(max_workers=max(1, settings.BATCH_MAX_WORKERS), thread_name_prefix='batch')
 
-    # Raw rows path with cursor/offset support
-    q = text(
-        f'''
-        SELECT mt_time, mt_name, mt_value, mt_quality
-        FROM "{SCHEMA}"."{sensor}"
-        {where_sql}
-        ORDER BY mt_time {order}
-        LIMIT :limit OFFSET :offset
-    '''
-    )
-    params["limit"] = limit
-    params["offset"] = offset
-
-    rows = db.session.execute(q, params).mappings().all()
-    data = [dict(r) for r in rows]
-    next_after = None
-    next_before = None
-    if data:
-        times = [r['mt_time'] for r in rows if r['mt_time']]
-        if times:
-            if order == 'asc':
-                next_after = max(times).isoformat()
-            else:
-                next_before = min(times).isoformat()
+def _run_batch_spec(app, spec, engine):
+    """
+    Execute one batch spec in a worker thread on `engine`; returns a JSON-ready
+    payload and the query guard's estimate when the spec was downsampled.
+    """
+    with app.app_context(), statement_timeout_scope(), engine.connect() as conn:
+        # Parsing looks the table up in the catalog, which may need the app's engine
+        args = ByTableArgs.parse(spec_args(spec))
+        # Same QUERY_MAX_ROWS guard as by-table; QueryTooLarge is reported as the spec's error
+        estimate = guard.guard_by_table(conn, args)
+        if args.downsample and args.algorithm:
+            if args.compact:
+                columns = downsample_columns(conn, args.sensor, args.start, args.end, args.target_points, args.algorithm)
+                return compact.columns_payload(columns), estimate
+            return downsample_table(conn, args.sensor, args.start, args.end, args.target_points, args.algorithm), estimate
+        return page_payload(conn, args), estimate
+
+@api_bp.route('/sensor-data/batch', methods=['POST'])
+@replica_read
+def get_sensor_data_batch():
+    """
+    Run several by-table style queries in one request, concurrently.
+    Body: {"queries": [{sensor, start, end, downsample, target_points, algorithm, order, limit, cursor, compact}, ...]}
+          (a bare list of specs is accepted too); each spec is validated
+          and guarded like a by-table query string
+    Response: NDJSON streamed as queries finish, one line per spec:
+      {"index": i, "sensor": "sens01", "data": <by-table payload>}   or
+      {"index": i, "sensor": "sens01", "error": "..."}
+    A spec downsampled by the query guard also carries
+      "query_guard": "downsampled", "estimated_rows": n
+    """
+    try:
+        specs = batch_specs(request.get_json(silent=True))
+    except ValueError as ex:
+        return jsonify({'error': str(ex)}), 400
 
-    return jsonify({
-        'rows': [{
-            'mt_time': r['mt_time'].isoformat() if r['mt_time'] else None,
-            'mt_name': r['mt_name'],
-            'mt_value': r['mt_value'],
-            'mt_quality': r['mt_quality'],
-        } for r in data],
-        'next_after': next_after,
-        'next_before': next_before,
-        'order': order,
-        'limit': limit,
-        'offset': offset,
-    })
+    app = current_app._get_current_object()
+    # Workers don't see the request's context variables; hand them its engine
+    engine = replicas.engine()
+    futures = {_batch_executor.submit(_run_batch_spec, app, spec, engine): i for i, spec in enumerate(specs)}
 
+    def generate():
+        try:
+            for fut in as_completed(futures):
+                i = futures[fut]
+                line = {'index': i, 'sensor': specs[i].get('sensor')}
+                try:
+                    line['data'], estimate = fut.result()
+                    if estimate is not None:
+                        line['query_guard'], line['estimated_rows'] = 'downsampled', estimate.rows
+                except Exception as ex:
+                    line['error'] = str(ex)
+                yield compact.dumps(line) + b'\n'
+        finally:
+            # Client went away: don't run queries nobody will read
+            for fut in futures:
+                fut.cancel()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
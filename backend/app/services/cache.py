@@ -0,0 +1,256 @@
+"""Response cache for sensor time-series endpoints.
+
+Responses are keyed on the route, the normalized query string and the
+negotiated media type, and carry `Vary: Accept` since one URL can answer JSON
+or column buffers. A window whose `end` lies before the table's ingest
+watermark (catalog MAX(mt_time)) cannot change any more: it is cached until
+evicted, served with a long-lived Cache-Control, and its ETag and
+Last-Modified are derived from the window end, so a revalidation with
+If-None-Match / If-Modified-Since gets a 304 without running the query.
+Windows that reach "now" are cached for `RESPONSE_CACHE_TTL` seconds and
+dropped as soon as the watermark moves. The catalog only re-reads the
+watermark every CATALOG_REFRESH_SECONDS, so their ETag is a hash of the body
+instead: a revalidation runs the query and answers 304 only when the data is
+really unchanged.
+
+`cached_response` applies this to Flask views; the ASGI app (asgi.py) uses
+`window` and the same cache directly.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Optional
+
+from flask import current_app, request
+from werkzeug.http import http_date, parse_date, parse_etags, quote_etag
+
+from backend.app.services import columnar
+from backend.app.services.catalog import catalog, SENSOR_TABLE_RE
+from backend.app.services.replicas import replicas
+from backend.app.utils.config import settings
+
+# Response headers replayed from a cached entry (X-Query-Guard/X-Estimated-Rows: services/guard.py)
+_KEEP_HEADERS = ('Content-Type', 'Vary', 'Deprecation', 'X-Query-Guard', 'X-Estimated-Rows')
+
+
+class _Entry:
+    __slots__ = ('body', 'status', 'headers', 'etag', 'last_modified', 'immutable', 'expires', 'watermark')
+
+    def __init__(self, body, status, headers, etag, last_modified, immutable, expires, watermark):
+        self.body = body
+        self.status = status
+        self.headers = headers
+        self.etag = etag
+        self.last_modified = last_modified
+        self.immutable = immutable
+        self.expires = expires
+        self.watermark = watermark
+
+
+class ResponseCache:
+    """Thread-safe LRU bounded by entry count and total body bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, watermark) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not entry.immutable:
+                if entry.expires < time.monotonic() or entry.watermark != watermark:
+                    self._drop(key)
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: _Entry):
+        size = len(entry.body)
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+
+
+response_cache = ResponseCache(
+    max_entries=int(getattr(settings, 'RESPONSE_CACHE_SIZE', 256)),
+    max_bytes=int(getattr(settings, 'RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    ttl=float(getattr(settings, 'RESPONSE_CACHE_TTL', 5)),
+)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # mt_time is stored without a zone and treated as UTC throughout
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+class Window:
+    """Cache policy of one request: its key, the tables' watermark and whether the window is closed."""
+
+    __slots__ = ('key', 'watermark', 'immutable', 'end')
+
+    def __init__(self, key: str, watermark, immutable: bool, end: Optional[datetime]):
+        self.key = key
+        self.watermark = watermark
+        self.immutable = immutable
+        self.end = end
+
+    @property
+    def last_modified(self) -> Optional[datetime]:
+        return _as_utc(self.end) if self.immutable else None
+
+    @property
+    def static_etag(self) -> Optional[str]:
+        """ETag of a closed window, known without running the query."""
+        if not self.immutable:
+            return None
+        return hashlib.sha1(f"{self.key}|{self.end.isoformat()}".encode('utf-8')).hexdigest()
+
+    def lookup(self) -> Optional[_Entry]:
+        return response_cache.get(self.key, self.watermark)
+
+    def store(self, body: bytes, status: int, headers: dict) -> str:
+        """Cache a 200 response; returns its ETag."""
+        etag = self.static_etag or hashlib.sha1(body).hexdigest()
+        response_cache.put(self.key, _Entry(
+            body=body,
+            status=status,
+            headers={h: headers[h] for h in _KEEP_HEADERS if h in headers},
+            etag=etag,
+            last_modified=self.last_modified,
+            immutable=self.immutable,
+            expires=time.monotonic() + response_cache.ttl,
+            watermark=self.watermark,
+        ))
+        return etag
+
+    def headers(self, etag: Optional[str]) -> dict:
+        """Validators and caching headers for a response of this window."""
+        out = {
+            'Vary': 'Accept',
+            'Cache-Control': 'public, max-age=86400, immutable' if self.immutable else 'no-cache',
+        }
+        if etag:
+            out['ETag'] = quote_etag(etag)
+        if self.immutable:
+            out['Last-Modified'] = http_date(self.last_modified)
+        return out
+
+
+def window(path: str, args, media) -> Optional[Window]:
+    """
+    Cache policy for a request to `path` with query `args` ((name, value)
+    pairs) negotiated to `media`; None when the response is not cacheable.
+    A window described by `sensor` (repeatable) and optional `end` is closed
+    once `end` lies before every table's watermark. Unknown tables bypass the
+    cache; without `end` the window is treated as live.
+    """
+    args = sorted(args)
+    sensors = [v for k, v in args if k == 'sensor']
+    if not sensors or not all(SENSOR_TABLE_RE.fullmatch(s) for s in sensors):
+        return None
+    infos = [catalog.get(s) for s in sensors]
+    if any(info is None or info.max_time is None for info in infos):
+        return None
+
+    watermarks = tuple(info.max_time for info in infos)
+    watermark = watermarks if len(watermarks) > 1 else watermarks[0]
+    end = next((v for k, v in args if k == 'end'), None)
+    if end:
+        try:
+            end = datetime.fromisoformat(end)
+        except ValueError:
+            return None
+    else:
+        end = None
+    # A replica may be up to REPLICA_MAX_LAG_SECONDS behind the primary's watermark
+    immutable = end is not None and end < min(watermarks) - replicas.settle_margin()
+    return Window(repr((path, args, media)), watermark, immutable, end)
+
+
+def not_modified(window: Window, etag: Optional[str], if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    """Whether a conditional GET can be answered with 304 (If-None-Match wins over If-Modified-Since)."""
+    if if_none_match:
+        return etag is not None and parse_etags(if_none_match).contains_weak(etag)
+    if if_modified_since and window.last_modified is not None:
+        since = parse_date(if_modified_since)
+        return since is not None and window.last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def cached_response(view):
+    """Cache a GET view whose window is described by `sensor` and `end`, see `window`."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        w = window(request.path, request.args.items(multi=True), columnar.negotiate(request))
+        if w is None:
+            return view(*args, **kwargs)
+
+        def finish(resp, etag):
+            if etag:
+                resp.set_etag(etag)
+            if w.immutable:
+                resp.last_modified = w.last_modified
+            resp.vary.add('Accept')
+            resp.headers['Cache-Control'] = (
+                'public, max-age=86400, immutable' if w.immutable else 'no-cache'
+            )
+            return resp.make_conditional(request)
+
+        entry = w.lookup()
+        if entry is not None:
+            return finish(_replay(entry), entry.etag)
+
+        etag = w.static_etag
+        # Revalidation against a tag we can compute without running the query
+        if etag is not None and etag in request.if_none_match:
+            return finish(current_app.response_class(status=200), etag)
+
+        resp = view(*args, **kwargs)
+        if isinstance(resp, tuple):
+            return resp
+        if resp.status_code == 200 and not resp.is_streamed:
+            etag = w.store(resp.get_data(), resp.status_code, resp.headers)
+        return finish(resp, etag)
+
+    return wrapper
+
+
+def _replay(entry: _Entry):
+    resp = current_app.response_class(entry.body, status=entry.status)
+    for name, value in entry.headers.items():
+        resp.headers[name] = value
+    return resp
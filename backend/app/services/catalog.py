@@ -0,0 +1,345 @@
+"""In-memory catalog of sensXX tables.
+
+Tables matching `SENSOR_TABLE_PATTERN` are discovered once and their metadata
+(columns, indexes, min/max mt_time, approximate row count) is cached per
+table. A background thread refreshes it incrementally so the API
+can answer `/api/sensors` and `/api/sensor-data/range` without touching
+Postgres on every request.
+"""
+
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+from backend.app.utils.config import settings
+
+log = logging.getLogger(__name__)
+
+# Validate schema name to avoid injection, default to 'public' if invalid
+_SCHEMA_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+SCHEMA = settings.DB_SCHEMA if _SCHEMA_RE.fullmatch(getattr(settings, 'DB_SCHEMA', 'public')) else 'public'
+
+# Compile sensor table name pattern from settings
+SENSOR_TABLE_RE = re.compile(getattr(settings, 'SENSOR_TABLE_PATTERN', r"^sens\d+$"))
+
+# Tables per UNION ALL statement when fetching min/max times
+_BATCH = 100
+
+# Minimum seconds between refreshes triggered by a lookup miss
+_MISS_REFRESH_SECONDS = 5
+
+
+@dataclass(frozen=True)
+class IndexInfo:
+    name: str
+    method: str  # btree, brin, ...
+    columns: tuple  # key columns in order; None for expression keys
+    usable: bool = True  # valid and not partial
+
+
+@dataclass
+class TableInfo:
+    table: str
+    columns: tuple = ()
+    has_time_index: bool = False
+    has_name_index: bool = False
+    indexes: tuple = ()
+    min_time: Optional[datetime] = None
+    max_time: Optional[datetime] = None
+    approx_rows: Optional[int] = None
+    refreshed_at: float = field(default_factory=time.time)
+
+    def as_sensor(self) -> dict:
+        """Shape used by /api/sensors."""
+        return {
+            "table": self.table,
+            "name": self.table,  # placeholder; later you can override from a sensors_meta table
+            "approx_rows": self.approx_rows,
+            "latest": self.max_time.isoformat() if self.max_time else None,
+            "notes": "",
+        }
+
+    def as_range(self) -> dict:
+        """Shape used by /api/sensor-data/range."""
+        return {
+            "min_time": self.min_time.isoformat() if self.min_time else None,
+            "max_time": self.max_time.isoformat() if self.max_time else None,
+            "approx_rows": self.approx_rows,
+        }
+
+
+class SensorCatalog:
+    """
+    Process-local registry of sensor tables.
+
+    The first lookup loads the catalog synchronously; afterwards a daemon
+    thread refreshes it every `CATALOG_REFRESH_SECONDS`. A refresh re-runs
+    discovery (a handful of catalog queries, independent of the table count)
+    and reads the full MIN/MAX(mt_time) only for tables seen for the first
+    time; known tables only have their MAX(mt_time) advanced past the cached
+    value. MIN(mt_time) of a known table is re-read only when asked for with
+    `refresh(tables, rescan_min=True)`, which `sensors ingest` does for the
+    tables it loaded (history may have been back-filled).
+    """
+
+    def __init__(self):
+        self._app = None
+        self._tables: Dict[str, TableInfo] = {}
+        self._sensors: List[dict] = []
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._loaded = False
+        self._last_refresh = 0.0
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions['sensor_catalog'] = self
+
+    # ---- lookups -----------------------------------------------------------
+
+    def ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._refresh_lock:
+            if not self._loaded:
+                self._refresh()
+                self._loaded = True
+        self._start_refresher()
+
+    def get(self, table: str) -> Optional[TableInfo]:
+        """Return cached info for `table`, rediscovering once on a miss."""
+        self.ensure_loaded()
+        info = self._tables.get(table)
+        if info is None and time.time() - self._last_refresh > _MISS_REFRESH_SECONDS:
+            self.refresh()
+            info = self._tables.get(table)
+        return info
+
+    def tables(self) -> List[TableInfo]:
+        self.ensure_loaded()
+        return [self._tables[t] for t in sorted(self._tables)]
+
+    def sensors(self) -> List[dict]:
+        """Pre-serialized /api/sensors payload."""
+        self.ensure_loaded()
+        return self._sensors
+
+    # ---- refresh -----------------------------------------------------------
+
+    def refresh(self, tables: Optional[List[str]] = None, rescan_min: bool = False):
+        """
+        Rediscover the catalog. With `rescan_min`, MIN(mt_time) of `tables`
+        (every known table when None) is read again as well.
+        """
+        with self._refresh_lock:
+            self._refresh(tables, rescan_min)
+            self._loaded = True
+
+    def _refresh(self, rescan: Optional[List[str]] = None, rescan_min: bool = False):
+        from backend.app import db
+
+        with db.engine.connect() as conn:
+            discovered = self._discover(conn)
+            previous = self._tables
+
+            fresh = [t for t in discovered if t not in previous]
+            known = [t for t in discovered if t in previous]
+            ranges = self._fetch_ranges(conn, fresh)
+            latest = self._fetch_latest(conn, {t: previous[t].max_time for t in known})
+            # Back-filled history, only on request: MIN(mt_time) is a full scan without an mt_time index
+            earliest = {}
+            if rescan_min:
+                earliest = self._fetch_earliest(conn, [t for t in known if rescan is None or t in rescan])
+
+        now = time.time()
+        tables: Dict[str, TableInfo] = {}
+        for name, meta in discovered.items():
+            if name in previous:
+                old = previous[name]
+                min_time, max_time = old.min_time, latest.get(name) or old.max_time
+                if earliest.get(name) is not None and (min_time is None or earliest[name] < min_time):
+                    min_time = earliest[name]
+                if min_time is None:
+                    min_time = max_time
+            else:
+                min_time, max_time = ranges.get(name, (None, None))
+            tables[name] = TableInfo(
+                table=name,
+                columns=meta["columns"],
+                has_time_index=meta["has_time_index"],
+                has_name_index=meta["has_name_index"],
+                indexes=meta["indexes"],
+                min_time=min_time,
+                max_time=max_time,
+                approx_rows=meta["approx_rows"],
+                refreshed_at=now,
+            )
+
+        sensors = [tables[t].as_sensor() for t in sorted(tables)]
+        with self._lock:
+            self._tables = tables
+            self._sensors = sensors
+            self._last_refresh = now
+
+    def _discover(self, conn) -> Dict[str, dict]:
+        params = {"schema": SCHEMA, "pattern": SENSOR_TABLE_RE.pattern}
+        counts = conn.execute(
+            text(
+                """
+            SELECT c.relname AS table_name,
+                   CASE WHEN c.relkind = 'p' THEN (
+                       -- partitioned tables: sum over their partitions
+                       SELECT SUM(ps.n_live_tup)::bigint
+                       FROM pg_inherits i JOIN pg_stat_user_tables ps ON ps.relid = i.inhrelid
+                       WHERE i.inhparent = c.oid
+                   ) ELSE s.n_live_tup END AS approx_rows
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+            WHERE n.nspname = :schema AND c.relkind IN ('r', 'p') AND NOT c.relispartition
+              AND c.relname ~ :pattern
+        """
+            ),
+            params,
+        ).all()
+        columns = conn.execute(
+            text(
+                """
+            SELECT table_name, column_name
+            FROM information_schema.columns
+            WHERE table_schema = :schema AND table_name ~ :pattern
+            ORDER BY table_name, ordinal_position
+        """
+            ),
+            params,
+        ).all()
+        # Every index on the sensor tables with its access method and key
+        # columns (expression keys show up as NULL)
+        indexed = conn.execute(
+            text(
+                """
+            SELECT t.relname AS table_name, c.relname AS index_name, am.amname AS method,
+                   ARRAY(
+                       SELECT a.attname
+                       FROM unnest(i.indkey::int2[]) WITH ORDINALITY AS k(attnum, ord)
+                       LEFT JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+                       ORDER BY k.ord
+                   ) AS columns,
+                   i.indisvalid AND i.indpred IS NULL AS usable
+            FROM pg_index i
+            JOIN pg_class t ON t.oid = i.indrelid
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_am am ON am.oid = c.relam
+            JOIN pg_namespace n ON n.oid = t.relnamespace
+            WHERE n.nspname = :schema AND t.relname ~ :pattern
+            ORDER BY t.relname, c.relname
+        """
+            ),
+            params,
+        ).all()
+
+        cols: Dict[str, list] = {}
+        for table_name, column_name in columns:
+            cols.setdefault(table_name, []).append(column_name)
+        indexes: Dict[str, list] = {}
+        for table_name, index_name, method, index_columns, usable in indexed:
+            indexes.setdefault(table_name, []).append(
+                IndexInfo(index_name, method, tuple(index_columns), bool(usable))
+            )
+        time_indexed = {t for t, idx in indexes.items() if any(i.usable and i.columns[:1] == ("mt_time",) for i in idx)}
+        name_indexed = {t for t, idx in indexes.items() if any(i.usable and i.columns[:1] == ("mt_name",) for i in idx)}
+
+        discovered = {}
+        for table_name, approx_rows in counts:
+            # Postgres regex dialect differs slightly; re-check with Python's
+            if not SENSOR_TABLE_RE.fullmatch(table_name):
+                continue
+            discovered[table_name] = {
+                "columns": tuple(cols.get(table_name, ())),
+                "has_time_index": table_name in time_indexed,
+                "has_name_index": table_name in name_indexed,
+                "indexes": tuple(indexes.get(table_name, ())),
+                "approx_rows": approx_rows,
+            }
+        return discovered
+
+    def _fetch_ranges(self, conn, tables: List[str]) -> Dict[str, tuple]:
+        """MIN/MAX(mt_time) for newly discovered tables, batched per round trip."""
+        out = {}
+        for i in range(0, len(tables), _BATCH):
+            chunk = tables[i:i + _BATCH]
+            parts, params = [], {}
+            for j, t in enumerate(chunk):
+                parts.append(
+                    f'SELECT :t{j} AS table_name, MIN(mt_time) AS min_time, MAX(mt_time) AS max_time FROM "{SCHEMA}"."{t}"'
+                )
+                params[f"t{j}"] = t
+            for table_name, min_time, max_time in conn.execute(text(" UNION ALL ".join(parts)), params):
+                out[table_name] = (min_time, max_time)
+        return out
+
+    def _fetch_earliest(self, conn, tables: List[str]) -> Dict[str, datetime]:
+        """Current MIN(mt_time) of known tables."""
+        out = {}
+        for i in range(0, len(tables), _BATCH):
+            chunk = tables[i:i + _BATCH]
+            parts, params = [], {}
+            for j, t in enumerate(chunk):
+                parts.append(f'SELECT :t{j} AS table_name, MIN(mt_time) AS min_time FROM "{SCHEMA}"."{t}"')
+                params[f"t{j}"] = t
+            for table_name, min_time in conn.execute(text(" UNION ALL ".join(parts)), params):
+                if min_time is not None:
+                    out[table_name] = min_time
+        return out
+
+    def _fetch_latest(self, conn, known: Dict[str, Optional[datetime]]) -> Dict[str, datetime]:
+        """Advance MAX(mt_time) for known tables, only looking past the cached value."""
+        out = {}
+        names = list(known)
+        for i in range(0, len(names), _BATCH):
+            chunk = names[i:i + _BATCH]
+            parts, params = [], {}
+            for j, t in enumerate(chunk):
+                since = known[t]
+                where = f"WHERE mt_time > :s{j}" if since is not None else ""
+                parts.append(f'SELECT :t{j} AS table_name, MAX(mt_time) AS max_time FROM "{SCHEMA}"."{t}" {where}')
+                params[f"t{j}"] = t
+                if since is not None:
+                    params[f"s{j}"] = since
+            for table_name, max_time in conn.execute(text(" UNION ALL ".join(parts)), params):
+                if max_time is not None:
+                    out[table_name] = max_time
+        return out
+
+    # ---- background refresher ---------------------------------------------
+
+    def _start_refresher(self):
+        interval = int(getattr(settings, 'CATALOG_REFRESH_SECONDS', 30) or 0)
+        if interval <= 0 or self._app is None:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, args=(interval,), name="sensor-catalog", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, interval: int):
+        while True:
+            time.sleep(interval)
+            try:
+                with self._app.app_context():
+                    self.refresh()
+            except Exception:
+                log.exception("Sensor catalog refresh failed")
+
+
+catalog = SensorCatalog()
@@ -0,0 +1,143 @@
+"""Columnar binary responses for time-series endpoints.
+
+Clients opt in through the Accept header:
+
+- `application/vnd.mtrix.columns`: packed little-endian layout, no extra deps
+
+      b'MTC1' | uint32 header length | header JSON | column buffers
+
+  The header is `{"rows": n, "meta": {...}, "columns": [{"name", "type",
+  "offset", "length", ["unit"], ["dictionary"]}, ...]}` where `type` is
+  `int64` (timestamps: epoch milliseconds, `"unit": "ms"`), `float64`
+  (non-numeric values become NaN) or `dict32` (uint32 codes into
+  `dictionary`). Offsets are relative to the first byte after the header and
+  every buffer starts on an 8-byte boundary of the whole message, so it can
+  be wrapped in a typed array without copying.
+
+- `application/vnd.apache.arrow.stream`: Arrow IPC stream, offered only when
+  pyarrow is installed.
+
+Columns are built straight from DB row tuples with NumPy; no per-row dicts.
+"""
+
+import json
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import numpy as np
+from flask import Response
+
+try:  # optional dependency
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - depends on environment
+    pa = None
+
+JSON_MIMETYPE = 'application/json'
+PACKED_MIMETYPE = 'application/vnd.mtrix.columns'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+MAGIC = b'MTC1'
+
+_EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
+
+
+class Column:
+    __slots__ = ('name', 'type', 'data', 'dictionary', 'unit')
+
+    def __init__(self, name, type_, data, dictionary=None, unit=None):
+        self.name = name
+        self.type = type_
+        self.data = data
+        self.dictionary = dictionary
+        self.unit = unit
+
+
+def epoch_ms(value: Optional[datetime]) -> Optional[int]:
+    """Epoch milliseconds; naive datetimes are taken as UTC like mt_time."""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // _MS
+
+
+def time_column(name: str, values, unit: str = 'ms') -> Column:
+    return Column(name, 'int64', np.asarray(values, dtype='<i8'), unit=unit)
+
+
+def float_column(name: str, values) -> Column:
+    # None (NULL / non-numeric) becomes NaN
+    return Column(name, 'float64', np.asarray(values, dtype='<f8'))
+
+
+def int_column(name: str, values) -> Column:
+    return Column(name, 'int64', np.asarray(values, dtype='<i8'))
+
+
+def dict_column(name: str, values) -> Column:
+    arr = np.asarray(values, dtype=object)
+    if not len(arr):
+        return Column(name, 'dict32', np.empty(0, dtype='<u4'), dictionary=[])
+    # NULLs sort awkwardly next to strings; map them to '' first
+    arr[arr == None] = ''  # noqa: E711 - elementwise comparison
+    dictionary, codes = np.unique(arr, return_inverse=True)
+    return Column(name, 'dict32', codes.astype('<u4'), dictionary=dictionary.tolist())
+
+
+def negotiate(request) -> Optional[str]:
+    """Binary media type preferred by the client, or None for JSON."""
+    offers = [JSON_MIMETYPE, PACKED_MIMETYPE]
+    if pa is not None:
+        offers.append(ARROW_MIMETYPE)
+    best = request.accept_mimetypes.best_match(offers, default=JSON_MIMETYPE)
+    return None if best == JSON_MIMETYPE else best
+
+
+def pack(columns: List[Column], meta: Optional[dict] = None) -> bytes:
+    rows = len(columns[0].data) if columns else 0
+    offset = 0
+    specs, buffers = [], []
+    for col in columns:
+        buf = np.ascontiguousarray(col.data).tobytes()
+        spec = {'name': col.name, 'type': col.type, 'offset': offset, 'length': len(buf)}
+        if col.unit:
+            spec['unit'] = col.unit
+        if col.dictionary is not None:
+            spec['dictionary'] = col.dictionary
+        specs.append(spec)
+        buffers.append(buf + b'\0' * (-len(buf) % 8))
+        offset += len(buffers[-1])
+
+    header = json.dumps({'rows': rows, 'meta': meta or {}, 'columns': specs}).encode('utf-8')
+    # Pad the header so the body (and every buffer) starts 8-byte aligned
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % 8)
+    return b''.join([MAGIC, struct.pack('<I', len(header)), header] + buffers)
+
+
+def to_arrow(columns: List[Column], meta: Optional[dict] = None) -> bytes:
+    arrays, names = [], []
+    for col in columns:
+        if col.type == 'dict32':
+            arr = pa.DictionaryArray.from_arrays(pa.array(col.data), pa.array(col.dictionary, type=pa.string()))
+        elif col.unit:
+            arr = pa.array(col.data, type=pa.timestamp(col.unit))
+        else:
+            arr = pa.array(col.data)
+        arrays.append(arr)
+        names.append(col.name)
+    schema_meta = {'meta': json.dumps(meta or {})}
+    batch = pa.RecordBatch.from_arrays(arrays, names=names).replace_schema_metadata(schema_meta)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(media: str, columns: List[Column], meta: Optional[dict] = None) -> bytes:
+    return to_arrow(columns, meta) if media == ARROW_MIMETYPE else pack(columns, meta)
+
+
+def response(media: str, columns: List[Column], meta: Optional[dict] = None) -> Response:
+    return Response(encode(media, columns, meta), mimetype=media, headers={'Vary': 'Accept'})
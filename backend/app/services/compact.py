@@ -0,0 +1,122 @@
+"""Compact JSON for time-series endpoints, selected with `compact=1`.
+
+Instead of one object per row with ISO timestamps, rows are returned as
+parallel arrays built straight from DB tuples:
+
+    {"t": [epoch ms, ...], "n": [mt_name, ...], "v": [value, ...], "q": [mt_quality, ...], ...meta}
+
+`t` is epoch milliseconds (UTC) and `v` is the numeric value (`mt_value_num`
+or the parsed `mt_value`; null when the reading is not numeric). Bucketed
+downsample responses carry `avg`, `min`, `max` and `count` instead of `v` and
+`q`, and the last-value snapshot adds the sensor table of each row as `s`.
+Pagination fields (`next_cursor`, ...) sit next to the arrays.
+
+Encoded with orjson when it is installed, otherwise with the standard
+encoder without whitespace.
+"""
+
+import json
+import re
+from typing import Iterable, Sequence
+
+import numpy as np
+from flask import Response
+from sqlalchemy import Float, func, literal_column, select
+
+try:  # optional dependency
+    import orjson
+except ImportError:  # pragma: no cover - depends on environment
+    orjson = None
+
+from backend.app.services import columnar
+from backend.app.services.numeric import NUMERIC_RE
+
+RAW_KEYS = ('t', 'n', 'v', 'q')
+BUCKET_KEYS = ('t', 'n', 'avg', 'min', 'max', 'count')
+SNAPSHOT_KEYS = ('s', 't', 'n', 'v', 'q')
+
+_NUMERIC = re.compile(NUMERIC_RE)
+
+
+def wanted(args) -> bool:
+    return str(args.get('compact', '')).lower() in ('1', 'true', 'yes')
+
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def response(payload: dict) -> Response:
+    return Response(dumps(payload), mimetype='application/json')
+
+
+def transpose(rows: Sequence[tuple], keys: Sequence[str]) -> dict:
+    """Row tuples as `{key: [column values]}`."""
+    if not rows:
+        return {k: [] for k in keys}
+    return {k: list(col) for k, col in zip(keys, zip(*rows))}
+
+
+def epoch_ms(seconds: Iterable[float]) -> list:
+    """Epoch seconds (EXTRACT(EPOCH ...) as double precision) to integer milliseconds."""
+    # Round to the microseconds Postgres stores first, so x.123 never floors to x.122
+    us = np.rint(np.asarray(seconds, dtype=np.float64) * 1e6).astype(np.int64)
+    return (us // 1000).tolist()
+
+
+def raw_payload(rows: Sequence[tuple], **meta) -> dict:
+    """Payload for `(epoch seconds, mt_name, value, mt_quality)` rows."""
+    out = transpose(rows, RAW_KEYS)
+    out['t'] = epoch_ms(out['t'])
+    out.update(meta)
+    return out
+
+
+def latest_payload(rows) -> dict:
+    """Payload for `(mt_time, mt_name, mt_value, mt_quality)` rows with datetimes and text values."""
+    return transpose([
+        (columnar.epoch_ms(t), name, numeric_or_none(value), quality) for t, name, value, quality in rows
+    ], RAW_KEYS)
+
+
+def snapshot_payload(rows) -> dict:
+    """Payload for `(table, mt_time, mt_name, mt_value, mt_quality)` last-value rows."""
+    return transpose([
+        (table, columnar.epoch_ms(t), name, numeric_or_none(value), quality) for table, t, name, value, quality in rows
+    ], SNAPSHOT_KEYS)
+
+
+def bucket_payload(rows) -> dict:
+    """Payload for AVG/MIN/MAX bucket rows (raw SQL or rollup mappings)."""
+    return transpose([
+        (columnar.epoch_ms(r['bucket_start']), r['mt_name'], r['avg'], r['min'], r['max'], r['count']) for r in rows
+    ], BUCKET_KEYS)
+
+
+def columns_payload(columns) -> dict:
+    """Payload for the mt_time/mt_name/mt_value columns of a shape-preserving downsample."""
+    t, names, values = columns
+    return {
+        't': t.data.tolist(),
+        'n': np.asarray(names.dictionary, dtype=object)[names.data].tolist() if names.dictionary else [],
+        'v': values.data.tolist(),
+    }
+
+
+def orm_select(model, value: str, *filters):
+    """Core SELECT of the compact raw columns over an ORM sensor model."""
+    return select(
+        func.extract('epoch', model.mt_time).cast(Float).label('t'),
+        model.mt_name,
+        literal_column(value, type_=Float).label('v'),
+        model.mt_quality,
+    ).where(*filters)
+
+
+def numeric_or_none(value):
+    """Numeric reading of a cached `mt_value` string, matching NUMERIC_RE."""
+    if value is None or not _NUMERIC.match(value):
+        return None
+    return float(value)
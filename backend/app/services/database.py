@@ -0,0 +1,220 @@
+"""Database access layer: pool sizing, statement timeouts, statement cache and pool metrics.
+
+- `engine_options()` sizes the SQLAlchemy pool from settings. Checkouts wait
+  at most `DB_POOL_TIMEOUT` seconds; a saturated pool then answers 503 with
+  Retry-After instead of queueing requests indefinitely.
+- `@statement_timeout(ms)` applies `SET LOCAL statement_timeout` to every
+  transaction a view opens (default `DB_STATEMENT_TIMEOUT_MS`); a cancelled
+  query answers 504. Background threads and CLI commands are not limited.
+- `statements.get(key, build)` keeps the `text()` objects built for dynamic
+  sensXX table names, so a repeated query shape reuses the same statement
+  (and SQLAlchemy's compiled form of it).
+- `pool_metrics` counts checkouts, wait time and timeouts for `/health`.
+"""
+
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Hashable, Optional
+
+from flask import jsonify
+from sqlalchemy import event, exc, text
+from sqlalchemy.pool import QueuePool
+
+from backend.app.utils.config import settings
+
+# Max distinct statements kept by the statement cache
+STATEMENT_CACHE_SIZE = 1024
+
+# SQLSTATE of a statement cancelled by statement_timeout
+_QUERY_CANCELED = '57014'
+
+_timeout_ms: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar('statement_timeout_ms', default=None)
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.pool_timeouts = 0
+        self.statement_timeouts = 0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_pool_timeout(self):
+        with self._lock:
+            self.pool_timeouts += 1
+
+    def record_statement_timeout(self):
+        with self._lock:
+            self.statement_timeouts += 1
+
+    def stats(self, pool=None) -> dict:
+        with self._lock:
+            out = {
+                'checkouts': self.checkouts,
+                'wait_avg_ms': round(1000 * self.wait_total / self.checkouts, 3) if self.checkouts else 0.0,
+                'wait_max_ms': round(1000 * self.wait_max, 3),
+                'pool_timeouts': self.pool_timeouts,
+                'statement_timeouts': self.statement_timeouts,
+            }
+        if isinstance(pool, QueuePool):
+            out.update({
+                'size': pool.size(),
+                'active': pool.checkedout(),
+                'idle': pool.checkedin(),
+                'overflow': max(0, pool.overflow()),
+            })
+        return out
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    _in_get = threading.local()
+
+    def _do_get(self):
+        # QueuePool retries by calling _do_get again; only time the outer call
+        if getattr(self._in_get, 'active', False):
+            return super()._do_get()
+        self._in_get.active = True
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.record_pool_timeout()
+            raise
+        finally:
+            self._in_get.active = False
+            pool_metrics.record_wait(time.perf_counter() - start)
+
+
+def engine_options() -> dict:
+    return {
+        'pool_pre_ping': True,
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': max(1, int(settings.DB_POOL_SIZE)),
+        'max_overflow': max(0, int(settings.DB_MAX_OVERFLOW)),
+        # Whole seconds: Flask-SQLAlchemy coerces it with engine_from_config
+        'pool_timeout': max(1, int(settings.DB_POOL_TIMEOUT)),
+        'pool_recycle': int(settings.DB_POOL_RECYCLE),
+    }
+
+
+class StatementCache:
+    """LRU of `text()` statements keyed by the caller (query shape, table, ...)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], str]):
+        with self._lock:
+            stmt = self._entries.get(key)
+            if stmt is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return stmt
+            self.misses += 1
+        stmt = text(build())
+        with self._lock:
+            self._entries[key] = stmt
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return stmt
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+statements = StatementCache(STATEMENT_CACHE_SIZE)
+
+
+@contextmanager
+def statement_timeout_scope(ms: Optional[int] = None):
+    """Limit transactions opened inside the block (e.g. in a worker thread)."""
+    token = _timeout_ms.set(int(settings.DB_STATEMENT_TIMEOUT_MS if ms is None else ms))
+    try:
+        yield
+    finally:
+        _timeout_ms.reset(token)
+
+
+def statement_timeout(ms: Optional[int] = None):
+    """View decorator: run the view's queries under `statement_timeout`."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with statement_timeout_scope(ms):
+                return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _on_begin(conn):
+    ms = _timeout_ms.get()
+    if not ms or conn.get_execution_options().get('isolation_level') == 'AUTOCOMMIT':
+        return
+    # Straight on the DBAPI connection: this runs while SQLAlchemy is still
+    # beginning the transaction, and psycopg2 opens it implicitly here.
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f'SET LOCAL statement_timeout = {int(ms)}')
+    finally:
+        cursor.close()
+
+
+def is_statement_timeout(error: exc.DBAPIError) -> bool:
+    return getattr(error.orig, 'pgcode', None) == _QUERY_CANCELED
+
+
+def instrument_engine(engine):
+    """Apply `@statement_timeout` scopes to transactions on `engine` (replicas too)."""
+    event.listen(engine, 'begin', _on_begin)
+
+
+def init_app(app, db):
+    with app.app_context():
+        engine = db.engine
+    instrument_engine(engine)
+
+    @app.errorhandler(exc.TimeoutError)
+    def pool_exhausted(ex):
+        resp = jsonify({'error': 'Database is busy, retry shortly'})
+        resp.status_code = 503
+        resp.headers['Retry-After'] = '1'
+        return resp
+
+    @app.errorhandler(exc.OperationalError)
+    def operational_error(ex):
+        if is_statement_timeout(ex):
+            pool_metrics.record_statement_timeout()
+            return jsonify({'error': 'Query took too long; narrow the time window or use downsample'}), 504
+        return jsonify({'error': 'Database unavailable'}), 503
+
+
+def health(engine) -> dict:
+    return {'pool': pool_metrics.stats(engine.pool), 'statements': statements.stats()}
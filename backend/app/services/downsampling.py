@@ -0,0 +1,286 @@
+"""Shape-preserving downsampling for sensor time series.
+
+Rows are pulled from a sensXX table through a server-side cursor in bounded
+chunks and folded into per-bucket first/min/max/last trackers, so memory
+depends on `target_points` rather than on the size of the window. The
+reduced candidates are then emitted as:
+
+- minmax: min and max of `target_points / 2` buckets
+- m4:     first, min, max and last of `target_points / 4` buckets
+- lttb:   Largest-Triangle-Three-Buckets over the M4 candidates of
+          `target_points` buckets, giving exactly `target_points` points
+          whenever the window holds that many
+
+`SeriesReducer` holds the per-series state, so callers that fetch rows
+themselves (the ASGI app streams them from an async cursor) feed it chunk by
+chunk; `downsample_table` / `downsample_columns` do the fetching for a sync
+connection.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from backend.app.services import columnar, numeric
+from backend.app.services.catalog import SCHEMA
+from backend.app.services.metrics import phase
+
+ALGORITHMS = ('lttb', 'minmax', 'm4')
+
+# Requested points per series; reducers allocate O(target_points) arrays per mt_name
+DEFAULT_TARGET_POINTS = 2000
+MAX_TARGET_POINTS = 20_000
+
+# Rows fetched per round trip from the server-side cursor
+CHUNK_ROWS = 50_000
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def clamp_target_points(value) -> int:
+    """`target_points` from a request: the default when missing or not positive, capped at MAX_TARGET_POINTS."""
+    points = int(value or DEFAULT_TARGET_POINTS)
+    if points <= 0:
+        points = DEFAULT_TARGET_POINTS
+    return min(points, MAX_TARGET_POINTS)
+
+
+class BucketReducer:
+    """
+    Streaming first/min/max/last tracker over fixed-width time buckets for a
+    single series. Feed it chunks with `add`; state size is O(buckets).
+    """
+
+    def __init__(self, start: float, end: float, buckets: int):
+        self.start = start
+        self.buckets = max(1, int(buckets))
+        self.width = max(end - start, 1e-9) / self.buckets
+        n = self.buckets
+        self.count = np.zeros(n, dtype=np.int64)
+        self.first_t = np.full(n, np.inf)
+        self.first_v = np.zeros(n)
+        self.last_t = np.full(n, -np.inf)
+        self.last_v = np.zeros(n)
+        self.min_t = np.zeros(n)
+        self.min_v = np.full(n, np.inf)
+        self.max_t = np.zeros(n)
+        self.max_v = np.full(n, -np.inf)
+
+    def add(self, t: np.ndarray, v: np.ndarray):
+        if not len(t):
+            return
+        if len(t) > 1 and np.any(np.diff(t) < 0):
+            order = np.argsort(t, kind='stable')
+            t, v = t[order], v[order]
+
+        b = np.clip(((t - self.start) / self.width).astype(np.int64), 0, self.buckets - 1)
+        cuts = np.flatnonzero(np.diff(b)) + 1
+        starts = np.concatenate(([0], cuts))
+        ends = np.concatenate((cuts, [len(b)]))
+        ub = b[starts]
+
+        np.add.at(self.count, ub, ends - starts)
+
+        upd = t[starts] < self.first_t[ub]
+        self.first_t[ub[upd]] = t[starts][upd]
+        self.first_v[ub[upd]] = v[starts][upd]
+
+        upd = t[ends - 1] >= self.last_t[ub]
+        self.last_t[ub[upd]] = t[ends - 1][upd]
+        self.last_v[ub[upd]] = v[ends - 1][upd]
+
+        # Within each bucket (contiguous run of b) order by value: the first
+        # element of the run is the minimum, the last one the maximum.
+        order = np.lexsort((v, b))
+        lo, hi = order[starts], order[ends - 1]
+
+        upd = v[lo] < self.min_v[ub]
+        self.min_v[ub[upd]] = v[lo][upd]
+        self.min_t[ub[upd]] = t[lo][upd]
+
+        upd = v[hi] > self.max_v[ub]
+        self.max_v[ub[upd]] = v[hi][upd]
+        self.max_t[ub[upd]] = t[hi][upd]
+
+    def points(self, kinds: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Time-ordered, de-duplicated points of the requested kinds."""
+        filled = self.count > 0
+        ts, vs = [], []
+        for kind in kinds:
+            ts.append(getattr(self, f'{kind}_t')[filled])
+            vs.append(getattr(self, f'{kind}_v')[filled])
+        if not ts:
+            return np.empty(0), np.empty(0)
+        t = np.concatenate(ts)
+        v = np.concatenate(vs)
+        # Same instant picked twice (e.g. first == min): keep one
+        t, idx = np.unique(t, return_index=True)
+        return t, v[idx]
+
+
+def lttb(t: np.ndarray, v: np.ndarray, n: int) -> np.ndarray:
+    """Indices of `n` points picked by Largest-Triangle-Three-Buckets."""
+    size = len(t)
+    if n >= size or n < 3:
+        return np.arange(size) if n >= size else np.array([0, size - 1][:max(n, 0)], dtype=np.int64)
+
+    every = (size - 2) / (n - 2)
+    out = np.empty(n, dtype=np.int64)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        s = int(i * every) + 1
+        e = int((i + 1) * every) + 1
+        ns, ne = e, min(int((i + 2) * every) + 1, size)
+        if ns >= ne:
+            avg_t, avg_v = t[-1], v[-1]
+        else:
+            avg_t, avg_v = t[ns:ne].mean(), v[ns:ne].mean()
+        area = np.abs((t[a] - avg_t) * (v[s:e] - v[a]) - (t[a] - t[s:e]) * (avg_v - v[a]))
+        a = s + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+class SeriesReducer:
+    """
+    `reduce_chunks` one chunk at a time: `add` each `(t, names, v)` chunk as
+    it arrives, then `series` gives the reduced points per mt_name.
+    """
+
+    def __init__(self, start: float, end: float, target_points: int, algorithm: str):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown algorithm '{algorithm}'")
+        if algorithm == 'minmax':
+            self.buckets, self.kinds = max(1, target_points // 2), ('min', 'max')
+        elif algorithm == 'm4':
+            self.buckets, self.kinds = max(1, target_points // 4), ('first', 'min', 'max', 'last')
+        else:
+            self.buckets, self.kinds = target_points, ('first', 'min', 'max', 'last')
+        self.start = start
+        self.end = end
+        self.target_points = target_points
+        self.algorithm = algorithm
+        self.reducers: Dict[str, BucketReducer] = {}
+
+    def add(self, t: np.ndarray, names, v: np.ndarray):
+        uniq, inv = np.unique(np.asarray(names, dtype=object), return_inverse=True)
+        for k, name in enumerate(uniq):
+            r = self.reducers.get(name)
+            if r is None:
+                r = self.reducers[name] = BucketReducer(self.start, self.end, self.buckets)
+            mask = inv == k
+            r.add(t[mask], v[mask])
+
+    def series(self) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        out = {}
+        for name, r in self.reducers.items():
+            t, v = r.points(self.kinds)
+            if self.algorithm == 'lttb':
+                keep = lttb(t, v, self.target_points)
+                t, v = t[keep], v[keep]
+            out[name] = (t, v)
+        return out
+
+
+def reduce_chunks(chunks, start: float, end: float, target_points: int, algorithm: str) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Fold `(t, names, v)` chunks into at most `target_points` points per
+    mt_name. `t` are epoch seconds, `names` a sequence of mt_name strings and
+    `v` float values, all the same length.
+    """
+    reducer = SeriesReducer(start, end, target_points, algorithm)
+    for t, names, v in chunks:
+        reducer.add(t, names, v)
+    return reducer.series()
+
+
+def window_sql(sensor: str):
+    """Numeric `(epoch seconds, mt_name, value)` rows of `sensor` in [:start, :end], oldest first."""
+    value = numeric.value_sql(sensor)
+    return text(
+        f'''
+        SELECT EXTRACT(EPOCH FROM mt_time)::double precision AS t, mt_name, {value} AS v
+        FROM "{SCHEMA}"."{sensor}"
+        WHERE mt_time >= :start AND mt_time <= :end
+          AND {value} IS NOT NULL
+        ORDER BY mt_time ASC
+        '''
+    )
+
+
+def chunk_arrays(part) -> Tuple[np.ndarray, tuple, np.ndarray]:
+    """One fetched partition of `window_sql` rows as `(t, names, v)`."""
+    t, names, v = zip(*part)
+    return np.asarray(t, dtype=np.float64), names, np.asarray(v, dtype=np.float64)
+
+
+def window_bounds(start: datetime, end: datetime) -> Tuple[float, float]:
+    return (start - _EPOCH).total_seconds(), (end - _EPOCH).total_seconds()
+
+
+def _stream_window(conn, sensor: str, start: datetime, end: datetime):
+    result = conn.execution_options(stream_results=True, yield_per=CHUNK_ROWS).execute(
+        window_sql(sensor), {"start": start, "end": end}
+    )
+    parts = result.partitions()
+    while True:
+        # Rows arrive chunk by chunk from the server-side cursor
+        with phase('fetch'):
+            part = next(parts, None)
+        if part is None:
+            return
+        yield chunk_arrays(part)
+
+
+def downsample_series(conn, sensor: str, start: datetime, end: datetime, target_points: int, algorithm: str):
+    """
+    Reduce the numeric rows of `sensor` in [start, end] to at most
+    `target_points` points per mt_name: `{mt_name: (epoch_seconds, values)}`.
+    """
+    t0, t1 = window_bounds(start, end)
+    return reduce_chunks(_stream_window(conn, sensor, start, end), t0, t1, target_points, algorithm)
+
+
+def series_rows(series) -> list:
+    """Reduced series as rows shaped like `{mt_time, mt_name, mt_value}` ordered by time then name."""
+    rows = []
+    for name, (t, v) in series.items():
+        for ts, val in zip(t.tolist(), v.tolist()):
+            rows.append((ts, name, val))
+    rows.sort()
+    return [{
+        'mt_time': (_EPOCH + timedelta(seconds=ts)).isoformat(),
+        'mt_name': name,
+        'mt_value': val,
+    } for ts, name, val in rows]
+
+
+def series_columns(series) -> list:
+    """
+    Reduced series as mt_time/mt_name/mt_value columns for the binary
+    formats; points are grouped per mt_name, time-ordered within each name.
+    """
+    names = sorted(series)
+    if not names:
+        return [columnar.time_column('mt_time', []), columnar.dict_column('mt_name', []), columnar.float_column('mt_value', [])]
+    t = np.concatenate([series[n][0] for n in names])
+    v = np.concatenate([series[n][1] for n in names])
+    codes = np.repeat(np.arange(len(names), dtype='<u4'), [len(series[n][0]) for n in names])
+    return [
+        columnar.time_column('mt_time', np.rint(t * 1000)),
+        columnar.Column('mt_name', 'dict32', codes, dictionary=names),
+        columnar.float_column('mt_value', v),
+    ]
+
+
+def downsample_table(conn, sensor: str, start: datetime, end: datetime, target_points: int, algorithm: str) -> list:
+    """`downsample_series` as `series_rows`."""
+    return series_rows(downsample_series(conn, sensor, start, end, target_points, algorithm))
+
+
+def downsample_columns(conn, sensor: str, start: datetime, end: datetime, target_points: int, algorithm: str) -> list:
+    """`downsample_series` as `series_columns`."""
+    return series_columns(downsample_series(conn, sensor, start, end, target_points, algorithm))
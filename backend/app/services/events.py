@@ -0,0 +1,343 @@
+"""Valve open-time limit violations derived incrementally from the sensXX tables.
+
+Each manifest sensor (services/locations.py) with a `limit` is watched on its
+EVENTS_CHANNEL mt_name (`KG2.SZ5.I1` by default): a non-zero value means the
+valve is open. Past a per-table watermark, only the rows where a channel
+changes state are read (LAG over mt_time, so a steady channel costs nothing
+on the wire) and fed through a small state machine. An interval that stays
+open longer than the limit becomes a row in `mtrix_events`; while it is still
+open the row has no `ended_at` and its duration is measured up to the
+channel's newest reading, and it is completed when the valve closes. Open intervals and
+watermarks live in `mtrix_event_open` / `mtrix_event_state`, so every scan
+resumes where the last one stopped. As with rollups, rows inserted behind the
+watermark are not seen until `flask events rebuild`.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+from backend.app.services.catalog import catalog, SCHEMA
+from backend.app.services.locations import locations
+from backend.app.services.numeric import value_sql
+from backend.app.utils.config import settings
+
+log = logging.getLogger(__name__)
+
+EVENTS_TABLE = 'mtrix_events'
+STATE_TABLE = 'mtrix_event_state'
+OPEN_TABLE = 'mtrix_event_open'
+
+KIND_OPEN_LIMIT = 'open_limit'
+
+# Source data scanned per transaction
+_STEP = timedelta(days=7)
+
+EVENT_COLUMNS = (
+    'id', 'table_name', 'mt_name', 'location', 'sensor_idx', 'code', 'kind',
+    'started_at', 'ended_at', 'duration_seconds', 'limit_seconds',
+)
+
+
+class EventEngine:
+    """Scans sensor tables for open-time limit violations and serves the stored events."""
+
+    def __init__(self):
+        self._app = None
+        self._thread = None
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions['events'] = self
+        interval = int(getattr(settings, 'EVENTS_REFRESH_SECONDS', 0) or 0)
+        if interval > 0:
+            self._thread = threading.Thread(
+                target=self._run, args=(interval,), name="event-scanner", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, interval: int):
+        while True:
+            time.sleep(interval)
+            try:
+                with self._app.app_context():
+                    self.refresh_all()
+            except Exception:
+                log.exception("Event scan failed")
+
+    # ---- maintenance -------------------------------------------------------
+
+    def ensure_tables(self, conn):
+        conn.execute(text(
+            f'''
+            CREATE TABLE IF NOT EXISTS "{SCHEMA}"."{EVENTS_TABLE}" (
+                id bigserial PRIMARY KEY,
+                table_name text NOT NULL,
+                mt_name text NOT NULL,
+                location text,
+                sensor_idx integer,
+                code text,
+                kind text NOT NULL,
+                started_at timestamp NOT NULL,
+                ended_at timestamp,
+                duration_seconds double precision NOT NULL,
+                limit_seconds double precision NOT NULL,
+                detected_at timestamptz NOT NULL DEFAULT now(),
+                UNIQUE (table_name, mt_name, kind, started_at)
+            )
+            '''
+        ))
+        conn.execute(text(
+            f'CREATE INDEX IF NOT EXISTS "{EVENTS_TABLE}_started_at_idx" '
+            f'ON "{SCHEMA}"."{EVENTS_TABLE}" (started_at DESC)'
+        ))
+        conn.execute(text(
+            f'''
+            CREATE TABLE IF NOT EXISTS "{SCHEMA}"."{STATE_TABLE}" (
+                table_name text PRIMARY KEY,
+                watermark timestamp,
+                updated_at timestamptz NOT NULL DEFAULT now()
+            )
+            '''
+        ))
+        conn.execute(text(
+            f'''
+            CREATE TABLE IF NOT EXISTS "{SCHEMA}"."{OPEN_TABLE}" (
+                table_name text NOT NULL,
+                mt_name text NOT NULL,
+                open_since timestamp NOT NULL,
+                last_seen timestamp NOT NULL,
+                PRIMARY KEY (table_name, mt_name)
+            )
+            '''
+        ))
+
+    def refresh_all(self):
+        for info in catalog.tables():
+            try:
+                self.refresh_table(info.table)
+            except Exception:
+                log.exception("Event scan failed for %s", info.table)
+
+    def refresh_table(self, sensor: str) -> int:
+        """Scan `sensor` up to its current MAX(mt_time); returns the number of events written."""
+        from backend.app import db
+
+        watched = locations.channels(sensor, getattr(settings, 'EVENTS_CHANNEL', 'I1') or 'I1')
+        limits = {name: s for name, (loc, s) in watched.items() if s.limit}
+        if not limits:
+            return 0
+        names = sorted(limits)
+
+        with db.engine.begin() as conn:
+            self.ensure_tables(conn)
+            upto = conn.execute(text(f'SELECT MAX(mt_time) FROM "{SCHEMA}"."{sensor}"')).scalar()
+            watermark = conn.execute(
+                text(f'SELECT watermark FROM "{SCHEMA}"."{STATE_TABLE}" WHERE table_name = :t'), {"t": sensor}
+            ).scalar()
+            if watermark is None:
+                first = conn.execute(
+                    text(f'SELECT MIN(mt_time) FROM "{SCHEMA}"."{sensor}" WHERE mt_name = ANY(:names)'),
+                    {"names": names},
+                ).scalar()
+                # Strict lower bound: start just before the first watched row
+                watermark = first - timedelta(microseconds=1) if first is not None else None
+            # Channels whose limit was removed or renamed are dropped; _write_state deletes their rows
+            open_since = {name: (since, seen) for name, since, seen in conn.execute(
+                text(f'SELECT mt_name, open_since, last_seen FROM "{SCHEMA}"."{OPEN_TABLE}" WHERE table_name = :t'),
+                {"t": sensor},
+            ) if name in limits}
+        if upto is None or watermark is None or watermark >= upto:
+            return 0
+
+        written = 0
+        lo = watermark
+        while lo < upto:
+            hi = min(lo + _STEP, upto)
+            with db.engine.begin() as conn:
+                transitions = self._transitions(conn, sensor, names, lo, hi)
+                events = self._apply(transitions, open_since, limits, watched)
+                events += self._ongoing(open_since, limits, watched)
+                self._write_events(conn, sensor, events)
+                self._write_state(conn, sensor, open_since, hi)
+            written += len(events)
+            lo = hi
+        return written
+
+    def rebuild_table(self, sensor: str) -> int:
+        """Forget `sensor`'s events and scan state, then scan its whole history again."""
+        from backend.app import db
+
+        with db.engine.begin() as conn:
+            self.ensure_tables(conn)
+            for table in (EVENTS_TABLE, STATE_TABLE, OPEN_TABLE):
+                conn.execute(text(f'DELETE FROM "{SCHEMA}"."{table}" WHERE table_name = :t'), {"t": sensor})
+        return self.refresh_table(sensor)
+
+    def rewind(self, conn, sensor: str, since: datetime):
+        """Rescan `sensor` from its start when rows at or before the watermark were added."""
+        self.ensure_tables(conn)
+        watermark = conn.execute(
+            text(f'SELECT watermark FROM "{SCHEMA}"."{STATE_TABLE}" WHERE table_name = :t'), {"t": sensor}
+        ).scalar()
+        if watermark is not None and since <= watermark:
+            # Open intervals cannot be reconstructed mid-stream, so start over
+            for table in (EVENTS_TABLE, STATE_TABLE, OPEN_TABLE):
+                conn.execute(text(f'DELETE FROM "{SCHEMA}"."{table}" WHERE table_name = :t'), {"t": sensor})
+
+    @staticmethod
+    def _transitions(conn, sensor: str, names: List[str], lo: datetime, hi: datetime):
+        """
+        (mt_name, mt_time, is_open) rows in (lo, hi] where a channel's state
+        changes, plus each channel's last row (how long an open valve has been seen open).
+        """
+        value = value_sql(sensor)
+        return conn.execute(text(
+            f'''
+            SELECT mt_name, mt_time, is_open
+            FROM (
+                SELECT mt_name, mt_time, is_open,
+                       LAG(is_open) OVER w AS prev,
+                       LEAD(mt_time) OVER w AS next_time
+                FROM (
+                    SELECT mt_name, mt_time, ({value}) <> 0 AS is_open
+                    FROM "{SCHEMA}"."{sensor}"
+                    WHERE mt_name = ANY(:names) AND mt_time > :lo AND mt_time <= :hi
+                ) r
+                WHERE is_open IS NOT NULL
+                WINDOW w AS (PARTITION BY mt_name ORDER BY mt_time)
+            ) s
+            WHERE prev IS NULL OR is_open <> prev OR next_time IS NULL
+            ORDER BY mt_name, mt_time
+            '''
+        ), {"names": names, "lo": lo, "hi": hi}).all()
+
+    @staticmethod
+    def _event(name, started, ended, duration, watched) -> dict:
+        location, map_sensor = watched[name]
+        return {
+            'mt_name': name,
+            'location': location.name,
+            'sensor_idx': map_sensor.idx,
+            'code': map_sensor.code,
+            'kind': KIND_OPEN_LIMIT,
+            'started_at': started,
+            'ended_at': ended,
+            'duration_seconds': duration,
+            'limit_seconds': float(map_sensor.limit),
+        }
+
+    def _apply(self, transitions, open_since: Dict[str, tuple], limits, watched) -> List[dict]:
+        """Advance the per-channel state machine; closed intervals over the limit become events."""
+        events = []
+        for name, t, is_open in transitions:
+            started = open_since.get(name, (None,))[0]
+            if is_open:
+                open_since[name] = (started or t, t)
+            elif started is not None:
+                del open_since[name]
+                duration = (t - started).total_seconds()
+                if duration > limits[name].limit:
+                    events.append(self._event(name, started, t, duration, watched))
+        return events
+
+    def _ongoing(self, open_since: Dict[str, tuple], limits, watched) -> List[dict]:
+        """Still-open intervals already over the limit, measured up to the last open reading."""
+        events = []
+        for name, (started, seen) in open_since.items():
+            duration = (seen - started).total_seconds()
+            if duration > limits[name].limit:
+                events.append(self._event(name, started, None, duration, watched))
+        return events
+
+    @staticmethod
+    def _write_events(conn, sensor: str, events: List[dict]):
+        if not events:
+            return
+        conn.execute(text(
+            f'''
+            INSERT INTO "{SCHEMA}"."{EVENTS_TABLE}"
+                (table_name, mt_name, location, sensor_idx, code, kind, started_at, ended_at,
+                 duration_seconds, limit_seconds)
+            VALUES (:table_name, :mt_name, :location, :sensor_idx, :code, :kind, :started_at, :ended_at,
+                    :duration_seconds, :limit_seconds)
+            ON CONFLICT (table_name, mt_name, kind, started_at) DO UPDATE SET
+                ended_at = EXCLUDED.ended_at,
+                duration_seconds = EXCLUDED.duration_seconds,
+                limit_seconds = EXCLUDED.limit_seconds,
+                detected_at = now()
+            '''
+        ), [{'table_name': sensor, **e} for e in events])
+
+    @staticmethod
+    def _write_state(conn, sensor: str, open_since: Dict[str, tuple], watermark: datetime):
+        conn.execute(text(f'DELETE FROM "{SCHEMA}"."{OPEN_TABLE}" WHERE table_name = :t'), {"t": sensor})
+        if open_since:
+            conn.execute(
+                text(
+                    f'INSERT INTO "{SCHEMA}"."{OPEN_TABLE}" (table_name, mt_name, open_since, last_seen) '
+                    'VALUES (:t, :n, :s, :seen)'
+                ),
+                [{"t": sensor, "n": n, "s": s, "seen": seen} for n, (s, seen) in open_since.items()],
+            )
+        conn.execute(
+            text(
+                f'''
+                INSERT INTO "{SCHEMA}"."{STATE_TABLE}" (table_name, watermark, updated_at)
+                VALUES (:t, :wm, now())
+                ON CONFLICT (table_name) DO UPDATE SET watermark = EXCLUDED.watermark, updated_at = now()
+                '''
+            ),
+            {"t": sensor, "wm": watermark},
+        )
+
+    # ---- query path --------------------------------------------------------
+
+    def query(self, conn, sensor: Optional[str] = None, location: Optional[str] = None,
+              names: Optional[List[str]] = None, start: Optional[datetime] = None,
+              end: Optional[datetime] = None, ongoing: bool = False, limit: int = 500) -> List[dict]:
+        """Stored events, newest first; intervals overlapping [start, end] when given."""
+        if not conn.execute(text("SELECT to_regclass(:name)"), {"name": f'"{SCHEMA}"."{EVENTS_TABLE}"'}).scalar():
+            return []
+        where, params = [], {"limit": limit}
+        if sensor:
+            where.append('table_name = :sensor')
+            params['sensor'] = sensor
+        if location:
+            where.append('lower(location) = lower(:location)')
+            params['location'] = location
+        if names:
+            where.append('mt_name = ANY(:names)')
+            params['names'] = list(names)
+        if start:
+            where.append('(ended_at IS NULL OR ended_at >= :start)')
+            params['start'] = start
+        if end:
+            where.append('started_at <= :end')
+            params['end'] = end
+        if ongoing:
+            where.append('ended_at IS NULL')
+        where_sql = ('WHERE ' + ' AND '.join(where)) if where else ''
+        rows = conn.execute(text(
+            f'''
+            SELECT {', '.join(EVENT_COLUMNS)}
+            FROM "{SCHEMA}"."{EVENTS_TABLE}"
+            {where_sql}
+            ORDER BY started_at DESC, id DESC
+            LIMIT :limit
+            '''
+        ), params).mappings().all()
+        return [dict(r) for r in rows]
+
+    def watermarks(self, conn) -> Dict[str, datetime]:
+        if not conn.execute(text("SELECT to_regclass(:name)"), {"name": f'"{SCHEMA}"."{STATE_TABLE}"'}).scalar():
+            return {}
+        rows = conn.execute(text(f'SELECT table_name, watermark FROM "{SCHEMA}"."{STATE_TABLE}"'))
+        return {t: wm for t, wm in rows if wm is not None}
+
+
+events = EventEngine()
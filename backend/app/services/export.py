@@ -0,0 +1,79 @@
+"""Streaming NDJSON/CSV export of sensor rows.
+
+Rows are read through a named (server-side) cursor `FETCH_ROWS` at a time and
+written out chunk by chunk, so worker memory stays flat however many rows the
+query returns and the first bytes leave before the query is exhausted. The
+ASGI app streams the same statements through `encoder` on its async engine.
+"""
+
+import csv
+import io
+import json
+
+from flask import Response, stream_with_context
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+# Rows fetched per round trip from the server-side cursor
+FETCH_ROWS = 5000
+
+COLUMNS = ('mt_name', 'mt_value', 'mt_time', 'mt_quality')
+
+MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _ndjson_chunk(rows) -> str:
+    return ''.join(
+        json.dumps({'mt_name': n, 'mt_value': v, 'mt_time': _iso(t), 'mt_quality': q}) + '\n'
+        for n, v, t, q in rows
+    )
+
+
+def _csv_chunk(rows) -> str:
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator='\n')
+    w.writerows((n, v, _iso(t), q) for n, v, t, q in rows)
+    return buf.getvalue()
+
+
+def encoder(fmt: str):
+    """`(header, encode)` for `fmt`: the text written before the rows and the chunk encoder."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'")
+    if fmt == 'csv':
+        return ','.join(COLUMNS) + '\n', _csv_chunk
+    return '', _ndjson_chunk
+
+
+def headers(fmt: str, filename: str) -> dict:
+    return {'Content-Disposition': f'attachment; filename="{filename}.{fmt}"'}
+
+
+def stream_export(stmt, fmt: str, filename: str, params=None, engine=None) -> Response:
+    """
+    Stream the result of `stmt` as NDJSON or CSV. `stmt` must select
+    mt_name, mt_value, mt_time, mt_quality in that order. The rows are read
+    after the view has returned, so the engine (the request's replica, see
+    services/replicas.py) is picked here; `engine` overrides it.
+    """
+    from backend.app.services.replicas import replicas
+
+    engine = engine or replicas.engine()
+    header, encode = encoder(fmt)
+
+    def generate():
+        if header:
+            yield header
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=FETCH_ROWS).execute(stmt, params or {})
+            for part in result.partitions():
+                yield encode(part)
+
+    return Response(stream_with_context(generate()), mimetype=MIMETYPES[fmt], headers=headers(fmt, filename))
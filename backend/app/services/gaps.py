@@ -0,0 +1,283 @@
+"""Communication gaps: intervals of at least `min_gap` seconds without a reading.
+
+Gaps are found per mt_name (`by='name'`) or across the whole table
+(`by='table'`, i.e. the collector itself went silent) in one pass: LAG/LEAD
+over mt_time keep only the readings that open or close a gap plus the first
+and last reading of each series, so a year-long report transfers a handful of
+rows instead of the history. When a rollup tier at most a quarter of `min_gap`
+wide covers the window and condenses the data (at least `_MIN_ROWS_PER_BUCKET`
+readings per series and bucket, estimated from the catalog), the pass runs over its whole buckets inside the
+window (the partial buckets at either edge and everything past the tier
+watermark come from the raw table, bucketed on the fly) and each candidate's
+exact edges are then read with index seeks into the raw table.
+
+Gaps are clipped to [start, end]: a series that starts late or stops early
+gets a `leading` / `trailing` gap bounded by the window, and a series that
+reported nothing in the window (when its mt_name is known) is one gap over
+the whole of it.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+from backend.app.services.catalog import catalog, SCHEMA
+from backend.app.services.metrics import phase
+from backend.app.services.rollups import TIERS, _bucket_expr, _floor, rollup_table, rollups
+
+GAP_BY = ('name', 'table')
+
+DEFAULT_MIN_GAP = 600
+
+# Boundary rows read per table; reports past it come back truncated
+MAX_GAP_ROWS = 200_000
+
+# A tier is used only when it is at most this fraction of min_gap wide
+_TIER_FRACTION = 4
+
+# ... and only when its buckets hold about this many readings per series
+_MIN_ROWS_PER_BUCKET = 10
+
+
+def _gap(name, start: datetime, end: datetime, leading=False, trailing=False) -> dict:
+    return {
+        'mt_name': name,
+        'start': start,
+        'end': end,
+        'seconds': (end - start).total_seconds(),
+        'leading': leading,
+        'trailing': trailing,
+    }
+
+
+def _boundary_sql(source: str, time_col: str, by: str) -> str:
+    """LAG/LEAD pass over `source` keeping gap edges and each series' first and last row."""
+    partition = 'PARTITION BY mt_name ' if by == 'name' else ''
+    name_col = 'mt_name' if by == 'name' else 'NULL::text'
+    return f'''
+        SELECT name, prev, t, nxt
+        FROM (
+            SELECT {name_col} AS name, {time_col} AS t,
+                   LAG({time_col}) OVER w AS prev,
+                   LEAD({time_col}) OVER w AS nxt
+            FROM {source}
+            WINDOW w AS ({partition}ORDER BY {time_col})
+        ) s
+        WHERE prev IS NULL OR nxt IS NULL OR t - prev >= make_interval(secs => :threshold)
+        ORDER BY name, t
+        LIMIT :max_rows
+    '''
+
+
+def _name_filter(names: Sequence[str]) -> str:
+    return 'AND mt_name = ANY(:names)' if names else ''
+
+
+def _series_gaps(rows, start: datetime, end: datetime, min_gap: float) -> List[dict]:
+    """Gaps from exact (name, prev, t, nxt) boundary rows."""
+    gap = timedelta(seconds=min_gap)
+    out = []
+    for name, prev, t, nxt in rows:
+        if prev is None:
+            if t - start >= gap:
+                out.append(_gap(name, start, t, leading=True))
+        elif t - prev >= gap:
+            out.append(_gap(name, prev, t))
+        if nxt is None and end - t >= gap:
+            out.append(_gap(name, t, end, trailing=True))
+    return out
+
+
+def raw_gaps(conn, sensor: str, start: datetime, end: datetime, min_gap: float,
+             names: Sequence[str] = (), by: str = 'name') -> Tuple[List[dict], bool, set]:
+    """(gaps, truncated, names with a reading in the window)."""
+    source = f'''(
+        SELECT mt_name, mt_time FROM "{SCHEMA}"."{sensor}"
+        WHERE mt_time >= :start AND mt_time <= :end {_name_filter(names)}
+    ) r'''
+    result = conn.execute(text(_boundary_sql(source, 'mt_time', by)), {
+        'start': start, 'end': end, 'names': list(names), 'threshold': min_gap, 'max_rows': MAX_GAP_ROWS,
+    })
+    with phase('fetch'):
+        rows = result.all()
+    return _series_gaps(rows, start, end, min_gap), len(rows) >= MAX_GAP_ROWS, {r[0] for r in rows}
+
+
+def _seek(conn, sensor: str, by: str, lookups: List[tuple], newest: bool, start: datetime, end: datetime,
+          names: Sequence[str] = ()) -> List:
+    """
+    Oldest (or newest) reading per (name, lo, hi) lookup, each one an index
+    seek. With by='table' the seek spans the `names` filter, like the raw pass.
+    """
+    if not lookups:
+        return []
+    if by == 'name':
+        name_sql = 'mt_name = k.n AND '
+    else:
+        name_sql = 'mt_name = ANY(:filter) AND ' if names else ''
+    agg = 'MAX' if newest else 'MIN'
+    keys, los, his = zip(*lookups)
+    rows = conn.execute(text(f'''
+        SELECT k.i, (
+            SELECT {agg}(mt_time) FROM "{SCHEMA}"."{sensor}"
+            WHERE {name_sql}mt_time >= k.lo AND mt_time < k.hi AND mt_time >= :start AND mt_time <= :end
+        )
+        FROM unnest(CAST(:names AS text[]), CAST(:los AS timestamp[]), CAST(:his AS timestamp[]))
+             WITH ORDINALITY AS k(n, lo, hi, i)
+    '''), {'names': list(keys), 'los': list(los), 'his': list(his), 'start': start, 'end': end, 'filter': list(names)})
+    found = dict(rows.all())
+    return [found.get(i + 1) for i in range(len(lookups))]
+
+
+def _condenses(sensor: str, width: int, series: int) -> bool:
+    """Whether a `width`-second bucket holds enough readings per series to beat the raw scan."""
+    info = catalog.get(sensor)
+    if info is None or not info.approx_rows or not info.min_time or not info.max_time:
+        return False
+    span = (info.max_time - info.min_time).total_seconds()
+    return span > 0 and info.approx_rows * width / span / max(series, 1) >= _MIN_ROWS_PER_BUCKET
+
+
+def rollup_gaps(conn, sensor: str, start: datetime, end: datetime, min_gap: float,
+                names: Sequence[str] = (), by: str = 'name', series: int = 1) -> Optional[Tuple[List[dict], bool, set, str]]:
+    """
+    (gaps, truncated, names seen, tier) over the widest usable rollup tier;
+    None when none applies. `series` is the number of mt_names in the table.
+    """
+    picked = rollups.pick_tier(conn, sensor, int(min_gap // _TIER_FRACTION))
+    if picked is None:
+        return None
+    tier, width, watermark = picked
+    if not _condenses(sensor, width, series):
+        return None
+    w = timedelta(seconds=width)
+    # Whole tier buckets inside [start, end] below the watermark; the rest is read raw
+    tier_start = _floor(start, width) + (w if _floor(start, width) < start else timedelta(0))
+    tier_end = min(_floor(watermark, width), _floor(end, width))
+    if tier_end <= tier_start:
+        return None
+
+    name_sql = _name_filter(names)
+    source = f'''(
+        SELECT mt_name, bucket_start AS b FROM "{SCHEMA}"."{rollup_table(sensor, tier)}"
+        WHERE bucket_start >= :tier_start AND bucket_start < :tier_end {name_sql}
+        UNION
+        SELECT mt_name, {_bucket_expr('mt_time', width)} FROM "{SCHEMA}"."{sensor}"
+        WHERE mt_time >= :start AND mt_time <= :end AND (mt_time < :tier_start OR mt_time >= :tier_end) {name_sql}
+    ) r'''
+    result = conn.execute(text(_boundary_sql(source, 'b', by)), {
+        'start': start, 'end': end, 'tier_start': tier_start, 'tier_end': tier_end,
+        'names': list(names), 'threshold': max(min_gap - width, 0), 'max_rows': MAX_GAP_ROWS,
+    })
+    with phase('fetch'):
+        rows = result.all()
+
+    # Exact edges: newest reading of the bucket before a candidate, oldest of the bucket after
+    gap = timedelta(seconds=min_gap)
+    newest, oldest, plan = [], [], []
+    for name, prev, b, nxt in rows:
+        if prev is None:
+            if b + w - start >= gap:
+                plan.append(('leading', name, None, len(oldest)))
+                oldest.append((name, b, b + w))
+        elif b + w - prev > gap:
+            plan.append(('inner', name, len(newest), len(oldest)))
+            newest.append((name, prev, prev + w))
+            oldest.append((name, b, b + w))
+        if nxt is None and end - b >= gap:
+            plan.append(('trailing', name, len(newest), None))
+            newest.append((name, b, b + w))
+
+    last_of = _seek(conn, sensor, by, newest, True, start, end, names)
+    first_of = _seek(conn, sensor, by, oldest, False, start, end, names)
+    out = []
+    for kind, name, i, j in plan:
+        if kind == 'leading':
+            t = first_of[j]
+            if t is not None and t - start >= gap:
+                out.append(_gap(name, start, t, leading=True))
+        elif kind == 'inner':
+            lo, hi = last_of[i], first_of[j]
+            if lo is not None and hi is not None and hi - lo >= gap:
+                out.append(_gap(name, lo, hi))
+        else:
+            t = last_of[i]
+            if t is not None and end - t >= gap:
+                out.append(_gap(name, t, end, trailing=True))
+    out.sort(key=lambda g: (g['mt_name'] or '', g['start']))
+    return out, len(rows) >= MAX_GAP_ROWS, {r[0] for r in rows}, tier
+
+
+def distinct_names(conn, sensor: str) -> List[str]:
+    """
+    Every mt_name of the table: a skip scan over the (mt_name, ...) index when
+    there is one, else the coarsest rollup tier plus the raw rows past its
+    watermark, else a plain DISTINCT.
+    """
+    info = catalog.get(sensor)
+    if info is not None and info.has_name_index:
+        sql = f'''
+            WITH RECURSIVE names AS (
+                (SELECT mt_name FROM "{SCHEMA}"."{sensor}" ORDER BY mt_name LIMIT 1)
+                UNION ALL
+                SELECT (SELECT t.mt_name FROM "{SCHEMA}"."{sensor}" t
+                        WHERE t.mt_name > names.mt_name ORDER BY t.mt_name LIMIT 1)
+                FROM names WHERE names.mt_name IS NOT NULL
+            )
+            SELECT mt_name FROM names WHERE mt_name IS NOT NULL
+        '''
+        params = {}
+    else:
+        state = rollups.watermarks(conn)
+        tier = next((t for t, _, _ in reversed(TIERS) if (sensor, t) in state), None)
+        if tier is not None:
+            sql = f'''
+                SELECT mt_name FROM "{SCHEMA}"."{rollup_table(sensor, tier)}"
+                UNION
+                SELECT mt_name FROM "{SCHEMA}"."{sensor}" WHERE mt_time >= :watermark AND mt_name IS NOT NULL
+            '''
+            params = {'watermark': state[(sensor, tier)]}
+        else:
+            sql = f'SELECT DISTINCT mt_name FROM "{SCHEMA}"."{sensor}" WHERE mt_name IS NOT NULL'
+            params = {}
+    with phase('fetch'):
+        return sorted(r[0] for r in conn.execute(text(sql), params))
+
+
+def find_gaps(conn, sensor: str, start: datetime, end: datetime, min_gap: float = DEFAULT_MIN_GAP,
+              names: Sequence[str] = (), by: str = 'name', known_names: Sequence[str] = (),
+              use_rollups: bool = True) -> dict:
+    """
+    Gap report for one table. `known_names` (every mt_name the table has ever
+    reported, see `distinct_names`) lets series that were silent for the whole window show up.
+    """
+    found = None
+    if use_rollups:
+        found = rollup_gaps(conn, sensor, start, end, min_gap, names, by, series=len(known_names) or 1)
+    if found is None:
+        gaps, truncated, seen = raw_gaps(conn, sensor, start, end, min_gap, names, by)
+        source = 'raw'
+    else:
+        gaps, truncated, seen, tier = found
+        source = f'rollup_{tier}'
+
+    # Series without a single reading in the window
+    expected = [None] if by == 'table' else (names or known_names)
+    if not truncated and (end - start).total_seconds() >= min_gap:
+        gaps.extend(_gap(n, start, end, leading=True, trailing=True) for n in expected if n not in seen)
+        gaps.sort(key=lambda g: (g['mt_name'] or '', g['start']))
+
+    return {
+        'source': source,
+        'gaps': gaps,
+        'total_seconds': sum(g['seconds'] for g in gaps),
+        'truncated': truncated,
+    }
+
+
+def serialize(report: Dict) -> Dict:
+    return {
+        **report,
+        'gaps': [{**g, 'start': g['start'].isoformat(), 'end': g['end'].isoformat()} for g in report['gaps']],
+    }
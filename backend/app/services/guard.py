@@ -0,0 +1,139 @@
+"""Result-size guard for history reads that have no effective row limit.
+
+/sensor-data/filtered and /recent return every matching row and by-table takes
+any `limit`, so one careless request can pull millions of rows into a worker.
+Before such a read runs, its result is estimated:
+
+  1. from the catalog: the table's row count spread evenly over its
+     [min_time, max_time] span, times the part of it the window covers;
+  2. only when that exceeds `QUERY_MAX_ROWS`, from the planner: the row
+     estimate of `EXPLAIN` for the read's WHERE clause (planning only, the
+     query is not run), which accounts for name filters and skewed history.
+
+A read still estimated above the limit is switched to AVG/MIN/MAX buckets
+over its window (rollups when they apply), marked with `X-Query-Guard:
+downsampled` and `X-Estimated-Rows`, or rejected with a 400 suggesting
+downsample=1 when `QUERY_GUARD_MODE=reject`. Cursor/offset pages are always
+rejected, since buckets cannot continue a page. Streaming exports
+(`format=`) keep memory flat and are not guarded.
+"""
+
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+
+from backend.app.services.catalog import catalog, SCHEMA
+from backend.app.utils.config import settings
+
+GUARD_MODES = ('downsample', 'reject')
+
+# Buckets a downgraded read is reduced to (the by-table default)
+TARGET_POINTS = 2000
+
+
+class QueryTooLarge(ValueError):
+    def __init__(self, estimate: 'Estimate', max_rows: int):
+        self.estimate = estimate
+        super().__init__(
+            f'Request would return about {estimate.rows:,} rows (limit {max_rows:,}); '
+            f'add downsample=1 with start and end, narrow the window or lower limit, '
+            f'or stream it with format=csv|ndjson'
+        )
+
+
+@dataclass
+class Estimate:
+    rows: int
+    source: str  # 'catalog' or 'plan'
+
+    def headers(self) -> dict:
+        return {'X-Query-Guard': 'downsampled', 'X-Estimated-Rows': str(self.rows)}
+
+
+def max_rows() -> int:
+    return int(getattr(settings, 'QUERY_MAX_ROWS', 0) or 0)
+
+
+def mode() -> str:
+    value = (getattr(settings, 'QUERY_GUARD_MODE', '') or 'downsample').lower()
+    return value if value in GUARD_MODES else 'downsample'
+
+
+def catalog_rows(sensor: str, start: Optional[datetime], end: Optional[datetime]) -> Optional[int]:
+    """Rows in [start, end] assuming the table's rows are spread evenly over its span."""
+    info = catalog.get(sensor)
+    if info is None or info.approx_rows is None or not info.min_time or not info.max_time:
+        return None
+    span = (info.max_time - info.min_time).total_seconds()
+    if span <= 0:
+        return info.approx_rows
+    lo = max(start, info.min_time) if start else info.min_time
+    hi = min(end, info.max_time) if end else info.max_time
+    return int(info.approx_rows * max((hi - lo).total_seconds(), 0) / span)
+
+
+def plan_rows(conn, sensor: str, where_sql: str, params: dict) -> int:
+    plan = conn.execute(
+        text(f'EXPLAIN (FORMAT JSON) SELECT 1 FROM "{SCHEMA}"."{sensor}" {where_sql}'), params
+    ).scalar()
+    if isinstance(plan, str):  # asyncpg leaves json undecoded
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimate(conn, sensor: str, where_sql: str, params: dict,
+             start: Optional[datetime], end: Optional[datetime], limit: Optional[int] = None) -> Estimate:
+    """Rows the read would return, capped at `limit`; the planner is asked only past QUERY_MAX_ROWS."""
+    rows = catalog_rows(sensor, start, end)
+    if rows is not None and min(rows, limit or rows) <= max_rows():
+        return Estimate(min(rows, limit or rows), 'catalog')
+    rows = plan_rows(conn, sensor, where_sql, params)
+    return Estimate(min(rows, limit or rows), 'plan')
+
+
+def window(sensor: str, start: Optional[datetime], end: Optional[datetime]) -> Tuple[datetime, datetime]:
+    """[start, end] with open ends closed at the table's first/last reading."""
+    info = catalog.get(sensor)
+    start = start or (info.min_time if info else None) or datetime.utcnow()
+    end = end or (info.max_time if info else None) or datetime.utcnow()
+    return start, max(start, end)
+
+
+def check(conn, sensor: str, where_sql: str, params: dict, start: Optional[datetime], end: Optional[datetime],
+          limit: Optional[int] = None, paging: bool = False) -> Optional[Estimate]:
+    """
+    None when the read may run as asked; else its estimate, and the caller
+    serves buckets over `window(...)` instead. Raises QueryTooLarge in
+    reject mode or when the read continues a page (`paging`).
+    """
+    cap = max_rows()
+    if not cap or (limit is not None and limit <= cap):
+        return None
+    found = estimate(conn, sensor, where_sql, params, start, end, limit)
+    if found.rows <= cap:
+        return None
+    if mode() == 'reject' or paging:
+        raise QueryTooLarge(found, cap)
+    return found
+
+
+def guard_by_table(conn, args) -> Optional[Estimate]:
+    """
+    Apply `check` to parsed by-table args (services/queries.py ByTableArgs);
+    a downgraded request has its args switched to bucketed downsampling.
+    """
+    if args.downsample:
+        return None
+    paging = bool(args.cursor or args.offset or args.after or args.before)
+    found = check(conn, args.sensor, args.where_sql, args.params, args.start, args.end,
+                  limit=args.limit, paging=paging)
+    if found is None:
+        return None
+    args.start, args.end = window(args.sensor, args.start, args.end)
+    args.where_sql = 'WHERE mt_time >= :start AND mt_time <= :end'
+    args.params = {'start': args.start, 'end': args.end}
+    args.downsample, args.algorithm, args.target_points = True, None, TARGET_POINTS
+    return found
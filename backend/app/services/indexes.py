@@ -0,0 +1,107 @@
+"""Index advisor for sensXX tables.
+
+Every query path filters or orders on `mt_time`, and `/filtered`, the
+last-value cache and the keyset cursor also key on `mt_name`, so each sensor
+table should carry a btree on `(mt_time)` and one on `(mt_name, mt_time)`
+(a primary key with those columns counts). A BRIN index on `mt_time` is an
+optional, much smaller companion for very large append-only tables.
+
+The advisor works from the index list the catalog already discovers, so
+`/health` can report index health without extra queries. Missing indexes are
+built with `CREATE INDEX CONCURRENTLY`, which does not block writers but
+cannot run inside a transaction.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import List
+
+from sqlalchemy import text
+
+from backend.app.services.catalog import SCHEMA, TableInfo
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    key: str
+    method: str
+    columns: tuple
+
+    def index_name(self, table: str) -> str:
+        return f"{table}_{self.key}_idx"
+
+    def satisfied_by(self, info: TableInfo) -> bool:
+        # A btree also serves queries on a prefix of its key columns
+        n = len(self.columns)
+        return any(
+            i.usable and i.method == self.method and i.columns[:n] == self.columns
+            for i in info.indexes
+        )
+
+
+REQUIRED = (
+    IndexSpec('mt_time', 'btree', ('mt_time',)),
+    IndexSpec('mt_name_mt_time', 'btree', ('mt_name', 'mt_time')),
+)
+
+BRIN = IndexSpec('mt_time_brin', 'brin', ('mt_time',))
+
+
+def wanted(brin: bool = False) -> tuple:
+    return REQUIRED + (BRIN,) if brin else REQUIRED
+
+
+def missing(info: TableInfo, brin: bool = False) -> List[IndexSpec]:
+    return [spec for spec in wanted(brin) if not spec.satisfied_by(info)]
+
+
+def health(info: TableInfo) -> dict:
+    """Per-table index health summary."""
+    return {
+        "ok": not missing(info),
+        "missing": [spec.key for spec in missing(info)],
+        "brin": BRIN.satisfied_by(info),
+        "invalid": [i.name for i in info.indexes if not i.usable],
+    }
+
+
+def summary(infos: List[TableInfo]) -> dict:
+    """Compact cross-table summary for /health: only unhealthy tables are listed."""
+    problems = {}
+    for info in infos:
+        h = health(info)
+        if not h["ok"] or h["invalid"]:
+            problems[info.table] = {"missing": h["missing"], "invalid": h["invalid"]}
+    return {"tables": len(infos), "healthy": len(infos) - len(problems), "problems": problems}
+
+
+def create_index(engine, table: str, spec: IndexSpec):
+    """
+    Build `spec` on `table` without blocking writes. An invalid leftover of
+    an interrupted concurrent build under the same name is dropped first.
+    """
+    name = spec.index_name(table)
+    columns = ", ".join(spec.columns)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        invalid = conn.execute(
+            text(
+                """
+            SELECT 1 FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = :schema AND c.relname = :name AND NOT i.indisvalid
+        """
+            ),
+            {"schema": SCHEMA, "name": name},
+        ).scalar()
+        if invalid:
+            log.warning("Dropping invalid index %s before rebuilding it", name)
+            conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{SCHEMA}"."{name}"'))
+        conn.execute(
+            text(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" '
+                f'ON "{SCHEMA}"."{table}" USING {spec.method} ({columns})'
+            )
+        )
@@ -0,0 +1,320 @@
+"""Bulk loading of MT-517 history into sensXX tables.
+
+Accepted input:
+  csv   header row naming mt_name, mt_time, mt_value, mt_quality in any order
+        (the /export format)
+  text  COPY text format (tab-separated, `\\N` for NULL) as written by
+        `COPY sensXX TO STDOUT`; columns in `columns` order
+  dump  plain pg_dump output; the `COPY ... FROM stdin;` blocks of sensor
+        tables are loaded, each into the table of the same name
+Files ending in `.gz` are decompressed on the fly.
+
+Rows are streamed `batch_rows` records at a time (CSV records are parsed, so
+quoted fields may span lines) through `COPY FROM STDIN` into a temporary
+staging table and merged into the target with one
+`INSERT ... SELECT DISTINCT ON (mt_name, mt_time)` that skips keys already
+present. The first copy of a key wins throughout: within a batch by input
+order, across batches and against existing rows because those are never
+overwritten. Each batch commits on
+its own with synchronous_commit off, so an interrupted load is simply run
+again. A partitioned target (created with `partition='monthly'`) gets the
+month partitions a batch needs before the batch is merged.
+
+When the load is done the table is analyzed and the rollup and event
+watermarks are moved back to the oldest loaded row, so the next refresh
+covers the back-fill.
+"""
+
+import csv
+import gzip
+import io
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from sqlalchemy import text
+
+from backend.app.services.catalog import SCHEMA, SENSOR_TABLE_RE
+
+INGEST_FORMATS = ('auto', 'csv', 'text', 'dump')
+PARTITIONING = ('none', 'monthly')
+
+COLUMNS = ('mt_name', 'mt_time', 'mt_value', 'mt_quality')
+
+DEFAULT_BATCH_ROWS = 500_000
+
+_STAGE = '_ingest_stage'
+
+# `COPY public.sens00 (mt_name, mt_time, ...) FROM stdin;` in a pg_dump file
+_DUMP_COPY_RE = re.compile(r'^COPY\s+(?:"?(\w+)"?\.)?"?(\w+)"?\s*\(([^)]*)\)\s+FROM\s+stdin;', re.IGNORECASE)
+
+
+@dataclass
+class IngestStats:
+    table: str
+    rows: int = 0      # rows read from the input
+    inserted: int = 0  # rows that were new
+    batches: int = 0
+    min_time: Optional[datetime] = None
+    max_time: Optional[datetime] = None
+
+    @property
+    def skipped(self) -> int:
+        return self.rows - self.inserted
+
+    def add(self, rows: int, inserted: int, lo: Optional[datetime], hi: Optional[datetime]):
+        self.rows += rows
+        self.inserted += inserted
+        self.batches += 1
+        if lo is not None and (self.min_time is None or lo < self.min_time):
+            self.min_time = lo
+        if hi is not None and (self.max_time is None or hi > self.max_time):
+            self.max_time = hi
+
+    def merge(self, other: 'IngestStats'):
+        self.add(other.rows, other.inserted, other.min_time, other.max_time)
+        self.batches += other.batches - 1
+
+
+# ---- input -----------------------------------------------------------------
+
+def open_input(path: str) -> TextIO:
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8-sig', newline='')
+    return open(path, 'r', encoding='utf-8-sig', newline='')
+
+
+def detect_format(path: str) -> str:
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith('.sql'):
+        return 'dump'
+    with open_input(path) as fh:
+        first = fh.readline()
+    if first.startswith('--') or first.upper().startswith(('SET ', 'COPY ')):
+        return 'dump'
+    if '\t' not in first and set(COLUMNS[:2]) <= {c.strip().strip('"') for c in first.split(',')}:
+        return 'csv'
+    return 'text'
+
+
+def _check_columns(columns: Sequence[str]) -> List[str]:
+    columns = [c.strip().strip('"') for c in columns]
+    unknown = [c for c in columns if c not in COLUMNS]
+    if unknown or 'mt_name' not in columns or 'mt_time' not in columns or len(set(columns)) != len(columns):
+        raise ValueError(f"Columns must be mt_name, mt_time and optionally mt_value, mt_quality; got {', '.join(columns)}")
+    return columns
+
+
+def read_blocks(fh: TextIO, fmt: str, columns: Sequence[str] = COLUMNS) -> Iterator[Tuple[Optional[str], List[str], str, Iterator[str]]]:
+    """
+    (table from the dump or None, columns, COPY format, data lines) per data
+    block. Dump columns are checked by the caller, once it wants the table.
+    """
+    if fmt == 'csv':
+        reader = csv.reader(fh)
+        header = next(reader, [])
+        yield None, _check_columns(header), 'csv', _csv_records(reader)
+    elif fmt == 'text':
+        yield None, _check_columns(columns), 'text', fh
+    else:
+        for line in fh:
+            m = _DUMP_COPY_RE.match(line)
+            if m:
+                yield m.group(2), m.group(3).split(','), 'text', _until_terminator(fh)
+
+
+def _until_terminator(fh: TextIO) -> Iterator[str]:
+    for line in fh:
+        if line.rstrip('\r\n') == '\\.':
+            return
+        yield line
+
+
+def _csv_records(reader) -> Iterator[str]:
+    """Each parsed CSV record written back as one COPY CSV chunk (may span lines)."""
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    for record in reader:
+        if not record:
+            continue
+        writer.writerow(record)
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+
+
+def _batches(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    batch = []
+    for line in lines:
+        if line.strip():
+            batch.append(line)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ---- target tables -----------------------------------------------------------
+
+def table_exists(conn, table: str) -> bool:
+    return conn.execute(text('SELECT to_regclass(:name) IS NOT NULL'), {'name': f'"{SCHEMA}"."{table}"'}).scalar()
+
+
+def is_partitioned(conn, table: str) -> bool:
+    return bool(conn.execute(text(
+        '''
+        SELECT c.relkind = 'p' FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relname = :t
+        '''
+    ), {'schema': SCHEMA, 't': table}).scalar())
+
+
+def create_table(conn, table: str, partition: str = 'none'):
+    """Sensor table with the (mt_name, mt_time) key and an mt_time index; optionally range-partitioned by month."""
+    partition_sql = 'PARTITION BY RANGE (mt_time)' if partition == 'monthly' else ''
+    conn.execute(text(f'''
+        CREATE TABLE "{SCHEMA}"."{table}" (
+            mt_name varchar NOT NULL,
+            mt_time timestamp NOT NULL,
+            mt_value varchar,
+            mt_quality varchar,
+            PRIMARY KEY (mt_name, mt_time)
+        ) {partition_sql}
+    '''))
+    conn.execute(text(f'CREATE INDEX "{table}_mt_time_idx" ON "{SCHEMA}"."{table}" (mt_time)'))
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f'{table}_p{month:%Y%m}'
+
+
+def ensure_partitions(conn, table: str, months: Iterable[datetime]) -> List[str]:
+    """Create the missing month partitions of `table`; returns the ones created."""
+    created = []
+    for month in sorted(months):
+        name = partition_name(table, month)
+        if table_exists(conn, name):
+            continue
+        upper = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+        conn.execute(text(
+            f'''CREATE TABLE "{SCHEMA}"."{name}" PARTITION OF "{SCHEMA}"."{table}"
+            FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')'''
+        ))
+        created.append(name)
+    return created
+
+
+# ---- loading -----------------------------------------------------------------
+
+def _create_stage(conn):
+    conn.execute(text(f'''
+        CREATE TEMPORARY TABLE IF NOT EXISTS {_STAGE} (
+            mt_name text,
+            mt_time timestamp,
+            mt_value text,
+            mt_quality text,
+            ord bigserial
+        )
+    '''))
+
+
+def _copy(conn, columns: Sequence[str], copy_format: str, lines: List[str]):
+    cursor = conn.connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {_STAGE} ({', '.join(columns)}) FROM STDIN WITH (FORMAT {copy_format})",
+            io.StringIO(''.join(lines)),
+        )
+    finally:
+        cursor.close()
+
+
+def load_batch(conn, table: str, columns: Sequence[str], copy_format: str, lines: List[str],
+               partitioned: bool = False) -> Tuple[int, int, Optional[datetime], Optional[datetime], List[str]]:
+    """
+    Stage and merge one batch inside the caller's transaction.
+    Returns (rows staged, rows inserted, oldest and newest staged mt_time, partitions created).
+    """
+    conn.execute(text('SET LOCAL synchronous_commit = off'))
+    _create_stage(conn)
+    conn.execute(text(f'TRUNCATE {_STAGE}'))
+    _copy(conn, columns, copy_format, lines)
+    staged, lo, hi = conn.execute(text(f'SELECT COUNT(*), MIN(mt_time), MAX(mt_time) FROM {_STAGE}')).one()
+
+    created = []
+    if partitioned and staged:
+        months = conn.execute(text(
+            f"SELECT DISTINCT date_trunc('month', mt_time) FROM {_STAGE} WHERE mt_time IS NOT NULL"
+        )).scalars().all()
+        created = ensure_partitions(conn, table, months)
+
+    result = conn.execute(text(f'''
+        INSERT INTO "{SCHEMA}"."{table}" (mt_name, mt_time, mt_value, mt_quality)
+        SELECT DISTINCT ON (mt_name, mt_time) mt_name, mt_time, mt_value, mt_quality
+        FROM {_STAGE} s
+        WHERE mt_name IS NOT NULL AND mt_time IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM "{SCHEMA}"."{table}" t
+              WHERE t.mt_name = s.mt_name AND t.mt_time = s.mt_time
+          )
+        ORDER BY mt_name, mt_time, ord
+    '''))
+    return staged, result.rowcount, lo, hi, created
+
+
+def ingest_file(engine, path: str, table: Optional[str] = None, fmt: str = 'auto',
+                columns: Sequence[str] = COLUMNS, batch_rows: int = DEFAULT_BATCH_ROWS,
+                create: bool = False, partition: str = 'none') -> Iterator[Tuple[IngestStats, List[str]]]:
+    """
+    Load `path` batch by batch; yields (running stats of the table, partitions
+    created) after every committed batch. `table` is required for csv/text
+    input and filters the tables of a dump.
+    """
+    if fmt == 'auto':
+        fmt = detect_format(path)
+    if fmt not in INGEST_FORMATS or partition not in PARTITIONING:
+        raise ValueError(f"Unknown format '{fmt}' or partitioning '{partition}'")
+    if fmt != 'dump' and not table:
+        raise ValueError(f'{fmt} input needs a target table')
+
+    with open_input(path) as fh:
+        for dump_table, block_columns, copy_format, lines in read_blocks(fh, fmt, columns):
+            target = dump_table or table
+            if (table and target != table) or not SENSOR_TABLE_RE.fullmatch(target):
+                for _ in lines:
+                    pass
+                continue
+            block_columns = _check_columns(block_columns)
+            with engine.begin() as conn:
+                if not table_exists(conn, target):
+                    if not create:
+                        raise ValueError(f"Table '{target}' does not exist (pass create to make it)")
+                    create_table(conn, target, partition)
+                elif partition == 'monthly' and not is_partitioned(conn, target):
+                    raise ValueError(f"Table '{target}' exists and is not partitioned; it cannot be converted in place")
+                partitioned = is_partitioned(conn, target)
+
+            stats = IngestStats(target)
+            for batch in _batches(lines, batch_rows):
+                with engine.begin() as conn:
+                    staged, inserted, lo, hi, created = load_batch(
+                        conn, target, block_columns, copy_format, batch, partitioned
+                    )
+                stats.add(staged, inserted, lo, hi)
+                yield stats, created
+
+
+def finish(engine, stats: IngestStats):
+    """Analyze the table and move derived-data watermarks back over the loaded range."""
+    from backend.app.services.events import events
+    from backend.app.services.rollups import rollups
+
+    with engine.begin() as conn:
+        conn.execute(text(f'ANALYZE "{SCHEMA}"."{stats.table}"'))
+        if stats.inserted and stats.min_time is not None:
+            rollups.rewind(conn, stats.table, stats.min_time)
+            events.rewind(conn, stats.table, stats.min_time)
@@ -0,0 +1,160 @@
+"""Process-local cache of the latest value of every mt_name in every sensXX table.
+
+Each table is seeded once: with a LATERAL index seek per mt_name (names are
+walked with a recursive skip scan) when the table has an index leading with
+mt_name, otherwise with a single `DISTINCT ON (mt_name)` pass. Afterwards only
+rows at or past the table's newest cached timestamp are read, batched across
+tables with UNION ALL, so keeping the snapshot current costs one or two
+round trips however many tables exist.
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from backend.app.services.catalog import catalog, SCHEMA
+from backend.app.utils.config import settings
+
+# Tables per UNION ALL statement for incremental refreshes
+_BATCH = 100
+
+# (mt_time, mt_value, mt_quality) per mt_name
+Values = Dict[str, Tuple[datetime, Optional[str], Optional[str]]]
+
+
+def _seed_sql(table: str, has_name_index: bool) -> str:
+    if has_name_index:
+        return f'''
+            WITH RECURSIVE names AS (
+                (SELECT mt_name FROM "{SCHEMA}"."{table}" ORDER BY mt_name LIMIT 1)
+                UNION ALL
+                SELECT (SELECT t.mt_name FROM "{SCHEMA}"."{table}" t
+                        WHERE t.mt_name > names.mt_name ORDER BY t.mt_name LIMIT 1)
+                FROM names WHERE names.mt_name IS NOT NULL
+            )
+            SELECT l.mt_name, l.mt_time, l.mt_value, l.mt_quality
+            FROM names
+            CROSS JOIN LATERAL (
+                SELECT mt_name, mt_time, mt_value, mt_quality
+                FROM "{SCHEMA}"."{table}" t
+                WHERE t.mt_name = names.mt_name
+                ORDER BY t.mt_time DESC
+                LIMIT 1
+            ) l
+        '''
+    return f'''
+        SELECT DISTINCT ON (mt_name) mt_name, mt_time, mt_value, mt_quality
+        FROM "{SCHEMA}"."{table}"
+        ORDER BY mt_name, mt_time DESC
+    '''
+
+
+class LastValueCache:
+    def __init__(self):
+        self._values: Dict[str, Values] = {}
+        self._watermarks: Dict[str, datetime] = {}  # newest mt_time seen per table
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = 0.0
+
+    @property
+    def max_age(self) -> float:
+        return float(getattr(settings, 'SNAPSHOT_MAX_AGE', 2))
+
+    def snapshot(self, tables: Optional[List[str]] = None) -> List[dict]:
+        """Latest row per (table, mt_name), refreshing first if the cache is stale."""
+        return [{
+            'table': table,
+            'mt_name': name,
+            'mt_time': t.isoformat() if t else None,
+            'mt_value': value,
+            'mt_quality': quality,
+        } for table, t, name, value, quality in self.rows(tables)]
+
+    def rows(self, tables: Optional[List[str]] = None) -> List[tuple]:
+        """`snapshot` as (table, mt_time, mt_name, mt_value, mt_quality) tuples."""
+        self._maybe_refresh()
+        with self._lock:
+            selected = tables if tables is not None else sorted(self._values)
+            return [
+                (table, t, name, value, quality)
+                for table in selected
+                for name, (t, value, quality) in sorted(self._values.get(table, {}).items())
+            ]
+
+    def values(self, table: str) -> Values:
+        self._maybe_refresh()
+        with self._lock:
+            return dict(self._values.get(table, {}))
+
+    def _maybe_refresh(self):
+        if time.monotonic() - self._refreshed_at < self.max_age:
+            return
+        # Serve the current snapshot while another request refreshes it,
+        # unless nothing has been loaded yet.
+        blocking = not self._values
+        if not self._refresh_lock.acquire(blocking=blocking):
+            return
+        try:
+            if time.monotonic() - self._refreshed_at >= self.max_age:
+                self.refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def refresh(self):
+        from backend.app import db
+
+        infos = catalog.tables()
+        with db.engine.connect() as conn:
+            for info in infos:
+                if info.table not in self._watermarks:
+                    rows = conn.execute(text(_seed_sql(info.table, info.has_name_index))).all()
+                    self._merge(info.table, rows)
+            known = [i.table for i in infos if i.table in self._watermarks]
+            for i in range(0, len(known), _BATCH):
+                self._refresh_batch(conn, known[i:i + _BATCH])
+
+        # Drop tables that disappeared from the catalog
+        live = {i.table for i in infos}
+        with self._lock:
+            for table in list(self._values):
+                if table not in live:
+                    self._values.pop(table, None)
+                    self._watermarks.pop(table, None)
+        self._refreshed_at = time.monotonic()
+
+    def _refresh_batch(self, conn, tables: List[str]):
+        parts, params = [], {}
+        for j, table in enumerate(tables):
+            parts.append(
+                f'''(SELECT DISTINCT ON (mt_name) :t{j} AS table_name, mt_name, mt_time, mt_value, mt_quality
+                FROM "{SCHEMA}"."{table}" WHERE mt_time >= :s{j}
+                ORDER BY mt_name, mt_time DESC)'''
+            )
+            params[f"t{j}"] = table
+            params[f"s{j}"] = self._watermarks[table]
+        by_table: Dict[str, list] = {}
+        for table_name, *row in conn.execute(text(" UNION ALL ".join(parts)), params):
+            by_table.setdefault(table_name, []).append(row)
+        for table, rows in by_table.items():
+            self._merge(table, rows)
+
+    def _merge(self, table: str, rows):
+        with self._lock:
+            values = self._values.setdefault(table, {})
+            watermark = self._watermarks.get(table)
+            for name, t, value, quality in rows:
+                current = values.get(name)
+                if current is None or (t is not None and (current[0] is None or t >= current[0])):
+                    values[name] = (t, value, quality)
+                if t is not None and (watermark is None or t > watermark):
+                    watermark = t
+            # Empty tables stay unwatermarked and are simply re-seeded
+            if watermark is not None:
+                self._watermarks[table] = watermark
+
+
+latest_values = LastValueCache()
@@ -0,0 +1,224 @@
+"""Map locations (Deblin, Suchodoly, Wolica, ...) and the live status of their sensors.
+
+Each location is described by a `<name>.sensors.json` manifest, generated
+from the plan's INI file (`npm run build:sensors`), that lists the
+measuring points with idx/code/collector/kp/kg/limit/x/y. Manifests are
+read once from `LOCATIONS_DIR` (default: frontend/public/maps) and re-read
+only when a file changes.
+
+A manifest sensor is matched to rows of its sensor table: `sens<collector>`
+(two digits), unless `LOCATION_TABLES` names a table for the location, e.g.
+`Deblin:sens01,Wolica:sens03`. Its mt_names are the ones whose dot-separated
+tokens contain the sensor code and `KG<kg>` (`KG2.SZ5.AI` for code SZ5 on
+KG 2; names without a KG token match on the code alone), with the last
+token taken as the channel. Values come from the last-value cache
+(services/latest.py), which is refreshed incrementally, so a status request
+does not query the sensor tables itself.
+"""
+
+import json
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from backend.app.services.latest import latest_values
+from backend.app.utils.config import settings
+
+log = logging.getLogger(__name__)
+
+MANIFEST_SUFFIX = '.sensors.json'
+
+_DEFAULT_DIR = Path(__file__).resolve().parents[3] / 'frontend' / 'public' / 'maps'
+
+# Leading zeros of a code's number (SZ01 == SZ1)
+_LEADING_ZEROS = re.compile(r'(?<=\D)0+(?=\d)')
+
+
+@dataclass(frozen=True)
+class MapSensor:
+    idx: int
+    code: str
+    name: str
+    collector: int
+    kp: Optional[int]
+    kg: Optional[int]
+    limit: Optional[float]
+    line: Optional[str] = None
+
+    @classmethod
+    def from_manifest(cls, item: dict) -> 'MapSensor':
+        return cls(
+            idx=int(item['idx']),
+            code=str(item.get('code') or ''),
+            name=str(item.get('name') or ''),
+            collector=int(item.get('collector') or 0),
+            kp=item.get('kp'),
+            kg=item.get('kg'),
+            limit=item.get('limit'),
+            line=item.get('line'),
+        )
+
+
+@dataclass(frozen=True)
+class Location:
+    name: str
+    source: str
+    mtime: float
+    sensors: Tuple[MapSensor, ...]
+
+
+def _token(value: str) -> str:
+    return _LEADING_ZEROS.sub('', value.replace(' ', '').upper())
+
+
+def _table_overrides() -> Dict[str, str]:
+    out = {}
+    for part in (getattr(settings, 'LOCATION_TABLES', '') or '').split(','):
+        name, sep, table = part.partition(':')
+        if sep and name.strip() and table.strip():
+            out[name.strip().lower()] = table.strip()
+    return out
+
+
+class NameIndex:
+    """mt_names of one table keyed by (KG token, code token)."""
+
+    def __init__(self, names):
+        self.size = len(names)
+        self.by_key: Dict[Tuple[Optional[str], str], List[str]] = {}
+        for name in names:
+            tokens = [_token(t) for t in name.split('.')]
+            kg = next((t for t in tokens[:-1] if t.startswith('KG')), None)
+            for code in tokens[:-1]:
+                if code != kg:
+                    self.by_key.setdefault((kg, code), []).append(name)
+
+    def names_for(self, sensor: MapSensor) -> List[str]:
+        code = _token(sensor.code)
+        kg = f'KG{sensor.kg}' if sensor.kg is not None else None
+        return self.by_key.get((kg, code)) or self.by_key.get((None, code)) or []
+
+
+class LocationRegistry:
+    def __init__(self):
+        self._locations: Dict[str, Location] = {}
+        self._indexes: Dict[str, NameIndex] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> Path:
+        configured = getattr(settings, 'LOCATIONS_DIR', '') or ''
+        return Path(configured) if configured else _DEFAULT_DIR
+
+    def locations(self) -> List[Location]:
+        found = self._scan()
+        return [found[key] for key in sorted(found)]
+
+    def get(self, name: str) -> Optional[Location]:
+        return self._scan().get(name.lower())
+
+    def _scan(self) -> Dict[str, Location]:
+        """Manifests by lower-cased name; unchanged files are not parsed again."""
+        directory = self.directory
+        found = {}
+        for path in sorted(directory.glob(f'*{MANIFEST_SUFFIX}')):
+            key = path.name[:-len(MANIFEST_SUFFIX)].lower()
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            current = self._locations.get(key)
+            if current is None or current.mtime != mtime:
+                try:
+                    current = self._load(path, mtime)
+                except Exception:
+                    log.exception("Could not read location manifest %s", path)
+                    continue
+            found[key] = current
+        with self._lock:
+            self._locations = found
+        return found
+
+    @staticmethod
+    def _load(path: Path, mtime: float) -> Location:
+        data = json.loads(path.read_text(encoding='utf-8-sig'))
+        sensors = tuple(MapSensor.from_manifest(item) for item in data.get('sensors', []))
+        return Location(name=path.name[:-len(MANIFEST_SUFFIX)], source=path.name, mtime=mtime, sensors=sensors)
+
+    def table_for(self, location: Location, sensor: MapSensor) -> str:
+        return _table_overrides().get(location.name.lower()) or f'sens{sensor.collector:02d}'
+
+    def _index(self, table: str, values) -> NameIndex:
+        # mt_names only ever get added, so a size change means a rebuild
+        index = self._indexes.get(table)
+        if index is None or index.size != len(values):
+            index = NameIndex(values)
+            with self._lock:
+                self._indexes[table] = index
+        return index
+
+    def channels(self, table: str, channel: str) -> Dict[str, Tuple[Location, MapSensor]]:
+        """mt_names of `table` on `channel` that belong to a manifest sensor, with that sensor."""
+        channel = _token(channel)
+        values = latest_values.values(table)
+        index = self._index(table, values)
+        out = {}
+        for location in self.locations():
+            for sensor in location.sensors:
+                if self.table_for(location, sensor) != table:
+                    continue
+                for name in index.names_for(sensor):
+                    if _token(name.rsplit('.', 1)[-1]) == channel:
+                        out.setdefault(name, (location, sensor))
+        return out
+
+    def status(self, location: Location) -> dict:
+        now = datetime.utcnow()
+        tables: Dict[str, tuple] = {}
+        sensors = []
+        for sensor in location.sensors:
+            table = self.table_for(location, sensor)
+            if table not in tables:
+                values = latest_values.values(table)
+                tables[table] = (values, self._index(table, values))
+            values, index = tables[table]
+
+            channels = {}
+            newest = None
+            for name in index.names_for(sensor):
+                t, value, quality = values[name]
+                channels[name.rsplit('.', 1)[-1]] = {
+                    'mt_name': name,
+                    'value': value,
+                    'quality': quality,
+                    'time': t.isoformat() if t else None,
+                }
+                if t is not None and (newest is None or t > newest[0]):
+                    newest = (t, value, quality)
+            sensors.append({
+                'idx': sensor.idx,
+                'code': sensor.code,
+                'name': sensor.name,
+                'kp': sensor.kp,
+                'kg': sensor.kg,
+                'limit': sensor.limit,
+                'table': table,
+                'value': newest[1] if newest else None,
+                'quality': newest[2] if newest else None,
+                'time': newest[0].isoformat() if newest else None,
+                'age_seconds': round((now - newest[0]).total_seconds(), 3) if newest else None,
+                'channels': channels,
+            })
+        return {
+            'location': location.name,
+            'generated_at': now.isoformat(),
+            'sensors': sensors,
+            'matched': sum(1 for s in sensors if s['channels']),
+        }
+
+
+locations = LocationRegistry()
@@ -0,0 +1,206 @@
+"""Request and query-phase metrics exposed at `/metrics` in Prometheus text format.
+
+Recorded per route (the URL rule, e.g. /api/sensor-data/by-table):
+
+- mtrix_request_duration_seconds{route,method,status}   whole request
+- mtrix_phase_duration_seconds{route,phase}              execute (SQL round trip,
+  from engine events), fetch (row materialization) and serialize (JSON or
+  column buffers), summed per request
+- mtrix_response_rows{route}   rows returned by the database for the request
+- mtrix_response_bytes{route}  response body size (buffered responses only)
+
+plus gauges for the connection pool and the response cache. The phases of
+each request are also sent back in a `Server-Timing` header. Histograms are
+plain in-process counters behind one lock, cheap enough to leave on; with
+several worker processes each worker reports its own numbers. Disable with
+METRICS_ENABLED=0.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Sequence, Tuple
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+from backend.app.utils.config import settings
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+BYTE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple) -> str:
+    return ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for label_values, series in sorted(snapshot.items()):
+            base = _labels(self.labels, label_values)
+            sep = ',' if base else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f'{self.name}_bucket{{{base}{sep}le="{bound:g}"}} {cumulative}'
+            cumulative += series[len(self.buckets)]
+            yield f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {cumulative}'
+            yield f'{self.name}_sum{{{base}}} {series[-1]:.6f}'
+            yield f'{self.name}_count{{{base}}} {cumulative}'
+
+
+request_duration = Histogram(
+    'mtrix_request_duration_seconds', 'HTTP request latency.', ('route', 'method', 'status'), LATENCY_BUCKETS
+)
+phase_duration = Histogram(
+    'mtrix_phase_duration_seconds', 'Time per request spent in each phase.', ('route', 'phase'), LATENCY_BUCKETS
+)
+response_rows = Histogram('mtrix_response_rows', 'Rows returned by the database per request.', ('route',), ROW_BUCKETS)
+response_bytes = Histogram('mtrix_response_bytes', 'Response body size per request.', ('route',), BYTE_BUCKETS)
+
+HISTOGRAMS = (request_duration, phase_duration, response_rows, response_bytes)
+
+
+def _route() -> str:
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def _add_phase(phase: str, seconds: float):
+    phases = g.get('_metrics_phases')
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def phase(name: str):
+    """Time a block as part of the current request's `name` phase (no-op outside requests)."""
+    if not has_request_context():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add_phase(name, time.perf_counter() - start)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and has_request_context() and '_metrics_phases' in g:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is None or not has_request_context():
+        return
+    _add_phase('execute', time.perf_counter() - started)
+    # Client-side cursors know the row count of a SELECT right after execute
+    if cursor.description is not None and cursor.rowcount > 0:
+        g._metrics_rows = g.get('_metrics_rows', 0) + cursor.rowcount
+
+
+def _start_request():
+    g._metrics_start = time.perf_counter()
+    g._metrics_phases = {}
+
+
+def _finish_request(response):
+    start = g.get('_metrics_start')
+    if start is None:
+        return response
+    route = _route()
+    request_duration.observe(time.perf_counter() - start, route, request.method, response.status_code)
+    for name, seconds in g._metrics_phases.items():
+        phase_duration.observe(seconds, route, name)
+    if g._metrics_phases:
+        # Same phases per response, for browser dev tools and the bench runner
+        response.headers['Server-Timing'] = ', '.join(
+            f'{name};dur={1000 * seconds:.3f}' for name, seconds in g._metrics_phases.items()
+        )
+    if '_metrics_rows' in g:
+        response_rows.observe(g._metrics_rows, route)
+    if not response.is_streamed and response.content_length is not None:
+        response_bytes.observe(response.content_length, route)
+    return response
+
+
+def _gauges():
+    from backend.app import db
+    from backend.app.services.cache import response_cache
+    from backend.app.services.database import pool_metrics
+
+    pool = pool_metrics.stats(db.engine.pool)
+    for key in ('size', 'active', 'idle', 'overflow'):
+        if key in pool:
+            yield f'# TYPE mtrix_db_pool_{key} gauge'
+            yield f'mtrix_db_pool_{key} {pool[key]}'
+    for key in ('checkouts', 'pool_timeouts', 'statement_timeouts'):
+        yield f'# TYPE mtrix_db_{key}_total counter'
+        yield f'mtrix_db_{key}_total {pool[key]}'
+    cache = response_cache.stats()
+    yield '# TYPE mtrix_response_cache_hits_total counter'
+    yield f"mtrix_response_cache_hits_total {cache['hits']}"
+    yield '# TYPE mtrix_response_cache_misses_total counter'
+    yield f"mtrix_response_cache_misses_total {cache['misses']}"
+    yield '# TYPE mtrix_response_cache_bytes gauge'
+    yield f"mtrix_response_cache_bytes {cache['bytes']}"
+
+
+def render() -> str:
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    lines.extend(_gauges())
+    return '\n'.join(lines) + '\n'
+
+
+def instrument_engine(engine):
+    """Count `engine`'s statements in the request's execute phase."""
+    if not getattr(settings, 'METRICS_ENABLED', True):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def init_app(app, db):
+    if not getattr(settings, 'METRICS_ENABLED', True):
+        return
+    with app.app_context():
+        engine = db.engine
+    instrument_engine(engine)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,56 @@
+"""Typed numeric view of `mt_value`.
+
+`mt_value` is stored as text, so every numeric path has to match it against
+`NUMERIC_RE` and cast it per row. `flask sensors add-numeric` adds a stored
+generated column `mt_value_num double precision` holding the parsed value
+(NULL for non-numeric readings) to each sensor table. `value_sql` returns the
+cheapest expression available for a table, falling back to the regex and
+cast until the column has been added.
+"""
+
+from sqlalchemy import text
+
+from backend.app.services.catalog import catalog, SCHEMA
+
+NUMERIC_COLUMN = 'mt_value_num'
+
+NUMERIC_RE = r'^[+-]?\d+(\.\d+)?$'
+
+# Same semantics as the generated column, evaluated at query time
+PARSE_SQL = f"CASE WHEN mt_value ~ '{NUMERIC_RE}' THEN mt_value::double precision END"
+
+
+def has_numeric_column(sensor: str) -> bool:
+    info = catalog.get(sensor)
+    return info is not None and NUMERIC_COLUMN in info.columns
+
+
+def value_sql(sensor: str) -> str:
+    """SQL expression for the numeric value of a row of `sensor` (NULL if not numeric)."""
+    return NUMERIC_COLUMN if has_numeric_column(sensor) else PARSE_SQL
+
+
+def add_numeric_column(conn, sensor: str) -> bool:
+    """
+    Add the generated `mt_value_num` column to `sensor`; returns False when
+    it already exists. Postgres rewrites the table under an exclusive lock,
+    so run it in a maintenance window on large tables.
+    """
+    exists = conn.execute(
+        text(
+            '''
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = :schema AND table_name = :t AND column_name = :c
+        '''
+        ),
+        {"schema": SCHEMA, "t": sensor, "c": NUMERIC_COLUMN},
+    ).scalar()
+    if exists:
+        return False
+    conn.execute(
+        text(
+            f'''ALTER TABLE "{SCHEMA}"."{sensor}"
+            ADD COLUMN {NUMERIC_COLUMN} double precision GENERATED ALWAYS AS ({PARSE_SQL}) STORED'''
+        )
+    )
+    return True
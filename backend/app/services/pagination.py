@@ -0,0 +1,40 @@
+"""Opaque keyset cursors for paging sensor rows.
+
+A cursor encodes the `(mt_time, mt_name)` of the last row of a page. The next
+page is fetched with a row-value comparison against it, which is an index
+seek no matter how deep the page is, and, unlike a time-only cursor, does not
+skip or repeat rows that share a timestamp across mt_name values.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(mt_time: datetime, mt_name: str) -> str:
+    raw = json.dumps([mt_time.isoformat(), mt_name], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        time_str, name = json.loads(raw)
+        return datetime.fromisoformat(time_str), str(name)
+    except Exception as ex:
+        raise InvalidCursor(str(ex)) from ex
+
+
+def keyset_condition(order: str) -> str:
+    """
+    WHERE fragment selecting rows after the cursor in `order`, binding
+    :cursor_time and :cursor_name. The leading plain mt_time comparison lets
+    an index on mt_time alone narrow the scan; the row comparison breaks ties.
+    """
+    op = '>' if order == 'asc' else '<'
+    return f"mt_time {op}= :cursor_time AND (mt_time, mt_name) {op} (:cursor_time, :cursor_name)"
@@ -0,0 +1,102 @@
+"""Wide (pivoted) view of a sensor table: one row per mt_time, one column per channel.
+
+The long rows are read as `(epoch seconds, mt_name, numeric value)` tuples
+and pivoted with NumPy: timestamps and column keys are factorized with
+`np.unique` and the values scattered into a NaN-filled grid. Columns are keyed
+by the last dot-separated segment of mt_name (`by='channel'`, the same key the
+frontend charts group on) or by the full mt_name (`by='name'`). When several
+mt_names share a channel at the same timestamp the last one in mt_name order
+wins, as the old client-side pivot did.
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from backend.app.services import compact
+from backend.app.services.catalog import SCHEMA
+from backend.app.services.database import statements
+from backend.app.services.metrics import phase
+from backend.app.services.numeric import value_sql
+
+PIVOT_BY = ('channel', 'name')
+
+# Long rows read per pivot request; larger windows come back truncated
+MAX_PIVOT_ROWS = 1_000_000
+
+
+def column_key(name: str, by: str) -> str:
+    return name.rsplit('.', 1)[-1] if by == 'channel' else name
+
+
+def pivot_rows(conn, sensor: str, where_sql: str, params: dict, names: Sequence[str] = (), max_rows: int = MAX_PIVOT_ROWS):
+    """Long `(epoch seconds, mt_name, value)` rows ordered by time then name."""
+    value = value_sql(sensor)
+    name_sql = ''
+    if names:
+        name_sql = ('AND ' if where_sql else 'WHERE ') + 'mt_name = ANY(:names)'
+        params = {**params, 'names': list(names)}
+    q = statements.get(('pivot', sensor, where_sql, name_sql, value), lambda: f'''
+        SELECT EXTRACT(EPOCH FROM mt_time)::double precision AS t, mt_name, {value} AS v
+        FROM "{SCHEMA}"."{sensor}"
+        {where_sql} {name_sql}
+        ORDER BY mt_time ASC, mt_name ASC
+        LIMIT :max_rows
+    ''')
+    result = conn.execute(q, {**params, 'max_rows': max_rows})
+    with phase('fetch'):
+        return result.all()
+
+
+def pivot(rows, by: str = 'channel') -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """`(times in epoch seconds, column keys, grid[time, column])`; missing cells are NaN."""
+    if not rows:
+        return np.empty(0), [], np.empty((0, 0))
+    t, names, v = zip(*rows)
+    times, row_idx = np.unique(np.asarray(t, dtype=np.float64), return_inverse=True)
+    name_keys, name_idx = np.unique(np.asarray(names, dtype=object), return_inverse=True)
+    keys = [column_key(n, by) for n in name_keys.tolist()]
+    columns = sorted(set(keys))
+    position = {c: i for i, c in enumerate(columns)}
+    col_of_name = np.array([position[k] for k in keys], dtype=np.int64)
+    cells = row_idx * len(columns) + col_of_name[name_idx]
+    values = np.asarray(v, dtype=np.float64)
+    if len(columns) < len(keys):
+        # Several mt_names per column: keep the last row (highest mt_name) of each cell
+        _, last = np.unique(cells[::-1], return_index=True)
+        keep = len(cells) - 1 - last
+        cells, values = cells[keep], values[keep]
+    grid = np.full((len(times), len(columns)), np.nan)
+    grid.flat[cells] = values
+    return times, columns, grid
+
+
+def nullable(grid: np.ndarray) -> list:
+    """Grid as nested lists with NaN as None (JSON null)."""
+    out = grid.astype(object)
+    out[np.isnan(grid)] = None
+    return out.tolist()
+
+
+def iso_times(times: np.ndarray) -> List[str]:
+    """ISO timestamps like datetime.isoformat(); microseconds only when some row has them."""
+    micros = np.rint(times * 1e6).astype(np.int64)
+    unit = 'us' if (micros % 1_000_000).any() else 's'
+    return np.datetime_as_string(micros.astype('datetime64[us]'), unit=unit).tolist()
+
+
+def payload(rows, by: str, compact_json: bool) -> dict:
+    """/sensor-data/pivot payload for `pivot_rows`, wide rows or (compact) series arrays."""
+    truncated = len(rows) >= MAX_PIVOT_ROWS
+    times, columns, grid = pivot(rows, by)
+    if compact_json:
+        return {
+            't': compact.epoch_ms(times),
+            'series': {c: nullable(grid[:, i]) for i, c in enumerate(columns)},
+            'truncated': truncated,
+        }
+    return {
+        'columns': ['mt_time'] + columns,
+        'rows': [[t] + row for t, row in zip(iso_times(times), nullable(grid))],
+        'truncated': truncated,
+    }
@@ -0,0 +1,432 @@
+"""Sensor table queries shared by the Flask routes and the ASGI app.
+
+Request parsing and SQL live here; the callers only differ in how they get a
+connection and build the HTTP response. Every helper takes a synchronous
+SQLAlchemy connection, which the ASGI app provides through
+`AsyncConnection.run_sync`.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+
+from backend.app.models.sensor_data import SensorData
+from backend.app.services import columnar, compact, gaps, pivot
+from backend.app.services.catalog import catalog, SCHEMA, SENSOR_TABLE_RE
+from backend.app.services.database import statements
+from backend.app.services.downsampling import ALGORITHMS, DEFAULT_TARGET_POINTS, clamp_target_points
+from backend.app.services.metrics import phase
+from backend.app.services.numeric import value_sql
+from backend.app.services.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_condition
+from backend.app.services.rollups import rollups
+
+# OFFSET pagination limits for by-table (use the keyset cursor instead)
+MAX_OFFSET = 10_000
+LARGE_TABLE_ROWS = 1_000_000
+
+# Upper bound on specs in one /sensor-data/batch request and on tables per gaps request
+MAX_BATCH_QUERIES = 100
+
+
+def _parse_time(value: Optional[str], message: str) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except Exception:
+        raise ValueError(message)
+
+
+@dataclass
+class ByTableArgs:
+    """Validated /sensor-data/by-table query string; `parse` raises ValueError with the 400 message."""
+
+    sensor: str
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    limit: int = 1000
+    offset: int = 0
+    order: str = 'asc'
+    after: Optional[datetime] = None
+    before: Optional[datetime] = None
+    cursor: Optional[str] = None
+    downsample: bool = False
+    target_points: int = DEFAULT_TARGET_POINTS
+    algorithm: Optional[str] = None
+    compact: bool = False
+    where_sql: str = ''
+    params: dict = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, args) -> 'ByTableArgs':
+        sensor = args.get('sensor')
+        if not sensor or not SENSOR_TABLE_RE.fullmatch(sensor):
+            raise ValueError("Invalid or missing 'sensor' (expected like sens00)")
+
+        q = cls(sensor=sensor)
+        q.limit = int(args.get('limit', 1000))
+        q.offset = int(args.get('offset', 0))
+        q.order = args.get('order', 'asc').lower()
+        q.cursor = args.get('cursor')  # opaque (mt_time, mt_name) keyset cursor
+        q.compact = compact.wanted(args)
+        if q.limit <= 0 or q.offset < 0:
+            raise ValueError('limit must be positive and offset not negative')
+        if q.order not in ('asc', 'desc'):
+            raise ValueError('Invalid order; use asc or desc')
+        if q.cursor and q.offset:
+            raise ValueError('cursor and offset cannot be combined')
+        if q.offset > MAX_OFFSET:
+            info = catalog.get(sensor)
+            if info is not None and (info.approx_rows or 0) > LARGE_TABLE_ROWS:
+                raise ValueError(f'offset above {MAX_OFFSET} is not supported on large tables; page with cursor=<next_cursor>')
+
+        where, params = [], {}
+        q.start = _parse_time(args.get('start'), 'Invalid start time format')
+        if q.start:
+            where.append("mt_time >= :start"); params["start"] = q.start
+        q.end = _parse_time(args.get('end'), 'Invalid end time format')
+        if q.end:
+            where.append("mt_time <= :end"); params["end"] = q.end
+        # Time cursors: rows with mt_time > after (asc) / mt_time < before (desc)
+        q.after = _parse_time(args.get('after'), 'Invalid after cursor format')
+        if q.after:
+            where.append("mt_time > :after"); params["after"] = q.after
+        q.before = _parse_time(args.get('before'), 'Invalid before cursor format')
+        if q.before:
+            where.append("mt_time < :before"); params["before"] = q.before
+        if q.cursor:
+            try:
+                params["cursor_time"], params["cursor_name"] = decode_cursor(q.cursor)
+            except InvalidCursor:
+                raise ValueError('Invalid cursor')
+            where.append(keyset_condition(q.order))
+        q.where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+        q.params = params
+
+        q.downsample = args.get('downsample', 'false').lower() in ('1', 'true', 'yes')
+        if q.downsample:
+            if not (q.start and q.end):
+                raise ValueError('downsample requires start and end params')
+            q.target_points = clamp_target_points(args.get('target_points'))
+            algorithm = args.get('algorithm')
+            if algorithm:
+                q.algorithm = algorithm.lower()
+                if q.algorithm not in ALGORITHMS:
+                    raise ValueError(f"Invalid algorithm; use one of {', '.join(ALGORITHMS)}")
+        return q
+
+    @property
+    def use_rollups(self) -> bool:
+        # Rollups cannot honour the after/before time cursors
+        return not (self.after or self.before)
+
+
+def _window(args, endpoint: str):
+    try:
+        return datetime.fromisoformat(args['start']), datetime.fromisoformat(args['end'])
+    except KeyError:
+        raise ValueError(f'{endpoint} requires start and end params')
+    except ValueError:
+        raise ValueError('Invalid start/end time format')
+
+
+@dataclass
+class PivotArgs:
+    """Validated /sensor-data/pivot query string; `parse` raises ValueError with the 400 message."""
+
+    sensor: str
+    start: datetime
+    end: datetime
+    by: str = 'channel'
+    names: List[str] = field(default_factory=list)
+    compact: bool = False
+
+    @classmethod
+    def parse(cls, args) -> 'PivotArgs':
+        sensor = args.get('sensor')
+        if not sensor or not SENSOR_TABLE_RE.fullmatch(sensor):
+            raise ValueError("Invalid or missing 'sensor' (expected like sens00)")
+        by = args.get('by', 'channel').lower()
+        if by not in pivot.PIVOT_BY:
+            raise ValueError(f"Invalid by; use one of {', '.join(pivot.PIVOT_BY)}")
+        start, end = _window(args, 'pivot')
+        return cls(sensor, start, end, by, list(args.getlist('name')), compact.wanted(args))
+
+
+@dataclass
+class GapsArgs:
+    """Validated /sensor-data/gaps query string; `parse` raises ValueError with the 400 message."""
+
+    sensors: List[str]
+    start: datetime
+    end: datetime
+    min_gap: float = gaps.DEFAULT_MIN_GAP
+    by: str = 'name'
+    names: List[str] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, args) -> 'GapsArgs':
+        sensors = list(args.getlist('sensor'))
+        if not sensors or not all(SENSOR_TABLE_RE.fullmatch(s) for s in sensors):
+            raise ValueError("Invalid or missing 'sensor' (expected like sens00)")
+        if len(sensors) > MAX_BATCH_QUERIES:
+            raise ValueError(f"At most {MAX_BATCH_QUERIES} sensors per request")
+        by = args.get('by', 'name').lower()
+        if by not in gaps.GAP_BY:
+            raise ValueError(f"Invalid by; use one of {', '.join(gaps.GAP_BY)}")
+        start, end = _window(args, 'gaps')
+        try:
+            min_gap = float(args.get('min_gap', gaps.DEFAULT_MIN_GAP))
+        except ValueError:
+            raise ValueError('Invalid min_gap')
+        if min_gap <= 0:
+            raise ValueError('min_gap must be positive')
+        return cls(list(dict.fromkeys(sensors)), start, end, min_gap, by, list(args.getlist('name')))
+
+
+def gap_report(conn, args: GapsArgs) -> dict:
+    """/sensor-data/gaps payload."""
+    tables = {}
+    for sensor in args.sensors:
+        report = gaps.find_gaps(conn, sensor, args.start, args.end, args.min_gap, args.names, args.by,
+                                known_names=gaps.distinct_names(conn, sensor))
+        tables[sensor] = gaps.serialize(report)
+    return {'min_gap': args.min_gap, 'by': args.by, 'tables': tables}
+
+
+@dataclass
+class FilteredArgs:
+    """Validated /sensor-data/filtered query string (sens00 rows by mt_name pattern and time)."""
+
+    sensor_type: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+
+    @classmethod
+    def parse(cls, args) -> 'FilteredArgs':
+        return cls(
+            args.get('sensor_type'),  # e.g. "I1", "Analog", ...
+            _parse_time(args.get('start'), 'Invalid start time format'),
+            _parse_time(args.get('end'), 'Invalid end time format'),
+        )
+
+    @property
+    def pattern(self) -> Optional[str]:
+        return f'%{self.sensor_type}%' if self.sensor_type else None
+
+    @property
+    def filters(self) -> list:
+        out = []
+        if self.sensor_type:
+            out.append(SensorData.mt_name.ilike(self.pattern))
+        if self.start:
+            out.append(SensorData.mt_time >= self.start)
+        if self.end:
+            out.append(SensorData.mt_time <= self.end)
+        return out
+
+
+def export_select(*filters):
+    """Core SELECT over sens00 in the column order expected by services/export.py."""
+    return select(SensorData.mt_name, SensorData.mt_value, SensorData.mt_time, SensorData.mt_quality).where(*filters)
+
+
+def newest_rows(conn):
+    """`(mt_time, mt_name, mt_value, mt_quality)` of the latest row per mt_name of sens00, read from the table."""
+    latest = select(SensorData.mt_name, func.max(SensorData.mt_time).label('latest_time')) \
+        .group_by(SensorData.mt_name).subquery()
+    stmt = select(SensorData.mt_time, SensorData.mt_name, SensorData.mt_value, SensorData.mt_quality).join(
+        latest, (SensorData.mt_name == latest.c.mt_name) & (SensorData.mt_time == latest.c.latest_time)
+    )
+    result = conn.execute(stmt)
+    with phase('fetch'):
+        return result.all()
+
+
+def latest_dicts(rows) -> list:
+    """`(mt_time, mt_name, mt_value, mt_quality)` rows as /sensor-data/newest objects."""
+    return [{
+        'mt_name': name,
+        'mt_value': value,
+        'mt_time': t.isoformat() if t else None,
+        'mt_quality': quality,
+    } for t, name, value, quality in rows]
+
+
+def batch_specs(body) -> list:
+    """The specs of a /sensor-data/batch body; raises ValueError with the 400 message."""
+    specs = body.get('queries') if isinstance(body, dict) else body
+    if not isinstance(specs, list) or not specs:
+        raise ValueError("Expected a JSON body with a non-empty 'queries' list")
+    if len(specs) > MAX_BATCH_QUERIES:
+        raise ValueError(f'At most {MAX_BATCH_QUERIES} queries per batch')
+    if not all(isinstance(spec, dict) for spec in specs):
+        raise ValueError('Each query must be a JSON object')
+    return specs
+
+
+def spec_args(spec: dict) -> dict:
+    """A batch spec as by-table query args (strings, as ByTableArgs.parse expects)."""
+    args = {}
+    for key, value in spec.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = 'true' if value else 'false'
+        args[key] = str(value)
+    return args
+
+
+def raw_rows(conn, sensor, where_sql, params, order, limit, offset=0):
+    """Raw rows of `sensor` ordered by (mt_time, mt_name)."""
+    q = statements.get(('raw', sensor, where_sql, order), lambda: f'''
+        SELECT mt_time, mt_name, mt_value, mt_quality
+        FROM "{SCHEMA}"."{sensor}"
+        {where_sql}
+        ORDER BY mt_time {order}, mt_name {order}
+        LIMIT :limit OFFSET :offset
+    ''')
+    result = conn.execute(q, {**params, "limit": limit, "offset": offset})
+    with phase('fetch'):
+        return result.mappings().all()
+
+
+def raw_columns(conn, sensor, where_sql, params, order, limit, offset=0):
+    """Raw rows of `sensor` as `(epoch seconds, mt_name, numeric value, mt_quality)` tuples."""
+    value = value_sql(sensor)
+    q = statements.get(('raw_columns', sensor, where_sql, order, value), lambda: f'''
+        SELECT EXTRACT(EPOCH FROM mt_time)::double precision AS t, mt_name,
+               {value} AS v,
+               mt_quality
+        FROM "{SCHEMA}"."{sensor}"
+        {where_sql}
+        ORDER BY mt_time {order}, mt_name {order}
+        LIMIT :limit OFFSET :offset
+    ''')
+    result = conn.execute(q, {**params, "limit": limit, "offset": offset})
+    with phase('fetch'):
+        return result.all()
+
+
+def columns_meta(rows, order, limit, offset):
+    """Paging fields for `raw_columns` rows, matching those of `raw_page`."""
+    meta = {'order': order, 'limit': limit, 'offset': offset, 'next_after': None, 'next_before': None, 'next_cursor': None}
+    if rows:
+        def _at(seconds):
+            return datetime(1970, 1, 1) + timedelta(microseconds=round(seconds * 1e6))
+        t = [r[0] for r in rows]
+        edge = _at(max(t) if order == 'asc' else min(t))
+        meta['next_after' if order == 'asc' else 'next_before'] = edge.isoformat()
+        if len(rows) == limit:
+            meta['next_cursor'] = encode_cursor(_at(rows[-1][0]), rows[-1][1])
+    return meta
+
+
+def bucket_rows(conn, sensor, where_sql, params, start_time, end_time, target_points, use_rollups=True):
+    """AVG/MIN/MAX/COUNT per mt_name in ~target_points time buckets, from rollups when possible."""
+    duration_seconds = max(1, int((end_time - start_time).total_seconds()))
+    bucket = max(1, duration_seconds // target_points)
+
+    if use_rollups:
+        rows = rollups.query_buckets(conn, sensor, start_time, end_time, bucket, target_points + 5)
+        if rows is not None:
+            return rows
+
+    value = value_sql(sensor)
+    q = statements.get(('buckets', sensor, where_sql, value), lambda: f'''
+        SELECT
+            to_timestamp(floor(extract(epoch from mt_time)/:bucket)::bigint * :bucket) AS bucket_start,
+            mt_name,
+            AVG({value}) AS avg,
+            MIN({value}) AS min,
+            MAX({value}) AS max,
+            COUNT(*) AS count
+        FROM "{SCHEMA}"."{sensor}"
+        {where_sql}
+        GROUP BY bucket_start, mt_name
+        ORDER BY bucket_start ASC, mt_name ASC
+        LIMIT :max_buckets
+        ''')
+    result = conn.execute(q, {**params, "bucket": bucket, "max_buckets": target_points + 5})
+    with phase('fetch'):
+        return result.mappings().all()
+
+
+def bucket_dicts(rows):
+    return [{ 'bucket_start': (r['bucket_start'].isoformat() if r['bucket_start'] else None), 'mt_name': r['mt_name'], 'avg': r['avg'], 'min': r['min'], 'max': r['max'], 'count': r['count'] } for r in rows]
+
+
+def raw_page(rows, order, limit, offset):
+    """JSON page for raw by-table rows, with time and keyset cursors for the next page."""
+    next_after = None
+    next_before = None
+    next_cursor = None
+    if len(rows) == limit and rows[-1]['mt_time']:
+        next_cursor = encode_cursor(rows[-1]['mt_time'], rows[-1]['mt_name'])
+    if rows:
+        times = [r['mt_time'] for r in rows if r['mt_time']]
+        if times:
+            if order == 'asc':
+                next_after = max(times).isoformat()
+            else:
+                next_before = min(times).isoformat()
+
+    return {
+        'rows': [{
+            'mt_time': r['mt_time'].isoformat() if r['mt_time'] else None,
+            'mt_name': r['mt_name'],
+            'mt_value': r['mt_value'],
+            'mt_quality': r['mt_quality'],
+        } for r in rows],
+        'next_after': next_after,
+        'next_before': next_before,
+        'next_cursor': next_cursor,
+        'order': order,
+        'limit': limit,
+        'offset': offset,
+    }
+
+
+def page_payload(conn, args: ByTableArgs):
+    """
+    JSON-ready by-table payload for anything but a shape-preserving
+    downsample (`args.algorithm`): AVG/MIN/MAX buckets or a raw page.
+    """
+    if args.downsample:
+        rows = bucket_rows(conn, args.sensor, args.where_sql, args.params, args.start, args.end,
+                           args.target_points, use_rollups=args.use_rollups)
+        return compact.bucket_payload(rows) if args.compact else bucket_dicts(rows)
+    if args.compact:
+        rows = raw_columns(conn, args.sensor, args.where_sql, args.params, args.order, args.limit, args.offset)
+        return compact.raw_payload(rows, **columns_meta(rows, args.order, args.limit, args.offset))
+    rows = raw_rows(conn, args.sensor, args.where_sql, args.params, args.order, args.limit, args.offset)
+    return raw_page(rows, args.order, args.limit, args.offset)
+
+
+def raw_columnar(rows) -> list:
+    """`raw_columns` rows as mt_time/mt_name/mt_value/mt_quality column buffers."""
+    t, names, values, quality = zip(*rows) if rows else ((), (), (), ())
+    return [
+        columnar.time_column('mt_time', np.floor(np.asarray(t, dtype=np.float64) * 1000)),
+        columnar.dict_column('mt_name', names),
+        columnar.float_column('mt_value', values),
+        columnar.dict_column('mt_quality', quality),
+    ]
+
+
+def bucket_columnar(rows) -> list:
+    """`bucket_rows` as bucket_start/mt_name/avg/min/max/count column buffers."""
+    start, names, avg, mn, mx, count = zip(*(
+        (r['bucket_start'], r['mt_name'], r['avg'], r['min'], r['max'], r['count']) for r in rows
+    )) if rows else ((),) * 6
+    return [
+        columnar.time_column('bucket_start', [columnar.epoch_ms(b) for b in start]),
+        columnar.dict_column('mt_name', names),
+        columnar.float_column('avg', avg),
+        columnar.float_column('min', mn),
+        columnar.float_column('max', mx),
+        columnar.int_column('count', count),
+    ]
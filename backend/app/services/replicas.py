@@ -0,0 +1,192 @@
+"""Optional read replicas for heavy history, export and aggregation queries.
+
+With `DATABASE_REPLICA_URLS` set, views decorated with `@replica_read` run
+their queries on a replica picked round-robin among the healthy ones; every
+other view (latest values, snapshots, /health, sensor list, ...) and all
+background work stays on the primary. The pick is made once per request, so
+all of a view's statements see the same replica, and falls back to the
+primary when no replica is usable.
+
+A background thread checks each replica every `REPLICA_CHECK_SECONDS`:
+it must answer, and its replay lag (0 when it has replayed everything it
+received, or when it is not a streaming standby at all) must not exceed
+`REPLICA_MAX_LAG_SECONDS`. A replica whose connection fails during a request
+is taken out of rotation until the next successful check.
+"""
+
+import contextvars
+import itertools
+import logging
+import threading
+import time
+from datetime import timedelta
+from functools import wraps
+from typing import List, Optional
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
+
+from backend.app.services import database, metrics
+from backend.app.services.slow_queries import slow_queries
+from backend.app.utils.config import settings
+
+log = logging.getLogger(__name__)
+
+# Engine chosen for the current request by @replica_read (None = primary)
+_routed: contextvars.ContextVar[Optional[Engine]] = contextvars.ContextVar('replica_engine', default=None)
+
+_LAG_SQL = '''
+    SELECT pg_is_in_recovery(),
+           CASE
+               WHEN NOT pg_is_in_recovery() THEN 0
+               WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+               ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END::double precision
+'''
+
+
+class Replica:
+    def __init__(self, url: str, engine: Engine):
+        self.url = url
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = engine
+        self.healthy = False  # until the first successful check
+        self.in_recovery: Optional[bool] = None
+        self.lag_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.requests = 0
+
+    def as_dict(self) -> dict:
+        return {
+            'url': self.name,
+            'healthy': self.healthy,
+            'in_recovery': self.in_recovery,
+            'lag_seconds': None if self.lag_seconds is None else round(self.lag_seconds, 3),
+            'error': self.error,
+            'checked_seconds_ago': None if self.checked_at is None else round(time.time() - self.checked_at, 1),
+            'requests': self.requests,
+        }
+
+
+class ReplicaRouter:
+    def __init__(self):
+        self.replicas: List[Replica] = []
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    @property
+    def max_lag(self) -> float:
+        return float(getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 30) or 0)
+
+    def init_app(self, app):
+        urls = [u.strip() for u in (getattr(settings, 'DATABASE_REPLICA_URLS', '') or '').split(',') if u.strip()]
+        app.extensions['replicas'] = self
+        if not urls:
+            return
+        options = database.engine_options()
+        for url in urls:
+            engine = create_engine(url, **options)
+            database.instrument_engine(engine)
+            metrics.instrument_engine(engine)
+            slow_queries.instrument_engine(engine)
+            replica = Replica(url, engine)
+            self.watch(replica, engine)
+            self.replicas.append(replica)
+        interval = max(1.0, float(getattr(settings, 'REPLICA_CHECK_SECONDS', 5) or 5))
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="replica-checker", daemon=True)
+        self._thread.start()
+
+    def _run(self, interval: float):
+        while True:
+            try:
+                self.check()
+            except Exception:
+                log.exception("Replica check failed")
+            time.sleep(interval)
+
+    def check(self):
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    in_recovery, lag = conn.execute(text(_LAG_SQL)).one()
+            except Exception as ex:
+                if replica.healthy:
+                    log.warning("Replica %s is down: %s", replica.name, ex)
+                replica.healthy, replica.error = False, str(ex).splitlines()[0]
+            else:
+                replica.in_recovery, replica.lag_seconds = in_recovery, lag
+                replica.healthy = lag <= self.max_lag
+                replica.error = None if replica.healthy else f'lag {lag:.1f}s exceeds {self.max_lag:g}s'
+            replica.checked_at = time.time()
+
+    def watch(self, replica: Replica, engine: Engine):
+        """Take `replica` out of rotation when a connection of `engine` (one of its engines) fails."""
+
+        def handle_error(ctx):
+            # Connection refused or dropped: stop routing here until a check passes
+            if ctx.is_disconnect or ctx.connection is None:
+                replica.healthy = False
+                replica.error = str(ctx.original_exception).splitlines()[0]
+
+        event.listen(engine, 'handle_error', handle_error)
+
+    def pick(self) -> Optional[Replica]:
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        with self._lock:
+            replica = healthy[next(self._next) % len(healthy)]
+            replica.requests += 1
+        return replica
+
+    def engine(self) -> Engine:
+        """Engine for the current request: its replica under @replica_read, else the primary."""
+        from backend.app import db
+
+        return _routed.get() or db.engine
+
+    def settle_margin(self) -> timedelta:
+        """How far behind the primary a replica may be; closed windows must end before it."""
+        return timedelta(seconds=self.max_lag) if self.enabled else timedelta(0)
+
+    def status(self) -> dict:
+        return {
+            'max_lag_seconds': self.max_lag,
+            'replicas': [r.as_dict() for r in self.replicas],
+        }
+
+
+replicas = ReplicaRouter()
+
+
+def replica_read(view):
+    """View decorator: run the view's queries on a healthy replica when one is configured."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        replica = replicas.pick() if replicas.enabled else None
+        token = _routed.set(replica.engine if replica else None)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _routed.reset(token)
+
+    return wrapper
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that binds to the request's replica under @replica_read."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            routed = _routed.get()
+            if routed is not None:
+                return routed
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
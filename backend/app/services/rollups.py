@@ -0,0 +1,316 @@
+"""Multi-resolution rollups of sensXX tables.
+
+For every discovered sensor table three aggregate tables are maintained:
+`<table>_rollup_1m`, `<table>_rollup_1h` and `<table>_rollup_1d`, holding
+per-bucket sum/count/min/max of the numeric `mt_value` plus the raw row
+count. The 1-minute tier is built from the raw table, coarser tiers from the
+tier below. Progress is tracked per (table, tier) in `mtrix_rollup_state`;
+each refresh recomputes whole buckets from the floor of the watermark, so the
+bucket that was still filling on the previous run is corrected. Rows inserted
+with timestamps older than the watermark are not picked up (use
+`flask rollups rebuild` after back-filling history).
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from backend.app.services.catalog import catalog, SCHEMA
+from backend.app.services.numeric import value_sql
+from backend.app.utils.config import settings
+
+log = logging.getLogger(__name__)
+
+# (name, width in seconds, seconds of source data aggregated per statement)
+TIERS = (
+    ('1m', 60, 86400),
+    ('1h', 3600, 30 * 86400),
+    ('1d', 86400, 365 * 86400),
+)
+
+STATE_TABLE = 'mtrix_rollup_state'
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Seconds a cached copy of the state table is trusted by the query path
+_STATE_TTL = 10
+
+
+def rollup_table(sensor: str, tier: str) -> str:
+    return f'{sensor}_rollup_{tier}'
+
+
+def _floor(ts: datetime, width: int) -> datetime:
+    seconds = int((ts - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=seconds - seconds % width)
+
+
+def _bucket_expr(column: str, width: int) -> str:
+    return f"timestamp '1970-01-01' + floor(extract(epoch from {column}) / {width}) * interval '{width} seconds'"
+
+
+class RollupEngine:
+    """Creates and incrementally refreshes rollup tiers; picks tiers for queries."""
+
+    def __init__(self):
+        self._app = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._state: Dict[Tuple[str, str], datetime] = {}
+        self._state_loaded = 0.0
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions['rollups'] = self
+        interval = int(getattr(settings, 'ROLLUP_REFRESH_SECONDS', 0) or 0)
+        if interval > 0:
+            self._thread = threading.Thread(
+                target=self._run, args=(interval,), name="rollup-refresher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, interval: int):
+        while True:
+            time.sleep(interval)
+            try:
+                with self._app.app_context():
+                    self.refresh_all()
+            except Exception:
+                log.exception("Rollup refresh failed")
+
+    # ---- maintenance -------------------------------------------------------
+
+    def ensure_tables(self, conn, sensor: str):
+        conn.execute(text(
+            f'''
+            CREATE TABLE IF NOT EXISTS "{SCHEMA}"."{STATE_TABLE}" (
+                table_name text NOT NULL,
+                tier text NOT NULL,
+                watermark timestamp,
+                updated_at timestamptz NOT NULL DEFAULT now(),
+                PRIMARY KEY (table_name, tier)
+            )
+            '''
+        ))
+        for tier, _, _ in TIERS:
+            conn.execute(text(
+                f'''
+                CREATE TABLE IF NOT EXISTS "{SCHEMA}"."{rollup_table(sensor, tier)}" (
+                    bucket_start timestamp NOT NULL,
+                    mt_name text NOT NULL,
+                    sum_value double precision,
+                    num_count bigint NOT NULL,
+                    min_value double precision,
+                    max_value double precision,
+                    row_count bigint NOT NULL,
+                    PRIMARY KEY (bucket_start, mt_name)
+                )
+                '''
+            ))
+
+    def refresh_all(self):
+        for info in catalog.tables():
+            try:
+                self.refresh_table(info.table)
+            except Exception:
+                log.exception("Rollup refresh failed for %s", info.table)
+
+    def refresh_table(self, sensor: str):
+        """Bring every tier of `sensor` up to the raw table's current MAX(mt_time)."""
+        from backend.app import db
+
+        with db.engine.begin() as conn:
+            self.ensure_tables(conn, sensor)
+            upto = conn.execute(text(f'SELECT MAX(mt_time) FROM "{SCHEMA}"."{sensor}"')).scalar()
+        if upto is None:
+            return
+
+        source, source_time = f'"{SCHEMA}"."{sensor}"', 'mt_time'
+        for tier, width, step in TIERS:
+            with db.engine.connect() as conn:
+                watermark = self._read_watermark(conn, sensor, tier)
+                if watermark is None:
+                    # First run for this tier: start from the oldest source row
+                    watermark = conn.execute(text(f'SELECT MIN({source_time}) FROM {source}')).scalar() or upto
+            lo = _floor(watermark, width)
+            while True:
+                hi = min(lo + timedelta(seconds=step), upto)
+                final = hi >= upto
+                with db.engine.begin() as conn:
+                    self._aggregate(conn, sensor, tier, width, source, source_time, lo, hi, final)
+                    self._write_watermark(conn, sensor, tier, hi)
+                if final:
+                    break
+                lo = hi
+            source, source_time = f'"{SCHEMA}"."{rollup_table(sensor, tier)}"', 'bucket_start'
+
+        with self._lock:
+            self._state_loaded = 0.0
+
+    def rebuild_table(self, sensor: str):
+        """Drop all tier data and watermarks for `sensor`, then refresh from scratch."""
+        from backend.app import db
+
+        with db.engine.begin() as conn:
+            self.ensure_tables(conn, sensor)
+            for tier, _, _ in TIERS:
+                conn.execute(text(f'TRUNCATE "{SCHEMA}"."{rollup_table(sensor, tier)}"'))
+            conn.execute(
+                text(f'DELETE FROM "{SCHEMA}"."{STATE_TABLE}" WHERE table_name = :t'), {"t": sensor}
+            )
+        self.refresh_table(sensor)
+
+    def rewind(self, conn, sensor: str, since: datetime):
+        """Move every tier watermark of `sensor` back to `since` (e.g. after a back-fill)."""
+        self.ensure_tables(conn, sensor)
+        conn.execute(
+            text(
+                f'''UPDATE "{SCHEMA}"."{STATE_TABLE}" SET watermark = :since, updated_at = now()
+                WHERE table_name = :t AND watermark > :since'''
+            ),
+            {"t": sensor, "since": since},
+        )
+        with self._lock:
+            self._state_loaded = 0.0
+
+    def _aggregate(self, conn, sensor, tier, width, source, source_time, lo, hi, final):
+        target = f'"{SCHEMA}"."{rollup_table(sensor, tier)}"'
+        upper = f"{source_time} <= :hi" if final else f"{source_time} < :hi"
+        if source_time == 'mt_time':
+            select = f'''
+                SELECT b, mt_name, SUM(v), COUNT(v), MIN(v), MAX(v), COUNT(*)
+                FROM (
+                    SELECT {_bucket_expr('mt_time', width)} AS b, mt_name,
+                           {value_sql(sensor)} AS v
+                    FROM {source}
+                    WHERE mt_time >= :lo AND {upper}
+                ) s
+                GROUP BY b, mt_name
+            '''
+        else:
+            select = f'''
+                SELECT {_bucket_expr('bucket_start', width)} AS b, mt_name,
+                       SUM(sum_value), SUM(num_count), MIN(min_value), MAX(max_value), SUM(row_count)
+                FROM {source}
+                WHERE bucket_start >= :lo AND {upper}
+                GROUP BY b, mt_name
+            '''
+        conn.execute(
+            text(
+                f'''
+                INSERT INTO {target} (bucket_start, mt_name, sum_value, num_count, min_value, max_value, row_count)
+                {select}
+                ON CONFLICT (bucket_start, mt_name) DO UPDATE SET
+                    sum_value = EXCLUDED.sum_value,
+                    num_count = EXCLUDED.num_count,
+                    min_value = EXCLUDED.min_value,
+                    max_value = EXCLUDED.max_value,
+                    row_count = EXCLUDED.row_count
+                '''
+            ),
+            {"lo": lo, "hi": hi},
+        )
+
+    def _read_watermark(self, conn, sensor: str, tier: str) -> Optional[datetime]:
+        return conn.execute(
+            text(f'SELECT watermark FROM "{SCHEMA}"."{STATE_TABLE}" WHERE table_name = :t AND tier = :tier'),
+            {"t": sensor, "tier": tier},
+        ).scalar()
+
+    def _write_watermark(self, conn, sensor: str, tier: str, watermark: datetime):
+        conn.execute(
+            text(
+                f'''
+                INSERT INTO "{SCHEMA}"."{STATE_TABLE}" (table_name, tier, watermark, updated_at)
+                VALUES (:t, :tier, :wm, now())
+                ON CONFLICT (table_name, tier) DO UPDATE SET watermark = EXCLUDED.watermark, updated_at = now()
+                '''
+            ),
+            {"t": sensor, "tier": tier, "wm": watermark},
+        )
+
+    # ---- query path --------------------------------------------------------
+
+    def watermarks(self, conn) -> Dict[Tuple[str, str], datetime]:
+        """Cached (table, tier) -> watermark map; empty until rollups exist."""
+        if time.time() - self._state_loaded < _STATE_TTL:
+            return self._state
+        state = {}
+        if conn.execute(text("SELECT to_regclass(:name)"), {"name": f'"{SCHEMA}"."{STATE_TABLE}"'}).scalar():
+            rows = conn.execute(text(f'SELECT table_name, tier, watermark FROM "{SCHEMA}"."{STATE_TABLE}"'))
+            state = {(t, tier): wm for t, tier, wm in rows if wm is not None}
+        with self._lock:
+            self._state = state
+            self._state_loaded = time.time()
+        return state
+
+    def pick_tier(self, conn, sensor: str, bucket_seconds: int) -> Optional[Tuple[str, int, datetime]]:
+        """Coarsest tier no wider than `bucket_seconds` (so target_points is still met)."""
+        state = self.watermarks(conn)
+        for tier, width, _ in reversed(TIERS):
+            if width <= bucket_seconds and (sensor, tier) in state:
+                return tier, width, state[(sensor, tier)]
+        return None
+
+    def query_buckets(self, conn, sensor: str, start: datetime, end: datetime, bucket: int, max_buckets: int):
+        """
+        AVG/MIN/MAX/COUNT per `bucket` seconds and mt_name over [start, end],
+        read from the best rollup tier and topped up from the raw table past
+        the tier's watermark. `bucket` is rounded down to a multiple of the
+        tier width. Returns None when no tier applies.
+        """
+        picked = self.pick_tier(conn, sensor, bucket)
+        if picked is None:
+            return None
+        tier, width, watermark = picked
+        cutoff = _floor(watermark, width)
+        if cutoff <= start:
+            return None
+        # Snap to whole tier buckets so no tier bucket straddles two output
+        # buckets; scale the row cap so the same time span is still covered.
+        aligned = max(width, bucket - bucket % width)
+        max_buckets = max_buckets * bucket // aligned
+        bucket = aligned
+
+        q = text(
+            f'''
+            SELECT
+                to_timestamp(floor(extract(epoch from b)/:bucket)::bigint * :bucket) AS bucket_start,
+                mt_name,
+                SUM(sum_value) / NULLIF(SUM(num_count), 0) AS avg,
+                MIN(min_value) AS min,
+                MAX(max_value) AS max,
+                SUM(row_count)::bigint AS count
+            FROM (
+                SELECT bucket_start AS b, mt_name, sum_value, num_count, min_value, max_value, row_count
+                FROM "{SCHEMA}"."{rollup_table(sensor, tier)}"
+                WHERE bucket_start >= :start_floor AND bucket_start < :cutoff AND bucket_start <= :end
+                UNION ALL
+                SELECT mt_time, mt_name, v, (v IS NOT NULL)::int, v, v, 1
+                FROM (
+                    SELECT mt_time, mt_name,
+                           {value_sql(sensor)} AS v
+                    FROM "{SCHEMA}"."{sensor}"
+                    WHERE mt_time >= :cutoff AND mt_time >= :start AND mt_time <= :end
+                ) r
+            ) x
+            GROUP BY bucket_start, mt_name
+            ORDER BY bucket_start ASC, mt_name ASC
+            LIMIT :max_buckets
+            '''
+        )
+        return conn.execute(q, {
+            "bucket": bucket,
+            "start": start,
+            "start_floor": _floor(start, width),
+            "end": end,
+            "cutoff": cutoff,
+            "max_buckets": max_buckets,
+        }).mappings().all()
+
+
+rollups = RollupEngine()
@@ -0,0 +1,217 @@
+"""Opt-in slow-query recorder with sampled EXPLAIN (ANALYZE, BUFFERS).
+
+Enabled with `SLOW_QUERY_MS` > 0. Every statement run on the app engine or a
+read replica that takes longer than the threshold (or is cancelled by
+statement_timeout) is kept in a bounded in-memory ring buffer with its SQL,
+parameters, duration, route, sensXX table and database. A sample of them
+(`SLOW_QUERY_EXPLAIN_SAMPLE`) is re-run by a background thread under
+`EXPLAIN (ANALYZE, BUFFERS)` inside a rolled-back transaction on the engine
+that ran it, and the plan is attached to the entry. Cancelled statements get
+a plain `EXPLAIN` only, since re-running them would just time out
+again. Only SELECT statements are ever explained.
+
+`GET /api/admin/slow-queries` lists the worst entries per table. It returns
+raw SQL, parameters and plans without authentication, so it is only
+registered with `SLOW_QUERY_ENDPOINT=1`; otherwise slow statements are only
+logged.
+"""
+
+import itertools
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, date
+from typing import Dict, List, Optional
+
+from flask import has_request_context, jsonify, request
+from sqlalchemy import event
+
+from backend.app.services.catalog import SENSOR_TABLE_RE
+from backend.app.services.database import is_statement_timeout
+from backend.app.utils.config import settings
+
+log = logging.getLogger(__name__)
+
+# Pending EXPLAIN jobs; slow queries arriving while it is full are not explained
+_EXPLAIN_QUEUE_SIZE = 16
+
+_SKIP_OPTION = '_slow_query_skip'
+# Identifiers in a statement; the first matching SENSOR_TABLE_PATTERN names its table
+_IDENTIFIER_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_$]*')
+_WHITESPACE_RE = re.compile(r'\s+')
+_SELECT_RE = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+
+def _jsonable(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return repr(value)
+
+
+class SlowQueryRecorder:
+    """Ring buffer of slow statements, filled from engine events."""
+
+    def __init__(self):
+        self.threshold_ms = 0
+        self.explain_sample = 0.0
+        self._entries: deque = deque()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._jobs: "queue.Queue" = queue.Queue(maxsize=_EXPLAIN_QUEUE_SIZE)
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def init_app(self, app, db):
+        self.threshold_ms = int(getattr(settings, 'SLOW_QUERY_MS', 0) or 0)
+        if not self.enabled:
+            return
+        self.explain_sample = min(1.0, max(0.0, float(settings.SLOW_QUERY_EXPLAIN_SAMPLE)))
+        self._entries = deque(maxlen=max(1, int(settings.SLOW_QUERY_BUFFER)))
+        app.extensions['slow_queries'] = self
+        with app.app_context():
+            self.instrument_engine(db.engine)
+        if self.explain_sample > 0:
+            self._thread = threading.Thread(target=self._run, name="slow-query-explain", daemon=True)
+            self._thread.start()
+        if not getattr(settings, 'SLOW_QUERY_ENDPOINT', False):
+            return
+
+        @app.route('/api/admin/slow-queries')
+        def slow_queries_report():
+            sensor = request.args.get('sensor')
+            try:
+                limit = int(request.args.get('limit', 10))
+            except ValueError:
+                return jsonify({'error': 'Invalid limit'}), 400
+            return jsonify(self.report(sensor=sensor, limit=limit))
+
+    def instrument_engine(self, engine):
+        """Record `engine`'s slow statements (the primary, and each read replica)."""
+        if not self.enabled:
+            return
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        event.listen(engine, 'handle_error', self._on_error)
+
+    # ---- engine events -----------------------------------------------------
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_slow_started', None)
+        if started is None or conn.get_execution_options().get(_SKIP_OPTION):
+            return
+        elapsed_ms = 1000 * (time.perf_counter() - started)
+        if elapsed_ms >= self.threshold_ms:
+            rows = cursor.rowcount if cursor.description is not None else None
+            self.record(statement, parameters, elapsed_ms, rows=rows, engine=conn.engine)
+
+    def _on_error(self, context):
+        ctx = context.execution_context
+        started = getattr(ctx, '_slow_started', None)
+        if started is None or context.sqlalchemy_exception is None:
+            return
+        if not is_statement_timeout(context.sqlalchemy_exception):
+            return
+        if context.connection is not None and context.connection.get_execution_options().get(_SKIP_OPTION):
+            return
+        elapsed_ms = 1000 * (time.perf_counter() - started)
+        self.record(context.statement, context.parameters, elapsed_ms, cancelled=True, engine=context.engine)
+
+    # ---- recording ---------------------------------------------------------
+
+    def record(self, statement: str, parameters, duration_ms: float, rows: Optional[int] = None,
+               cancelled: bool = False, engine=None):
+        table = next((m for m in _IDENTIFIER_RE.findall(statement) if SENSOR_TABLE_RE.fullmatch(m)), None)
+        entry = {
+            'id': next(self._ids),
+            'at': datetime.utcnow().isoformat(),
+            'duration_ms': round(duration_ms, 3),
+            'table': table,
+            'route': request.path if has_request_context() else None,
+            'database': engine.url.render_as_string(hide_password=True) if engine is not None else None,
+            'sql': _WHITESPACE_RE.sub(' ', statement).strip(),
+            'params': _jsonable(parameters) if isinstance(parameters, (list, tuple)) else
+                      {k: _jsonable(v) for k, v in (parameters or {}).items()},
+            'rows': rows,
+            'cancelled': cancelled,
+            'plan': None,
+        }
+        with self._lock:
+            self._entries.append(entry)
+        log.warning("Slow query (%.0f ms%s) on %s: %s", duration_ms, ', cancelled' if cancelled else '',
+                    entry['table'] or '-', entry['sql'][:500])
+        if (self._thread is not None and engine is not None and _SELECT_RE.match(statement)
+                and random.random() < self.explain_sample):
+            try:
+                self._jobs.put_nowait((entry, engine, statement, parameters))
+            except queue.Full:
+                pass
+
+    def _run(self):
+        while True:
+            entry, engine, statement, parameters = self._jobs.get()
+            try:
+                entry['plan'] = self._explain(engine, statement, parameters, analyze=not entry['cancelled'])
+            except Exception as ex:
+                entry['plan'] = None
+                entry['plan_error'] = str(ex)
+
+    def _explain(self, engine, statement: str, parameters, analyze: bool) -> str:
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS)' if analyze else 'EXPLAIN'
+        # Bound the re-run so sampling cannot hold a connection much longer than the original
+        timeout_ms = int(settings.DB_STATEMENT_TIMEOUT_MS or 0) or 10 * self.threshold_ms
+        with engine.connect().execution_options(**{_SKIP_OPTION: True}) as conn:
+            trans = conn.begin()
+            try:
+                conn.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout_ms)}')
+                result = conn.exec_driver_sql(f'{prefix} {statement}', parameters)
+                return '\n'.join(row[0] for row in result)
+            finally:
+                trans.rollback()
+
+    # ---- reporting ---------------------------------------------------------
+
+    def entries(self) -> List[dict]:
+        with self._lock:
+            return list(self._entries)
+
+    def report(self, sensor: Optional[str] = None, limit: int = 10) -> dict:
+        """Worst recorded statements per sensXX table (`-` for statements without one)."""
+        by_table: Dict[str, List[dict]] = {}
+        for entry in self.entries():
+            table = entry['table'] or '-'
+            if sensor and table != sensor:
+                continue
+            by_table.setdefault(table, []).append(entry)
+        tables = {}
+        for table, entries in sorted(by_table.items()):
+            entries.sort(key=lambda e: e['duration_ms'], reverse=True)
+            tables[table] = {
+                'count': len(entries),
+                'max_ms': entries[0]['duration_ms'],
+                'total_ms': round(sum(e['duration_ms'] for e in entries), 3),
+                'worst': entries[:max(1, limit)],
+            }
+        return {
+            'threshold_ms': self.threshold_ms,
+            'explain_sample': self.explain_sample,
+            'buffer_size': self._entries.maxlen,
+            'tables': tables,
+        }
+
+
+slow_queries = SlowQueryRecorder()
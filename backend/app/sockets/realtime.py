@@ -0,0 +1,265 @@
+"""Real-time push of new sensor rows over Server-Sent Events.
+
+One poller thread per sensXX table that has at least one subscriber reads the
+rows past its `(mt_time, mt_name)` watermark every `REALTIME_POLL_SECONDS`
+and fans them out to every subscribed client, so the database sees one query
+per table per tick however many dashboards are open. Pollers stop once their
+last subscriber leaves.
+
+    GET /api/stream?sensor=sens00&sensor=sens01
+
+Events:
+    event: rows      data: {"sensor": "sens00", "rows": [{mt_time, mt_name, mt_value, mt_quality}, ...]}
+    event: overflow  the client fell too far behind; the stream ends, reconnect and re-sync
+    : keep-alive     comment line sent when nothing happened for a while
+
+Served by Flask, each open stream holds a worker thread, so run the app with
+a threaded server (the dev server, waitress, gunicorn --threads) when using
+it. The ASGI app (asgi.py) serves the same stream from the event loop with an
+`AsyncSubscription` and holds no thread per client.
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from sqlalchemy import text
+
+from backend.app.services.catalog import catalog, SCHEMA, SENSOR_TABLE_RE
+from backend.app.services.pagination import keyset_condition
+from backend.app.utils.config import settings
+
+log = logging.getLogger(__name__)
+
+realtime_bp = Blueprint('realtime', __name__)
+
+# Messages buffered per subscriber before it is considered too slow
+_QUEUE_SIZE = 100
+
+# Rows read per poll and table
+_POLL_LIMIT = 5000
+
+# Seconds without events before a keep-alive comment is sent
+_KEEPALIVE_SECONDS = 15
+
+# Max tables per stream
+_MAX_TABLES = 200
+
+STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+_OVERFLOW = object()
+
+
+class Subscription:
+    _full, _empty = queue.Full, queue.Empty
+
+    def __init__(self, tables):
+        self.tables = tuple(tables)
+        self.queue = self._make_queue()
+        self.overflowed = False
+
+    def _make_queue(self):
+        return queue.Queue(maxsize=_QUEUE_SIZE)
+
+    def deliver(self, message):
+        self._offer(message)
+
+    def _offer(self, message):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except self._full:
+            self.overflowed = True
+            # Make room so the reader wakes up and sees the overflow marker
+            try:
+                self.queue.get_nowait()
+            except self._empty:
+                pass
+            self.queue.put_nowait(_OVERFLOW)
+
+
+class AsyncSubscription(Subscription):
+    """Subscription read by a coroutine on `loop`; pollers hand messages over thread-safely."""
+
+    _full, _empty = asyncio.QueueFull, asyncio.QueueEmpty
+
+    def __init__(self, tables, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        super().__init__(tables)
+
+    def _make_queue(self):
+        return asyncio.Queue(maxsize=_QUEUE_SIZE)
+
+    def deliver(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._offer, message)
+        except RuntimeError:
+            pass  # loop closed: the stream is gone, unsubscribe follows
+
+
+class _TablePoller:
+    """Polls one table past its watermark and fans new rows out."""
+
+    def __init__(self, hub, table):
+        self.hub = hub
+        self.table = table
+        self.subscribers = set()
+        self.watermark = None  # (mt_time, mt_name) of the newest row delivered
+        self.thread = threading.Thread(target=self._run, name=f"realtime-{table}", daemon=True)
+
+    def _run(self):
+        from backend.app import db
+
+        interval = max(0.1, float(getattr(settings, 'REALTIME_POLL_SECONDS', 2)))
+        with self.hub.app.app_context():
+            while True:
+                with self.hub.lock:
+                    if not self.subscribers:
+                        self.hub.pollers.pop(self.table, None)
+                        return
+                    subscribers = list(self.subscribers)
+                try:
+                    with db.engine.connect() as conn:
+                        if self.watermark is None:
+                            self.watermark = self._latest(conn)
+                        rows = self._poll(conn) if self.watermark else []
+                except Exception:
+                    log.exception("Realtime poll failed for %s", self.table)
+                    rows = []
+                if rows:
+                    message = json.dumps({'sensor': self.table, 'rows': rows})
+                    for sub in subscribers:
+                        sub.deliver(message)
+                if len(rows) < _POLL_LIMIT:
+                    time.sleep(interval)
+
+    def _latest(self, conn):
+        row = conn.execute(text(
+            f'SELECT mt_time, mt_name FROM "{SCHEMA}"."{self.table}" ORDER BY mt_time DESC, mt_name DESC LIMIT 1'
+        )).first()
+        return (row[0], row[1]) if row else None
+
+    def _poll(self, conn):
+        q = text(
+            f'''
+            SELECT mt_time, mt_name, mt_value, mt_quality
+            FROM "{SCHEMA}"."{self.table}"
+            WHERE {keyset_condition('asc')}
+            ORDER BY mt_time ASC, mt_name ASC
+            LIMIT :limit
+            '''
+        )
+        rows = conn.execute(q, {
+            "cursor_time": self.watermark[0],
+            "cursor_name": self.watermark[1],
+            "limit": _POLL_LIMIT,
+        }).all()
+        if rows:
+            self.watermark = (rows[-1][0], rows[-1][1])
+        return [{
+            'mt_time': t.isoformat() if t else None,
+            'mt_name': n,
+            'mt_value': v,
+            'mt_quality': q,
+        } for t, n, v, q in rows]
+
+
+class RealtimeHub:
+    def __init__(self):
+        self.app = None
+        self.lock = threading.Lock()
+        self.pollers = {}
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['realtime'] = self
+
+    def subscribe(self, tables) -> Subscription:
+        return self.attach(Subscription(tables))
+
+    def attach(self, sub: Subscription) -> Subscription:
+        """Start delivering new rows of `sub.tables` to `sub`."""
+        with self.lock:
+            for table in sub.tables:
+                poller = self.pollers.get(table)
+                if poller is None:
+                    poller = self.pollers[table] = _TablePoller(self, table)
+                    poller.subscribers.add(sub)
+                    poller.thread.start()
+                else:
+                    poller.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self.lock:
+            for table in sub.tables:
+                poller = self.pollers.get(table)
+                if poller is not None:
+                    poller.subscribers.discard(sub)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {t: len(p.subscribers) for t, p in self.pollers.items()}
+
+
+hub = RealtimeHub()
+
+
+def check_tables(tables):
+    """`(message, status)` when a stream cannot be opened for `tables`, else None."""
+    if not tables or not all(SENSOR_TABLE_RE.fullmatch(t) for t in tables):
+        return "Invalid or missing 'sensor' (expected like sens00)", 400
+    if len(tables) > _MAX_TABLES:
+        return f"At most {_MAX_TABLES} sensors per stream", 400
+    unknown = [t for t in tables if catalog.get(t) is None]
+    if unknown:
+        return f"Unknown sensor table(s): {', '.join(unknown)}", 404
+    return None
+
+
+def event(message) -> str:
+    """SSE text of a queued message."""
+    if message is _OVERFLOW:
+        return 'event: overflow\ndata: {}\n\n'
+    return f'event: rows\ndata: {message}\n\n'
+
+
+@realtime_bp.route('/stream', methods=['GET'])
+def stream():
+    """
+    Subscribe to new rows of one or more sensXX tables (Server-Sent Events).
+    Params:
+      sensor: required, repeatable (e.g. ?sensor=sens00&sensor=sens01)
+    """
+    tables = list(dict.fromkeys(request.args.getlist('sensor')))
+    error = check_tables(tables)
+    if error is not None:
+        return jsonify({"error": error[0]}), error[1]
+
+    sub = hub.subscribe(tables)
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    message = sub.queue.get(timeout=_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield event(message)
+                if message is _OVERFLOW:
+                    return
+        finally:
+            hub.unsubscribe(sub)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers=STREAM_HEADERS,
+    )
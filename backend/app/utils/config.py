@@ -29,6 +29,56 @@ try:
         SENSOR_TABLE_PATTERN: str = r"^sens\d+$"
         DB_SCHEMA: str = "public"
 
+        # Sensor catalog: seconds between background refreshes (0 disables)
+        CATALOG_REFRESH_SECONDS: int = 30
+        # Rollup tiers: seconds between background refreshes (0 = CLI only)
+        ROLLUP_REFRESH_SECONDS: int = 0
+        # Threads running /api/sensor-data/batch queries (shared by all requests)
+        BATCH_MAX_WORKERS: int = 4
+        # ASGI mode: threads serving the routes bridged to Flask
+        ASGI_WSGI_THREADS: int = 16
+        # Response cache for time-series endpoints
+        RESPONSE_CACHE_SIZE: int = 256
+        RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+        RESPONSE_CACHE_TTL: int = 5
+        # Real-time push: seconds between polls of each subscribed table
+        REALTIME_POLL_SECONDS: float = 2
+        # Latest-value snapshot: max seconds before the cache is refreshed on request
+        SNAPSHOT_MAX_AGE: float = 2
+        # Connection pool: persistent connections, extra burst connections, seconds to wait for one
+        DB_POOL_SIZE: int = 10
+        DB_MAX_OVERFLOW: int = 10
+        DB_POOL_TIMEOUT: int = 3
+        # Seconds after which pooled connections are replaced
+        DB_POOL_RECYCLE: int = 1800
+        # Default statement_timeout (ms) for API queries; 0 disables
+        DB_STATEMENT_TIMEOUT_MS: int = 15000
+        # Prometheus-style /metrics endpoint and request instrumentation
+        METRICS_ENABLED: bool = True
+        # Slow-query recorder: threshold in ms (0 disables), share of slow SELECTs re-run under EXPLAIN ANALYZE, entries kept
+        SLOW_QUERY_MS: int = 0
+        SLOW_QUERY_EXPLAIN_SAMPLE: float = 0.1
+        SLOW_QUERY_BUFFER: int = 200
+        # Expose the recorded statements at /api/admin/slow-queries (unauthenticated)
+        SLOW_QUERY_ENDPOINT: bool = False
+        # Map locations: folder with <name>.sensors.json manifests (default frontend/public/maps), location:table overrides
+        LOCATIONS_DIR: str = ""
+        LOCATION_TABLES: str = ""
+        # Seconds between open-time limit event scans (0 = only via `flask events refresh`)
+        EVENTS_REFRESH_SECONDS: int = 0
+        # Channel (last mt_name segment) whose non-zero value means the valve is open
+        EVENTS_CHANNEL: str = "I1"
+        # Read replicas (comma-separated URLs) for history/export/aggregation routes
+        DATABASE_REPLICA_URLS: str = ""
+        # Replicas lagging more than this many seconds are skipped
+        REPLICA_MAX_LAG_SECONDS: float = 30.0
+        # Seconds between replica health/lag checks
+        REPLICA_CHECK_SECONDS: float = 5.0
+        # Estimated rows above which unbounded reads are downsampled or rejected (0 = off)
+        QUERY_MAX_ROWS: int = 500_000
+        # downsample or reject
+        QUERY_GUARD_MODE: str = "downsample"
+
         class Config:
             env_file = ".env"
 
@@ -48,6 +98,34 @@ try:
         SECRET_KEY = _settings.SECRET_KEY
         SENSOR_TABLE_PATTERN = _settings.SENSOR_TABLE_PATTERN
         DB_SCHEMA = _settings.DB_SCHEMA
+        CATALOG_REFRESH_SECONDS = _settings.CATALOG_REFRESH_SECONDS
+        ROLLUP_REFRESH_SECONDS = _settings.ROLLUP_REFRESH_SECONDS
+        BATCH_MAX_WORKERS = _settings.BATCH_MAX_WORKERS
+        ASGI_WSGI_THREADS = _settings.ASGI_WSGI_THREADS
+        RESPONSE_CACHE_SIZE = _settings.RESPONSE_CACHE_SIZE
+        RESPONSE_CACHE_MAX_BYTES = _settings.RESPONSE_CACHE_MAX_BYTES
+        RESPONSE_CACHE_TTL = _settings.RESPONSE_CACHE_TTL
+        REALTIME_POLL_SECONDS = _settings.REALTIME_POLL_SECONDS
+        SNAPSHOT_MAX_AGE = _settings.SNAPSHOT_MAX_AGE
+        DB_POOL_SIZE = _settings.DB_POOL_SIZE
+        DB_MAX_OVERFLOW = _settings.DB_MAX_OVERFLOW
+        DB_POOL_TIMEOUT = _settings.DB_POOL_TIMEOUT
+        DB_POOL_RECYCLE = _settings.DB_POOL_RECYCLE
+        DB_STATEMENT_TIMEOUT_MS = _settings.DB_STATEMENT_TIMEOUT_MS
+        METRICS_ENABLED = _settings.METRICS_ENABLED
+        SLOW_QUERY_MS = _settings.SLOW_QUERY_MS
+        SLOW_QUERY_EXPLAIN_SAMPLE = _settings.SLOW_QUERY_EXPLAIN_SAMPLE
+        SLOW_QUERY_BUFFER = _settings.SLOW_QUERY_BUFFER
+        SLOW_QUERY_ENDPOINT = _settings.SLOW_QUERY_ENDPOINT
+        LOCATIONS_DIR = _settings.LOCATIONS_DIR
+        LOCATION_TABLES = _settings.LOCATION_TABLES
+        EVENTS_REFRESH_SECONDS = _settings.EVENTS_REFRESH_SECONDS
+        EVENTS_CHANNEL = _settings.EVENTS_CHANNEL
+        DATABASE_REPLICA_URLS = _settings.DATABASE_REPLICA_URLS
+        REPLICA_MAX_LAG_SECONDS = _settings.REPLICA_MAX_LAG_SECONDS
+        REPLICA_CHECK_SECONDS = _settings.REPLICA_CHECK_SECONDS
+        QUERY_MAX_ROWS = _settings.QUERY_MAX_ROWS
+        QUERY_GUARD_MODE = _settings.QUERY_GUARD_MODE
 
     settings = _Proxy()
 
@@ -95,5 +173,33 @@ except Exception:
         SECRET_KEY = os.getenv("SECRET_KEY", "change-me")
         SENSOR_TABLE_PATTERN = os.getenv("SENSOR_TABLE_PATTERN", r"^sens\d+$")
         DB_SCHEMA = os.getenv("DB_SCHEMA", "public")
+        CATALOG_REFRESH_SECONDS = int(os.getenv("CATALOG_REFRESH_SECONDS", "30"))
+        ROLLUP_REFRESH_SECONDS = int(os.getenv("ROLLUP_REFRESH_SECONDS", "0"))
+        BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+        ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "16"))
+        RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+        RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "5"))
+        REALTIME_POLL_SECONDS = float(os.getenv("REALTIME_POLL_SECONDS", "2"))
+        SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", "2"))
+        DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+        DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "3"))
+        DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+        METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+        SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "0"))
+        SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0.1"))
+        SLOW_QUERY_BUFFER = int(os.getenv("SLOW_QUERY_BUFFER", "200"))
+        SLOW_QUERY_ENDPOINT = os.getenv("SLOW_QUERY_ENDPOINT", "0").lower() in ("1", "true", "yes")
+        LOCATIONS_DIR = os.getenv("LOCATIONS_DIR", "")
+        LOCATION_TABLES = os.getenv("LOCATION_TABLES", "")
+        EVENTS_REFRESH_SECONDS = int(os.getenv("EVENTS_REFRESH_SECONDS", "0"))
+        EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "I1")
+        DATABASE_REPLICA_URLS = os.getenv("DATABASE_REPLICA_URLS", "")
+        REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "30"))
+        REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "5"))
+        QUERY_MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", "500000"))
+        QUERY_GUARD_MODE = os.getenv("QUERY_GUARD_MODE", "downsample")
 
     settings = _Fallback()
@@ -0,0 +1,12 @@
+"""Benchmark harness: synthetic MT-517 data and replayed dashboard traffic.
+
+    flask --app main:app bench seed --tables 4 --days 14
+    flask --app main:app bench run --concurrency 8 --requests 2000 --save-baseline bench-baseline.json
+    flask --app main:app bench run --baseline bench-baseline.json       (exit code 1 on regression)
+
+`seed` fills sensXX tables with deterministic, realistic readings
+(`generator.py`); `run` replays a weighted mix of the dashboard's requests
+(`workload.py`) against the app in-process, or a running server with
+`--url`, and reports p50/p95/p99 latency, throughput and DB time per endpoint
+(`runner.py`).
+"""
@@ -0,0 +1,72 @@
+"""Synthetic MT-517 readings for benchmark tables.
+
+Each table holds `sensors` measuring points named like the collectors
+produce them, `KG<n>.SZ<m>.AI` (analog, three decimals, daily cycle plus
+noise) and `KG<n>.SZ<m>.I1` (digital 0/1, mostly 0), sampled every
+`interval` seconds. About one reading in a thousand has quality `B`, and
+analog channels occasionally report `ERR` so the non-numeric paths get
+exercised too. Rows are generated inside Postgres with a fixed `setseed`, so
+the same arguments always produce the same data.
+"""
+
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import text
+
+from backend.app.services.catalog import SCHEMA
+from backend.app.services.ingest import create_table, table_exists
+
+DEFAULT_START = datetime(2024, 1, 1)
+
+
+def table_names(count: int, first: int = 0) -> List[str]:
+    return [f'sens{i:02d}' for i in range(first, first + count)]
+
+
+def fill_table(conn, table: str, index: int, sensors: int, start: datetime, days: float, interval: int, seed: float) -> int:
+    """Insert the readings of one table; returns the number of rows."""
+    conn.execute(text('SELECT setseed(:seed)'), {'seed': seed})
+    result = conn.execute(text(f'''
+        INSERT INTO "{SCHEMA}"."{table}" (mt_name, mt_time, mt_value, mt_quality)
+        SELECT
+            format('KG%s.SZ%s.%s', :kg, p.sz, c.channel),
+            ts,
+            CASE
+                WHEN c.channel = 'I1' THEN (random() < 0.05)::int::text
+                WHEN random() < 0.0005 THEN 'ERR'
+                ELSE round((5 + 4 * sin(2 * pi() * extract(epoch FROM ts) / 86400 + p.sz)
+                            + random() - 0.5)::numeric, 3)::text
+            END,
+            CASE WHEN random() < 0.001 THEN 'B' ELSE 'G' END
+        FROM generate_series(1, :sensors) AS p(sz)
+        CROSS JOIN (VALUES ('AI'), ('I1')) AS c(channel)
+        CROSS JOIN generate_series(CAST(:start AS timestamp), CAST(:end AS timestamp),
+                                   make_interval(secs => :interval)) AS ts
+    '''), {
+        'kg': index + 1,
+        'sensors': sensors,
+        'start': start,
+        'end': start + timedelta(days=days),
+        'interval': interval,
+    })
+    conn.execute(text(f'ANALYZE "{SCHEMA}"."{table}"'))
+    return result.rowcount
+
+
+def seed(engine, tables: List[str], sensors: int, days: float, interval: int,
+         start: datetime = DEFAULT_START, replace: bool = False, seed_value: float = 0.42):
+    """
+    Create and fill `tables`; yields `(table, rows)` as each one finishes,
+    with rows None for existing tables that were left alone.
+    """
+    for i, table in enumerate(tables):
+        with engine.begin() as conn:
+            if table_exists(conn, table):
+                if not replace:
+                    yield table, None
+                    continue
+                conn.execute(text(f'DROP TABLE "{SCHEMA}"."{table}" CASCADE'))
+            create_table(conn, table)
+            rows = fill_table(conn, table, i, sensors, start, days, interval, (seed_value + 0.01 * i) % 1)
+        yield table, rows
@@ -0,0 +1,172 @@
+"""Replays a workload at fixed concurrency and summarizes it per endpoint.
+
+Each of `concurrency` workers sends its next request as soon as the previous
+one finished (closed loop). Latency is measured around the whole request;
+DB time is the `execute` + `fetch` phases the app reports in its
+`Server-Timing` header (absent with METRICS_ENABLED=0 and on the async-mode
+native routes).
+
+A report can be saved as a baseline and later runs compared against it: an
+endpoint regresses when its p95 grows by more than `tolerance` (and by at
+least `min_delta_ms`, so sub-millisecond noise is ignored) or when it starts
+failing requests.
+"""
+
+import json
+import platform
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.bench.workload import Request
+
+# Server-Timing phases counted as database time
+DB_PHASES = ('execute', 'fetch')
+
+# (status, body bytes, Server-Timing header)
+Result = Tuple[int, int, Optional[str]]
+
+
+class AppClient:
+    """Sends requests to the Flask app in-process (one test client per thread)."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def get(self, path: str) -> Result:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        resp = client.get(path)
+        return resp.status_code, len(resp.get_data()), resp.headers.get('Server-Timing')
+
+
+class HttpClient:
+    """Sends requests to a running server."""
+
+    def __init__(self, base_url: str, timeout: float = 60):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def get(self, path: str) -> Result:
+        try:
+            with urllib.request.urlopen(self.base_url + path, timeout=self.timeout) as resp:
+                return resp.status, len(resp.read()), resp.headers.get('Server-Timing')
+        except urllib.error.HTTPError as ex:
+            return ex.code, len(ex.read()), ex.headers.get('Server-Timing')
+
+
+def db_ms(server_timing: Optional[str]) -> Optional[float]:
+    if not server_timing:
+        return None
+    total = 0.0
+    for part in server_timing.split(','):
+        name, _, params = part.strip().partition(';')
+        if name in DB_PHASES and params.startswith('dur='):
+            total += float(params[4:])
+    return total
+
+
+def _percentiles(values: List[float]) -> dict:
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None, 'mean': None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'p50': round(p50, 3), 'p95': round(p95, 3), 'p99': round(p99, 3), 'mean': round(float(np.mean(values)), 3)}
+
+
+def run(client, requests: List[Request], concurrency: int, warmup: int = 0) -> dict:
+    """Send `requests` with `concurrency` workers; the first `warmup` are not measured."""
+    for req in requests[:warmup]:
+        client.get(req.path)
+    requests = requests[warmup:]
+
+    def send(req: Request):
+        start = time.perf_counter()
+        status, size, timing = client.get(req.path)
+        return req.endpoint, 1000 * (time.perf_counter() - start), status, size, db_ms(timing)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='bench') as pool:
+        results = list(pool.map(send, requests))
+    wall = time.perf_counter() - started
+
+    by_endpoint: Dict[str, list] = {}
+    for result in results:
+        by_endpoint.setdefault(result[0], []).append(result)
+
+    endpoints = {}
+    for endpoint, rows in sorted(by_endpoint.items()):
+        latencies = [r[1] for r in rows]
+        db = [r[4] for r in rows if r[4] is not None]
+        endpoints[endpoint] = {
+            'requests': len(rows),
+            'errors': sum(1 for r in rows if r[2] >= 400),
+            'latency_ms': _percentiles(latencies),
+            'db_ms': _percentiles(db),
+            'rps': round(len(rows) / wall, 2) if wall else None,
+            'avg_bytes': int(sum(r[3] for r in rows) / len(rows)),
+        }
+    all_latencies = [r[1] for r in results]
+    return {
+        'created_at': datetime.utcnow().isoformat(),
+        'host': platform.node(),
+        'concurrency': concurrency,
+        'requests': len(results),
+        'seconds': round(wall, 3),
+        'rps': round(len(results) / wall, 2) if wall else None,
+        'errors': sum(1 for r in results if r[2] >= 400),
+        'latency_ms': _percentiles(all_latencies),
+        'endpoints': endpoints,
+    }
+
+
+def format_report(report: dict) -> str:
+    def fmt(value):
+        return '-' if value is None else f'{value:.1f}'
+
+    lines = [
+        f"{report['requests']} requests in {report['seconds']} s at concurrency {report['concurrency']}: "
+        f"{report['rps']} req/s, {report['errors']} errors",
+        f"{'endpoint':<22} {'n':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'db p50':>8} {'db p95':>8} {'req/s':>8} {'bytes':>10}",
+    ]
+    for name, e in report['endpoints'].items():
+        lat, db = e['latency_ms'], e['db_ms']
+        lines.append(
+            f"{name:<22} {e['requests']:>6} {e['errors']:>4} {fmt(lat['p50']):>8} {fmt(lat['p95']):>8} "
+            f"{fmt(lat['p99']):>8} {fmt(db['p50']):>8} {fmt(db['p95']):>8} {fmt(e['rps']):>8} {e['avg_bytes']:>10}"
+        )
+    return '\n'.join(lines)
+
+
+def save_baseline(report: dict, path: str):
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+        fh.write('\n')
+
+
+def load_baseline(path: str) -> dict:
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def compare(report: dict, baseline: dict, tolerance: float = 0.2, min_delta_ms: float = 2.0) -> List[str]:
+    """Regressions of `report` against `baseline`, as human-readable lines (empty when none)."""
+    regressions = []
+    for name, current in report['endpoints'].items():
+        base = baseline.get('endpoints', {}).get(name)
+        if base is None:
+            continue
+        now_p95, base_p95 = current['latency_ms']['p95'], base['latency_ms']['p95']
+        if now_p95 is not None and base_p95 is not None:
+            if now_p95 > base_p95 * (1 + tolerance) and now_p95 - base_p95 >= min_delta_ms:
+                regressions.append(f'{name}: p95 {base_p95:.1f} ms -> {now_p95:.1f} ms')
+        if current['errors'] and not base.get('errors'):
+            regressions.append(f"{name}: {current['errors']} failed requests (baseline had none)")
+    return regressions
@@ -0,0 +1,92 @@
+"""Representative dashboard traffic for the benchmark runner.
+
+The mix follows what the frontend does: the sensor list and snapshot are
+polled constantly, charts load downsampled windows (bucketed and LTTB),
+tables page through raw rows, and the time-range picker asks for a table's
+range. Windows are drawn inside each table's actual [min_time, max_time], so
+the workload adapts to whatever data is present. With the same seed and
+catalog the same request sequence is produced.
+"""
+
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, List, Optional, Sequence
+from urllib.parse import urlencode
+
+from backend.app.services.catalog import TableInfo
+
+
+@dataclass(frozen=True)
+class Request:
+    endpoint: str  # report key, e.g. "by-table:downsample"
+    path: str      # path and query string
+
+
+@dataclass(frozen=True)
+class Scenario:
+    endpoint: str
+    weight: int
+    build: Callable[[random.Random, TableInfo], str]
+
+
+def _window(rng: random.Random, info: TableInfo, span: timedelta):
+    lo, hi = info.min_time, info.max_time
+    if hi - lo <= span:
+        return lo, hi
+    start = lo + timedelta(seconds=rng.uniform(0, (hi - lo - span).total_seconds()))
+    return start, start + span
+
+
+def _by_table(info: TableInfo, start, end, **params) -> str:
+    query = {'sensor': info.table, 'start': start.isoformat(), 'end': end.isoformat(), **params}
+    return '/api/sensor-data/by-table?' + urlencode(query)
+
+
+def _raw_page(rng, info):
+    start, end = _window(rng, info, timedelta(hours=6))
+    return _by_table(info, start, end, limit=1000)
+
+
+def _raw_page_compact(rng, info):
+    start, end = _window(rng, info, timedelta(hours=6))
+    return _by_table(info, start, end, limit=1000, compact=1)
+
+
+def _downsample(rng, info):
+    start, end = _window(rng, info, timedelta(days=rng.choice((1, 7, 30))))
+    return _by_table(info, start, end, downsample='true', target_points=2000)
+
+
+def _lttb(rng, info):
+    start, end = _window(rng, info, timedelta(days=rng.choice((1, 7))))
+    return _by_table(info, start, end, downsample='true', target_points=1000, algorithm='lttb')
+
+
+SCENARIOS: Sequence[Scenario] = (
+    Scenario('sensors', 10, lambda rng, info: '/api/sensors'),
+    Scenario('range', 5, lambda rng, info: f'/api/sensor-data/range?sensor={info.table}'),
+    Scenario('newest', 10, lambda rng, info: '/api/sensor-data/newest'),
+    Scenario('snapshot', 10, lambda rng, info: '/api/sensor-data/snapshot'),
+    Scenario('by-table:raw', 20, _raw_page),
+    Scenario('by-table:compact', 10, _raw_page_compact),
+    Scenario('by-table:downsample', 25, _downsample),
+    Scenario('by-table:lttb', 10, _lttb),
+)
+
+
+def build(tables: List[TableInfo], count: int, seed: int = 42, endpoints: Optional[Sequence[str]] = None) -> List[Request]:
+    """`count` requests drawn from the weighted scenarios over `tables` (which need a time range)."""
+    tables = [t for t in tables if t.min_time and t.max_time]
+    if not tables:
+        raise ValueError('No sensor tables with data; run `flask bench seed` first')
+    scenarios = [s for s in SCENARIOS if not endpoints or s.endpoint in endpoints]
+    if not scenarios:
+        raise ValueError(f"No scenarios match; choose from {', '.join(s.endpoint for s in SCENARIOS)}")
+    rng = random.Random(seed)
+    weights = [s.weight for s in scenarios]
+    requests = []
+    for _ in range(count):
+        scenario = rng.choices(scenarios, weights)[0]
+        requests.append(Request(scenario.endpoint, scenario.build(rng, rng.choice(tables))))
+    return requests
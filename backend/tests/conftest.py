@@ -0,0 +1,22 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from backend.app.services.catalog import TableInfo, catalog
+
+
+@pytest.fixture
+def sensor_tables(monkeypatch):
+    """Replace the sensor catalog with in-memory tables; returns a `add(name, **info)` helper."""
+    tables = {}
+    monkeypatch.setattr(catalog, '_tables', tables)
+    monkeypatch.setattr(catalog, '_loaded', True)
+    # No rediscovery on a lookup miss (it would need the database)
+    monkeypatch.setattr(catalog, '_last_refresh', time.time() + 3600)
+
+    def add(name, min_time=datetime(2024, 1, 1), max_time=datetime(2024, 1, 31), approx_rows=1000, **kwargs):
+        tables[name] = TableInfo(table=name, min_time=min_time, max_time=max_time, approx_rows=approx_rows, **kwargs)
+        return tables[name]
+
+    return add
@@ -0,0 +1,25 @@
+from contextlib import contextmanager
+
+import pytest
+from flask import Flask, has_app_context
+
+from backend.app.routes import api
+
+
+class _Engine:
+    @contextmanager
+    def connect(self):
+        yield object()
+
+
+def test_batch_spec_is_parsed_inside_the_app_context(monkeypatch):
+    seen = []
+
+    def parse(args):
+        seen.append((has_app_context(), args))
+        raise ValueError('Unknown sensor table')
+
+    monkeypatch.setattr(api.ByTableArgs, 'parse', staticmethod(parse))
+    with pytest.raises(ValueError):
+        api._run_batch_spec(Flask(__name__), {'sensor': 'sens01', 'limit': 5, 'downsample': True}, _Engine())
+    assert seen == [(True, {'sensor': 'sens01', 'limit': '5', 'downsample': 'true'})]
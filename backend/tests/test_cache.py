@@ -0,0 +1,140 @@
+from datetime import datetime
+
+import pytest
+from flask import Flask, jsonify
+
+from backend.app.services.cache import cached_response, not_modified, response_cache, window
+
+WATERMARK = datetime(2024, 1, 31)
+CLOSED = '/data?sensor=sens00&end=2024-01-10T00:00:00'
+LIVE = '/data?sensor=sens00'
+
+
+@pytest.fixture
+def client(sensor_tables):
+    sensor_tables('sens00', max_time=WATERMARK)
+    response_cache.clear()
+    app = Flask(__name__)
+    app.testing = True
+    calls = []
+
+    @app.route('/data')
+    @cached_response
+    def data():
+        calls.append(1)
+        return jsonify({'calls': len(calls)})
+
+    client = app.test_client()
+    client.calls = calls
+    yield client
+    response_cache.clear()
+
+
+def test_closed_window_is_immutable_and_cached(client):
+    first = client.get(CLOSED)
+    again = client.get(CLOSED)
+    assert first.status_code == again.status_code == 200
+    assert 'immutable' in first.headers['Cache-Control']
+    assert first.headers['ETag'] == again.headers['ETag']
+    assert first.last_modified.replace(tzinfo=None) == datetime(2024, 1, 10)
+    assert again.get_json() == {'calls': 1}
+    assert len(client.calls) == 1
+
+
+def test_closed_window_etag_answers_304_without_running_the_view(client):
+    etag = client.get(CLOSED).headers['ETag']
+    response_cache.clear()
+    resp = client.get(CLOSED, headers={'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert len(client.calls) == 1
+
+
+def test_live_window_etag_follows_the_body(client):
+    first = client.get(LIVE)
+    assert first.headers['Cache-Control'] == 'no-cache'
+    assert first.last_modified is None
+    # New rows the catalog has not seen yet: the view must run and answer 200
+    response_cache.clear()
+    resp = client.get(LIVE, headers={'If-None-Match': first.headers['ETag']})
+    assert resp.status_code == 200
+    assert resp.get_json() == {'calls': 2}
+    assert resp.headers['ETag'] != first.headers['ETag']
+
+
+def test_live_window_unchanged_body_answers_304(client):
+    etag = client.get(LIVE).headers['ETag']
+    resp = client.get(LIVE, headers={'If-None-Match': etag})
+    assert resp.status_code == 304
+
+
+def test_every_cached_response_varies_on_accept(client):
+    for url in (CLOSED, CLOSED, LIVE, LIVE):
+        assert 'Accept' in client.get(url).headers['Vary']
+
+
+def test_etag_depends_on_the_query(client):
+    a = client.get(CLOSED).headers['ETag']
+    b = client.get('/data?sensor=sens00&end=2024-01-11T00:00:00').headers['ETag']
+    assert a != b
+
+
+def test_live_entry_is_dropped_when_the_watermark_moves(client, sensor_tables):
+    client.get(LIVE)
+    sensor_tables('sens00', max_time=datetime(2024, 2, 1))
+    assert client.get(LIVE).get_json() == {'calls': 2}
+
+
+def test_unknown_table_bypasses_the_cache(client):
+    resp = client.get('/data?sensor=sens99')
+    assert resp.status_code == 200
+    assert 'ETag' not in resp.headers
+
+
+def test_guard_headers_survive_a_replay(sensor_tables):
+    sensor_tables('sens00', max_time=WATERMARK)
+    response_cache.clear()
+    app = Flask(__name__)
+
+    @app.route('/guarded')
+    @cached_response
+    def guarded():
+        resp = jsonify([])
+        resp.headers.update({'X-Query-Guard': 'downsampled', 'X-Estimated-Rows': '2000000'})
+        return resp
+
+    client = app.test_client()
+    client.get('/guarded?sensor=sens00&end=2024-01-10T00:00:00')
+    replay = client.get('/guarded?sensor=sens00&end=2024-01-10T00:00:00')
+    response_cache.clear()
+    assert replay.headers['X-Query-Guard'] == 'downsampled'
+    assert replay.headers['X-Estimated-Rows'] == '2000000'
+
+
+def test_window_policy_without_a_view(sensor_tables):
+    # What the ASGI app uses in place of the decorator
+    sensor_tables('sens00', max_time=WATERMARK)
+    closed = window('/data', [('sensor', 'sens00'), ('end', '2024-01-10T00:00:00')], None)
+    assert closed.key == window('/data', [('end', '2024-01-10T00:00:00'), ('sensor', 'sens00')], None).key
+    headers = closed.headers(closed.static_etag)
+    assert 'immutable' in headers['Cache-Control'] and headers['Vary'] == 'Accept'
+    assert headers['ETag'] == f'"{closed.static_etag}"'
+    assert not_modified(closed, closed.static_etag, headers['ETag'], None)
+    assert not_modified(closed, None, None, headers['Last-Modified'])
+    assert not not_modified(closed, closed.static_etag, '"other"', headers['Last-Modified'])
+
+    live = window('/data', [('sensor', 'sens00')], None)
+    assert live.static_etag is None and live.last_modified is None
+    assert 'Last-Modified' not in live.headers('abc')
+    assert window('/data', [('sensor', 'sens99')], None) is None
+
+
+def test_window_store_and_lookup(sensor_tables):
+    sensor_tables('sens00', max_time=WATERMARK)
+    response_cache.clear()
+    live = window('/data', [('sensor', 'sens00')], 'application/octet-stream')
+    assert live.lookup() is None
+    etag = live.store(b'body', 200, {'Content-Type': 'application/octet-stream', 'X-Other': '1'})
+    entry = live.lookup()
+    response_cache.clear()
+    assert (entry.body, entry.etag) == (b'body', etag)
+    assert entry.headers == {'Content-Type': 'application/octet-stream'}
@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+
+from backend.app import db
+from backend.app.services.catalog import SensorCatalog, TableInfo
+
+OLD_MIN = datetime(2024, 1, 10)
+OLD_MAX = datetime(2024, 1, 31)
+
+
+class _Engine:
+    @contextmanager
+    def connect(self):
+        yield object()
+
+
+@pytest.fixture
+def known(monkeypatch):
+    """A catalog that knows sens01; discovery also finds the new sens02."""
+    monkeypatch.setattr(type(db), 'engine', _Engine(), raising=False)
+    cat = SensorCatalog()
+    cat._tables = {'sens01': TableInfo(table='sens01', min_time=OLD_MIN, max_time=OLD_MAX)}
+    meta = {'columns': (), 'has_time_index': False, 'has_name_index': False, 'indexes': (), 'approx_rows': 10}
+    cat._discover = lambda conn: {'sens01': meta, 'sens02': meta}
+    cat._fetch_ranges = lambda conn, tables: {t: (datetime(2023, 6, 1), datetime(2023, 7, 1)) for t in tables}
+    cat._fetch_latest = lambda conn, known: {'sens01': datetime(2024, 2, 1)}
+    cat.earliest_calls = []
+
+    def fetch_earliest(conn, tables):
+        cat.earliest_calls.append(tables)
+        return {t: datetime(2023, 1, 1) for t in tables}
+
+    cat._fetch_earliest = fetch_earliest
+    return cat
+
+
+def test_refresh_advances_max_without_a_min_scan(known):
+    known.refresh()
+    assert known.earliest_calls == []
+    assert (known.get('sens01').min_time, known.get('sens01').max_time) == (OLD_MIN, datetime(2024, 2, 1))
+    # New tables get their full range
+    assert known.get('sens02').min_time == datetime(2023, 6, 1)
+    assert [s['table'] for s in known.sensors()] == ['sens01', 'sens02']
+
+
+def test_rescan_min_picks_up_back_filled_history(known):
+    known.refresh(['sens01', 'sens02'], rescan_min=True)
+    # Only known tables are rescanned; sens02 was just read in full
+    assert known.earliest_calls == [['sens01']]
+    assert known.get('sens01').min_time == datetime(2023, 1, 1)
@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+
+from backend.app.services import compact
+
+
+def test_raw_payload_shape():
+    rows = [
+        (1704067200.123, 'A.AI', 1.5, 'G'),
+        (1704067260.0, 'A.I1', None, 'B'),
+    ]
+    payload = compact.raw_payload(rows, next_cursor='abc', limit=2)
+    assert payload == {
+        't': [1704067200123, 1704067260000],
+        'n': ['A.AI', 'A.I1'],
+        'v': [1.5, None],
+        'q': ['G', 'B'],
+        'next_cursor': 'abc',
+        'limit': 2,
+    }
+
+
+def test_empty_payloads_keep_their_keys():
+    assert compact.raw_payload([]) == {k: [] for k in compact.RAW_KEYS}
+    assert compact.bucket_payload([]) == {k: [] for k in compact.BUCKET_KEYS}
+
+
+def test_bucket_payload_shape():
+    rows = [{'bucket_start': datetime(2024, 1, 1), 'mt_name': 'A.AI', 'avg': 2.0, 'min': 1.0, 'max': 3.0, 'count': 4}]
+    assert compact.bucket_payload(rows) == {
+        't': [1704067200000], 'n': ['A.AI'], 'avg': [2.0], 'min': [1.0], 'max': [3.0], 'count': [4],
+    }
+
+
+def test_latest_payload_parses_numeric_values():
+    rows = [(datetime(2024, 1, 1), 'A.AI', '12.5', 'G'), (datetime(2024, 1, 1), 'A.TXT', 'open', 'G')]
+    assert compact.latest_payload(rows)['v'] == [12.5, None]
+
+
+def test_epoch_ms_does_not_floor_below_the_stored_microseconds():
+    assert compact.epoch_ms([1.123, 1700000000.001]) == [1123, 1700000000001]
+
+
+def test_dumps_is_compact_json():
+    body = compact.dumps({'t': [1, 2], 'n': ['a']})
+    assert b' ' not in body
+    assert json.loads(body) == {'t': [1, 2], 'n': ['a']}
+
+
+def test_wanted():
+    assert compact.wanted({'compact': '1'}) and compact.wanted({'compact': 'True'})
+    assert not compact.wanted({}) and not compact.wanted({'compact': '0'})
+
+
+def test_snapshot_payload_shape():
+    rows = [
+        ('sens01', datetime(2024, 1, 1), 'A.AI', '2.5', 'G'),
+        ('sens02', None, 'B.I1', 'open', None),
+    ]
+    assert compact.snapshot_payload(rows) == {
+        's': ['sens01', 'sens02'],
+        't': [1704067200000, None],
+        'n': ['A.AI', 'B.I1'],
+        'v': [2.5, None],
+        'q': ['G', None],
+    }
@@ -0,0 +1,99 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+
+from backend.app.services.downsampling import (
+    DEFAULT_TARGET_POINTS, MAX_TARGET_POINTS, SeriesReducer, chunk_arrays, clamp_target_points, lttb, reduce_chunks,
+    series_rows, window_bounds,
+)
+
+
+def _sine(n=10_000):
+    t = np.arange(n, dtype=np.float64)
+    return t, np.sin(t / 50.0)
+
+
+def test_lttb_keeps_endpoints_and_size():
+    t, v = _sine()
+    keep = lttb(t, v, 100)
+    assert len(keep) == 100
+    assert keep[0] == 0 and keep[-1] == len(t) - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_lttb_short_series_is_returned_whole():
+    t, v = _sine(50)
+    assert lttb(t, v, 100).tolist() == list(range(50))
+    assert lttb(t, v, 2).tolist() == [0, 49]
+
+
+@pytest.mark.parametrize('algorithm, target, buckets, keeps_ends', [
+    ('lttb', 200, 200, True),
+    ('minmax', 200, 100, False),  # min and max of 100 buckets
+    ('m4', 200, 50, True),        # first/min/max/last of 50 buckets
+])
+def test_reduce_chunks_size_and_endpoints(algorithm, target, buckets, keeps_ends):
+    t, v = _sine()
+    # Two chunks and two series, as rows arrive from the server-side cursor
+    names = np.where(np.arange(len(t)) % 2 == 0, 'A.AI', 'B.AI')
+    half = len(t) // 2
+    chunks = [(t[:half], names[:half], v[:half]), (t[half:], names[half:], v[half:])]
+    out = reduce_chunks(chunks, t[0], t[-1], target, algorithm)
+
+    assert sorted(out) == ['A.AI', 'B.AI']
+    for name, (ts, vs) in out.items():
+        series_t = t[names == name]
+        # Points shared by two kinds (first == min, ...) are kept once
+        assert buckets <= len(ts) == len(vs) <= target
+        assert np.all(np.diff(ts) > 0)
+        if keeps_ends:
+            assert ts[0] == series_t[0] and ts[-1] == series_t[-1]
+    if algorithm == 'lttb':
+        assert all(len(ts) == target for ts, _ in out.values())
+
+
+def test_minmax_keeps_spikes():
+    t = np.arange(1000, dtype=np.float64)
+    v = np.zeros(1000)
+    v[123], v[777] = 50.0, -50.0
+    ts, vs = reduce_chunks([(t, ['X'] * 1000, v)], 0, 999, 20, 'minmax')['X']
+    assert 50.0 in vs and -50.0 in vs
+
+
+def test_series_reducer_fed_row_partitions_matches_reduce_chunks():
+    # The ASGI app folds fetched row partitions one at a time
+    t, v = _sine(3000)
+    names = ['A.AI'] * len(t)
+    rows = list(zip(t.tolist(), names, v.tolist()))
+    reducer = SeriesReducer(t[0], t[-1], 100, 'm4')
+    for i in range(0, len(rows), 700):
+        reducer.add(*chunk_arrays(rows[i:i + 700]))
+    ts, vs = reducer.series()['A.AI']
+    expected_t, expected_v = reduce_chunks([(t, names, v)], t[0], t[-1], 100, 'm4')['A.AI']
+    assert ts.tolist() == expected_t.tolist() and vs.tolist() == expected_v.tolist()
+
+
+def test_series_rows_are_ordered_by_time_then_name():
+    t0, _ = window_bounds(datetime(2024, 1, 1), datetime(2024, 1, 2))
+    series = {'B': (np.array([t0, t0 + 60]), np.array([1.0, 2.0])), 'A': (np.array([t0 + 60]), np.array([3.0]))}
+    assert [(r['mt_time'], r['mt_name']) for r in series_rows(series)] == [
+        ('2024-01-01T00:00:00', 'B'), ('2024-01-01T00:01:00', 'A'), ('2024-01-01T00:01:00', 'B'),
+    ]
+
+
+def test_reduce_chunks_rejects_unknown_algorithm():
+    with pytest.raises(ValueError):
+        reduce_chunks([], 0, 1, 10, 'median')
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, DEFAULT_TARGET_POINTS),
+    ('0', DEFAULT_TARGET_POINTS),
+    (-5, DEFAULT_TARGET_POINTS),
+    ('500', 500),
+    (100_000_000, MAX_TARGET_POINTS),
+])
+def test_clamp_target_points(value, expected):
+    assert clamp_target_points(value) == expected
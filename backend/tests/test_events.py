@@ -0,0 +1,108 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import backend.app
+from backend.app.services.events import EventEngine
+from backend.app.services.locations import Location, MapSensor
+
+T0 = datetime(2024, 1, 1)
+
+
+def _at(minutes):
+    return T0 + timedelta(minutes=minutes)
+
+
+def _watch(*names, limit=600):
+    location = Location(name='Deblin', source='Deblin.sensors.json', mtime=0, sensors=())
+    sensor = MapSensor(idx=5, code='SZ5', name='Valve 5', collector=1, kp=None, kg=2, limit=limit)
+    watched = {name: (location, sensor) for name in names}
+    return watched, {name: sensor for name in names}
+
+
+def test_interval_over_the_limit_becomes_an_event():
+    engine = EventEngine()
+    watched, limits = _watch('KG2.SZ5.I1')
+    open_since = {}
+    events = engine._apply([
+        ('KG2.SZ5.I1', _at(0), True),
+        ('KG2.SZ5.I1', _at(5), False),    # 5 minutes: under the limit
+        ('KG2.SZ5.I1', _at(10), True),
+        ('KG2.SZ5.I1', _at(25), False),   # 15 minutes
+    ], open_since, limits, watched)
+    assert open_since == {}
+    assert [(e['started_at'], e['ended_at'], e['duration_seconds']) for e in events] == [(_at(10), _at(25), 900.0)]
+    assert events[0]['location'] == 'Deblin' and events[0]['limit_seconds'] == 600.0
+
+
+def test_open_interval_is_carried_and_reported_as_ongoing():
+    engine = EventEngine()
+    watched, limits = _watch('KG2.SZ5.I1')
+    open_since = {}
+    # Open, then the channel's last row in the scanned step is still open
+    assert engine._apply([('KG2.SZ5.I1', _at(0), True), ('KG2.SZ5.I1', _at(20), True)],
+                         open_since, limits, watched) == []
+    assert open_since == {'KG2.SZ5.I1': (_at(0), _at(20))}
+    ongoing = engine._ongoing(open_since, limits, watched)
+    assert [(e['started_at'], e['ended_at'], e['duration_seconds']) for e in ongoing] == [(_at(0), None, 1200.0)]
+    # The next step closes it
+    events = engine._apply([('KG2.SZ5.I1', _at(30), False)], open_since, limits, watched)
+    assert [(e['started_at'], e['ended_at']) for e in events] == [(_at(0), _at(30))]
+
+
+def test_ongoing_under_the_limit_is_not_reported():
+    engine = EventEngine()
+    watched, limits = _watch('KG2.SZ5.I1')
+    assert engine._ongoing({'KG2.SZ5.I1': (_at(0), _at(5))}, limits, watched) == []
+
+
+class _Conn:
+    """Answers the few statements refresh_table runs; records the open rows it writes."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, stmt, params=None):
+        sql = str(stmt)
+        if 'MAX(mt_time)' in sql:
+            return SimpleNamespace(scalar=lambda: self.db.upto)
+        if 'SELECT watermark' in sql:
+            return SimpleNamespace(scalar=lambda: self.db.watermark)
+        if 'SELECT mt_name, open_since' in sql:
+            return iter(self.db.open_rows)
+        if 'INSERT INTO' in sql and 'mtrix_event_open' in sql:
+            self.db.open_rows = [(p['n'], p['s'], p['seen']) for p in params]
+        elif 'DELETE FROM' in sql and 'mtrix_event_open' in sql:
+            self.db.open_rows = []
+        elif 'INSERT INTO' in sql and 'mtrix_events' in sql:
+            self.db.events.extend(params)
+        return None
+
+
+class _Engine:
+    def __init__(self):
+        self.upto = _at(60)
+        self.watermark = _at(0)
+        self.events = []
+        # A channel that had an open interval, but whose limit has since been removed
+        self.open_rows = [('KG2.SZ9.I1', _at(-30), _at(0)), ('KG2.SZ5.I1', _at(-20), _at(0))]
+
+    @contextmanager
+    def begin(self):
+        yield _Conn(self)
+
+
+def test_open_rows_of_channels_without_a_limit_are_dropped(monkeypatch):
+    engine = EventEngine()
+    watched, _ = _watch('KG2.SZ5.I1')
+    db = _Engine()
+    monkeypatch.setattr(backend.app, 'db', SimpleNamespace(engine=db))
+    monkeypatch.setattr('backend.app.services.events.locations.channels', lambda table, channel: watched)
+    monkeypatch.setattr(engine, 'ensure_tables', lambda conn: None)
+    monkeypatch.setattr(engine, '_transitions', lambda conn, sensor, names, lo, hi: [('KG2.SZ5.I1', _at(10), False)])
+
+    assert engine.refresh_table('sens01') == 1
+    assert db.open_rows == []
+    assert [(e['mt_name'], e['started_at'], e['ended_at']) for e in db.events] == [('KG2.SZ5.I1', _at(-20), _at(10))]
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from backend.app.services import gaps
+from backend.app.services.gaps import _series_gaps
+from backend.app.services.queries import GapsArgs
+
+START = datetime(2024, 1, 1)
+END = datetime(2024, 1, 2)
+
+
+def _at(minutes):
+    return START + timedelta(minutes=minutes)
+
+
+def test_inner_gap_at_threshold_is_reported():
+    # (name, prev, t, nxt) boundary rows from the LAG/LEAD pass
+    rows = [
+        ('A', None, START, _at(1)),
+        ('A', _at(100), _at(110), _at(111)),   # exactly 10 minutes
+        ('A', _at(200), _at(209), _at(210)),   # 9 minutes: below the threshold
+        ('A', _at(1439), END, None),
+    ]
+    gaps = _series_gaps(rows, START, END, min_gap=600)
+    assert [(g['start'], g['end']) for g in gaps] == [(_at(100), _at(110))]
+    assert gaps[0]['seconds'] == 600
+    assert not gaps[0]['leading'] and not gaps[0]['trailing']
+
+
+def test_leading_and_trailing_gaps_are_clipped_to_the_window():
+    rows = [
+        ('A', None, _at(30), _at(31)),
+        ('A', _at(60), _at(61), None),
+    ]
+    gaps = _series_gaps(rows, START, END, min_gap=600)
+    assert len(gaps) == 2
+    leading, trailing = gaps
+    assert (leading['start'], leading['end'], leading['leading']) == (START, _at(30), True)
+    assert (trailing['start'], trailing['end'], trailing['trailing']) == (_at(61), END, True)
+
+
+def test_short_edges_are_not_gaps():
+    rows = [('A', None, _at(5), None)]
+    assert _series_gaps(rows, START, _at(10), min_gap=600) == []
+
+
+def test_series_are_kept_apart():
+    rows = [
+        ('A', None, START, None),
+        ('B', None, _at(20), None),
+    ]
+    gaps = _series_gaps(rows, START, _at(21), min_gap=600)
+    assert [(g['mt_name'], g['leading'], g['trailing']) for g in gaps] == [('A', False, True), ('B', True, False)]
+
+
+class _Conn:
+    def __init__(self, names):
+        self.names, self.sql = names, []
+
+    def execute(self, stmt, params=None):
+        self.sql.append((str(stmt), params))
+        return [(n,) for n in self.names]
+
+
+def test_distinct_names_skip_scans_the_name_index(sensor_tables, monkeypatch):
+    sensor_tables('sens01', has_name_index=True)
+    monkeypatch.setattr(gaps.rollups, 'watermarks', lambda conn: pytest.fail('no rollup lookup'))
+    conn = _Conn(['B.AI', 'A.AI'])
+    assert gaps.distinct_names(conn, 'sens01') == ['A.AI', 'B.AI']
+    assert 'WITH RECURSIVE' in conn.sql[0][0]
+
+
+def test_distinct_names_reads_the_coarsest_rollup_tier(sensor_tables, monkeypatch):
+    sensor_tables('sens01')
+    watermark = datetime(2024, 1, 30)
+    monkeypatch.setattr(gaps.rollups, 'watermarks',
+                        lambda conn: {('sens01', '1m'): watermark, ('sens01', '1h'): watermark})
+    conn = _Conn(['A.AI'])
+    gaps.distinct_names(conn, 'sens01')
+    sql, params = conn.sql[0]
+    assert '"sens01_rollup_1h"' in sql and params == {'watermark': watermark}
+
+
+def test_distinct_names_falls_back_to_distinct(sensor_tables, monkeypatch):
+    sensor_tables('sens01')
+    monkeypatch.setattr(gaps.rollups, 'watermarks', lambda conn: {})
+    conn = _Conn([])
+    assert gaps.distinct_names(conn, 'sens01') == []
+    assert 'SELECT DISTINCT mt_name' in conn.sql[0][0]
+
+
+def test_gaps_args_deduplicate_sensors():
+    args = GapsArgs.parse(MultiDict([
+        ('sensor', 'sens01'), ('sensor', 'sens00'), ('sensor', 'sens01'),
+        ('start', '2024-01-01T00:00:00'), ('end', '2024-01-02T00:00:00'), ('min_gap', '60'),
+    ]))
+    assert (args.sensors, args.min_gap, args.by) == (['sens01', 'sens00'], 60.0, 'name')
+
+
+@pytest.mark.parametrize('extra', [{'min_gap': '0'}, {'min_gap': 'ten'}, {'by': 'channel'}])
+def test_gaps_args_reject(extra):
+    with pytest.raises(ValueError):
+        GapsArgs.parse(MultiDict({'sensor': 'sens00', 'start': '2024-01-01', 'end': '2024-01-02', **extra}))
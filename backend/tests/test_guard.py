@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+
+from backend.app.services import guard
+from backend.app.services.queries import ByTableArgs
+from backend.app.utils.config import settings
+
+
+@pytest.fixture
+def guarded(monkeypatch, sensor_tables):
+    """sens00 with 3.1M rows over January 2024 (100k/day) and QUERY_MAX_ROWS=500k."""
+    monkeypatch.setattr(settings, 'QUERY_MAX_ROWS', 500_000)
+    monkeypatch.setattr(settings, 'QUERY_GUARD_MODE', 'downsample')
+    sensor_tables('sens00', min_time=datetime(2024, 1, 1), max_time=datetime(2024, 2, 1), approx_rows=3_100_000)
+    plans = []
+
+    def plan_rows(conn, sensor, where_sql, params):
+        plans.append(where_sql)
+        return 2_000_000
+
+    monkeypatch.setattr(guard, 'plan_rows', plan_rows)
+    return plans
+
+
+def test_small_limit_is_not_estimated(guarded):
+    assert guard.check(None, 'sens00', '', {}, None, None, limit=1000) is None
+    assert guarded == []
+
+
+def test_small_window_passes_on_the_catalog_estimate(guarded):
+    found = guard.check(None, 'sens00', 'WHERE ...', {}, datetime(2024, 1, 1), datetime(2024, 1, 3))
+    assert found is None
+    assert guarded == []
+
+
+def test_large_window_asks_the_planner_and_downsamples(guarded):
+    found = guard.check(None, 'sens00', 'WHERE mt_time >= :start', {}, datetime(2024, 1, 1), None)
+    assert found.rows == 2_000_000 and found.source == 'plan'
+    assert found.headers() == {'X-Query-Guard': 'downsampled', 'X-Estimated-Rows': '2000000'}
+    assert guarded == ['WHERE mt_time >= :start']
+
+
+def test_reject_mode_and_paging_raise(guarded, monkeypatch):
+    with pytest.raises(guard.QueryTooLarge) as info:
+        guard.check(None, 'sens00', '', {}, None, None, paging=True)
+    assert info.value.estimate.rows == 2_000_000
+    monkeypatch.setattr(settings, 'QUERY_GUARD_MODE', 'reject')
+    with pytest.raises(guard.QueryTooLarge):
+        guard.check(None, 'sens00', '', {}, None, None)
+
+
+def test_guard_off(guarded, monkeypatch):
+    monkeypatch.setattr(settings, 'QUERY_MAX_ROWS', 0)
+    assert guard.check(None, 'sens00', '', {}, None, None) is None
+
+
+def test_guard_by_table_switches_to_buckets(guarded):
+    args = ByTableArgs.parse({'sensor': 'sens00', 'limit': '10000000'})
+    found = guard.guard_by_table(None, args)
+    assert found is not None
+    assert args.downsample and args.algorithm is None
+    assert args.target_points == guard.TARGET_POINTS
+    assert (args.start, args.end) == (datetime(2024, 1, 1), datetime(2024, 2, 1))
+    assert args.params == {'start': args.start, 'end': args.end}
+
+
+def test_by_table_args_reject_negative_limit(sensor_tables):
+    with pytest.raises(ValueError):
+        ByTableArgs.parse({'sensor': 'sens00', 'limit': '-1'})
@@ -0,0 +1,67 @@
+import io
+from datetime import datetime
+
+import pytest
+
+from backend.app.services import ingest
+
+
+def _blocks(data, fmt, **kwargs):
+    return [(table, columns, copy_format, list(lines))
+            for table, columns, copy_format, lines in ingest.read_blocks(io.StringIO(data), fmt, **kwargs)]
+
+
+def test_csv_records_keep_quoted_newlines_in_one_chunk():
+    data = 'mt_time,mt_name,mt_value\n2024-01-01 00:00:00,A.AI,"two\nlines"\n\n2024-01-01 00:01:00,B.AI,3\n'
+    [(table, columns, copy_format, lines)] = _blocks(data, 'csv')
+    assert (table, columns, copy_format) == (None, ['mt_time', 'mt_name', 'mt_value'], 'csv')
+    assert lines == ['2024-01-01 00:00:00,A.AI,"two\nlines"\n', '2024-01-01 00:01:00,B.AI,3\n']
+
+
+@pytest.mark.parametrize('header', ['mt_value,mt_time\n', 'mt_name,mt_time,mt_name\n', 'mt_name,mt_time,extra\n'])
+def test_csv_header_must_name_the_key_columns(header):
+    with pytest.raises(ValueError):
+        _blocks(header, 'csv')
+
+
+def test_dump_blocks_stop_at_the_terminator():
+    data = (
+        '-- PostgreSQL database dump\n'
+        'COPY public.sens01 (mt_name, mt_time, mt_value, mt_quality) FROM stdin;\n'
+        'A.AI\t2024-01-01 00:00:00\t1\tG\n'
+        '\\.\n'
+        'SELECT 1;\n'
+        'COPY "sens02" (mt_name, mt_time) FROM stdin;\n'
+        'B.AI\t2024-01-02 00:00:00\n'
+        '\\.\n'
+    )
+    blocks = _blocks(data, 'dump')
+    assert [(b[0], b[3]) for b in blocks] == [
+        ('sens01', ['A.AI\t2024-01-01 00:00:00\t1\tG\n']),
+        ('sens02', ['B.AI\t2024-01-02 00:00:00\n']),
+    ]
+    assert [c.strip() for c in blocks[0][1]] == list(ingest.COLUMNS)
+
+
+def test_batches_skip_blank_lines_and_keep_the_remainder():
+    lines = ['a\n', '\n', 'b\n', 'c\n', '  \n', 'd\n', 'e\n']
+    assert list(ingest._batches(lines, 2)) == [['a\n', 'b\n'], ['c\n', 'd\n'], ['e\n']]
+
+
+def test_detect_format(tmp_path):
+    (tmp_path / 'a.csv').write_text('')
+    (tmp_path / 'b').write_text('mt_name,mt_time\n')
+    (tmp_path / 'c').write_text('-- dump\n')
+    (tmp_path / 'd').write_text('A.AI\t2024-01-01\n')
+    assert [ingest.detect_format(str(tmp_path / n)) for n in 'a.csv b c d'.split()] == ['csv', 'csv', 'dump', 'text']
+
+
+def test_stats_merge_keeps_the_loaded_range():
+    a = ingest.IngestStats('sens01')
+    a.add(10, 8, datetime(2024, 1, 5), datetime(2024, 1, 6))
+    b = ingest.IngestStats('sens01')
+    b.add(5, 5, datetime(2024, 1, 1), datetime(2024, 1, 2))
+    b.add(5, 0, None, None)
+    a.merge(b)
+    assert (a.rows, a.inserted, a.skipped, a.batches) == (20, 13, 7, 3)
+    assert (a.min_time, a.max_time) == (datetime(2024, 1, 1), datetime(2024, 1, 6))
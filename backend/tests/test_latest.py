@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+
+from backend.app import db
+from backend.app.services.catalog import catalog
+from backend.app.services.latest import LastValueCache
+
+
+class _Conn:
+    """Seed queries answer from `seed[table]`, incremental ones from `updates`."""
+
+    def __init__(self, seed, updates=()):
+        self.seed = seed
+        self.updates = list(updates)
+        self.sql = []
+
+    def execute(self, q, params=None):
+        sql = str(q)
+        self.sql.append((sql, params))
+        if ':t0' in sql:
+            return iter(self.updates)
+        table = next(t for t in self.seed if f'"{t}"' in sql)
+        return _Rows(self.seed[table])
+
+
+class _Rows(list):
+    def all(self):
+        return list(self)
+
+
+class _Engine:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @contextmanager
+    def connect(self):
+        yield self.conn
+
+
+@pytest.fixture
+def cache(monkeypatch, sensor_tables):
+    sensor_tables('sens00', has_name_index=True)
+    sensor_tables('sens01')
+    conn = _Conn({
+        'sens00': [('A', datetime(2024, 1, 1, 12), '1.5', 'G'), ('B', datetime(2024, 1, 1, 11), '7', 'G')],
+        'sens01': [],
+    })
+    monkeypatch.setattr(type(db), 'engine', _Engine(conn), raising=False)
+    cache = LastValueCache()
+    cache.conn = conn
+    return cache
+
+
+def test_seed_uses_a_skip_scan_when_mt_name_is_indexed(cache):
+    cache.refresh()
+    seeds = [sql for sql, _ in cache.conn.sql]
+    assert 'WITH RECURSIVE' in seeds[0] and 'sens00' in seeds[0]
+    assert 'DISTINCT ON' in seeds[1] and 'sens01' in seeds[1]
+    assert cache.values('sens00') == {
+        'A': (datetime(2024, 1, 1, 12), '1.5', 'G'),
+        'B': (datetime(2024, 1, 1, 11), '7', 'G'),
+    }
+
+
+def test_incremental_refresh_reads_past_the_watermark(cache):
+    cache.refresh()
+    cache.conn.sql.clear()
+    cache.conn.updates = [
+        ('sens00', 'A', datetime(2024, 1, 1, 13), '2.5', 'G'),
+        ('sens00', 'C', datetime(2024, 1, 1, 13), '0', 'B'),
+    ]
+    cache.refresh()
+    # The empty table is seeded again; the seeded one is read in one batched statement
+    (reseed, _), (batch, params) = cache.conn.sql
+    assert params == {'t0': 'sens00', 's0': datetime(2024, 1, 1, 12)}
+    assert '"sens01"' in reseed
+    assert cache.values('sens00')['A'] == (datetime(2024, 1, 1, 13), '2.5', 'G')
+    assert [r[2] for r in cache.rows(['sens00'])] == ['A', 'B', 'C']
+
+
+def test_older_rows_do_not_replace_newer_values(cache):
+    cache.refresh()
+    cache._merge('sens00', [('A', datetime(2024, 1, 1, 10), 'old', 'G')])
+    assert cache.values('sens00')['A'][1] == '1.5'
+
+
+def test_tables_leaving_the_catalog_are_dropped(cache):
+    cache.refresh()
+    catalog._tables.pop('sens00')
+    cache.refresh()
+    assert cache.snapshot() == []
+
+
+def test_snapshot_rows(cache):
+    cache.refresh()
+    assert cache.snapshot(['sens00'])[0] == {
+        'table': 'sens00', 'mt_name': 'A', 'mt_time': '2024-01-01T12:00:00', 'mt_value': '1.5', 'mt_quality': 'G',
+    }
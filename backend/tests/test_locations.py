@@ -0,0 +1,88 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from backend.app.services import locations as locations_module
+from backend.app.services.locations import LocationRegistry, MapSensor, NameIndex
+
+T = datetime(2024, 1, 1, 12)
+
+VALUES = {
+    'sens01': {
+        'KG2.SZ5.AI': (T, '4.2', 'G'),
+        'KG2.SZ5.I1': (datetime(2024, 1, 1, 11), '1', 'G'),
+        'KG1.SZ5.AI': (T, '9.9', 'G'),
+        'SZ7.AI': (T, '0.5', 'B'),
+    },
+    'sens03': {'KG1.SZ1.AI': (T, '3', 'G')},
+}
+
+
+def _sensor(idx, code, collector=1, kg=None):
+    return {'idx': idx, 'code': code, 'name': f'Point {idx}', 'collector': collector, 'kp': 1, 'kg': kg, 'limit': 5}
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    (tmp_path / 'Deblin.sensors.json').write_text(json.dumps({'sensors': [
+        _sensor(1, 'SZ05', kg=2), _sensor(2, 'SZ7', kg=3), _sensor(3, 'SZ9'),
+    ]}))
+    (tmp_path / 'Wolica.sensors.json').write_text(json.dumps({'sensors': [_sensor(1, 'SZ1', collector=1, kg=1)]}))
+    (tmp_path / 'notes.json').write_text('{}')
+    monkeypatch.setattr(locations_module.settings, 'LOCATIONS_DIR', str(tmp_path), raising=False)
+    monkeypatch.setattr(locations_module.settings, 'LOCATION_TABLES', 'wolica:sens03', raising=False)
+    monkeypatch.setattr(locations_module.latest_values, 'values', lambda table: dict(VALUES.get(table, {})))
+    registry = LocationRegistry()
+    return registry
+
+
+def test_manifests_are_listed_by_name(registry):
+    assert [loc.name for loc in registry.locations()] == ['Deblin', 'Wolica']
+    assert registry.get('deblin').sensors[0] == MapSensor(
+        idx=1, code='SZ05', name='Point 1', collector=1, kp=1, kg=2, limit=5,
+    )
+    assert registry.get('Suchodoly') is None
+
+
+def test_unchanged_manifest_is_not_parsed_again(registry, monkeypatch):
+    first = registry.get('Deblin')
+    loads = []
+    monkeypatch.setattr(registry, '_load', lambda path, mtime: loads.append(path) or first)
+    assert registry.get('Deblin') is first and loads == []
+    path = registry.directory / 'Deblin.sensors.json'
+    os.utime(path, (first.mtime + 10, first.mtime + 10))
+    registry.get('Deblin')
+    assert loads == [path]
+
+
+def test_name_index_matches_code_and_kg():
+    index = NameIndex(list(VALUES['sens01']))
+    assert index.names_for(MapSensor(1, 'SZ05', '', 1, None, 2, None)) == ['KG2.SZ5.AI', 'KG2.SZ5.I1']
+    # Names without a KG token match on the code alone
+    assert index.names_for(MapSensor(2, 'SZ7', '', 1, None, 3, None)) == ['SZ7.AI']
+    assert index.names_for(MapSensor(3, 'SZ9', '', 1, None, None, None)) == []
+
+
+def test_status_reports_the_newest_channel(registry):
+    status = registry.status(registry.get('Deblin'))
+    first, second, missing = status['sensors']
+    assert (first['table'], first['value'], first['time']) == ('sens01', '4.2', T.isoformat())
+    assert sorted(first['channels']) == ['AI', 'I1']
+    assert (second['value'], second['quality']) == ('0.5', 'B')
+    assert missing['channels'] == {} and missing['value'] is None and missing['age_seconds'] is None
+    assert status['matched'] == 2
+
+
+def test_location_tables_override_the_collector_table(registry):
+    status = registry.status(registry.get('Wolica'))
+    assert status['sensors'][0]['table'] == 'sens03'
+    assert status['sensors'][0]['value'] == '3'
+
+
+def test_channels_of_a_table(registry):
+    out = registry.channels('sens01', 'ai')
+    assert sorted(out) == ['KG2.SZ5.AI', 'SZ7.AI']
+    location, sensor = out['SZ7.AI']
+    assert (location.name, sensor.idx) == ('Deblin', 2)
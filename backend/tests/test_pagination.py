@@ -0,0 +1,40 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from backend.app.services.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_condition
+
+
+@pytest.mark.parametrize('mt_time, mt_name', [
+    (datetime(2024, 3, 1, 12, 30), 'KG2.SZ5.AI'),
+    (datetime(2024, 3, 1, 12, 30, 0, 123456), 'name with spaces/ünïcode'),
+    (datetime(1999, 12, 31, 23, 59, 59), ''),
+])
+def test_cursor_round_trip(mt_time, mt_name):
+    cursor = encode_cursor(mt_time, mt_name)
+    assert '=' not in cursor and '+' not in cursor and '/' not in cursor
+    assert decode_cursor(cursor) == (mt_time, mt_name)
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor!',
+    base64.urlsafe_b64encode(b'{"a": 1}').decode(),
+    base64.urlsafe_b64encode(json.dumps(['yesterday', 'X']).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps(['2024-01-01T00:00:00']).encode()).decode(),
+    encode_cursor(datetime(2024, 1, 1), 'X')[:-3],
+])
+def test_tampered_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_invalid_cursor_is_a_value_error():
+    # ByTableArgs.parse turns ValueErrors into 400s
+    assert issubclass(InvalidCursor, ValueError)
+
+
+def test_keyset_condition_direction():
+    assert '(mt_time, mt_name) > (:cursor_time, :cursor_name)' in keyset_condition('asc')
+    assert '(mt_time, mt_name) < (:cursor_time, :cursor_name)' in keyset_condition('desc')
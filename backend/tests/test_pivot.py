@@ -0,0 +1,61 @@
+import math
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from backend.app.services.pivot import iso_times, nullable, pivot
+from backend.app.services.queries import PivotArgs
+
+ROWS = [
+    (0.0, 'KG1.SZ1.AI', 1.0),
+    (0.0, 'KG1.SZ1.I1', 0.0),
+    (60.0, 'KG1.SZ1.AI', 2.0),
+    (60.0, 'KG2.SZ1.AI', 3.0),
+    (120.0, 'KG1.SZ1.I1', 1.0),
+]
+
+
+def test_pivot_by_channel_layout():
+    times, columns, grid = pivot(ROWS, 'channel')
+    assert times.tolist() == [0.0, 60.0, 120.0]
+    assert columns == ['AI', 'I1']
+    assert grid.shape == (3, 2)
+    # Two mt_names share AI at 60s: the last one in mt_name order wins
+    assert nullable(grid) == [[1.0, 0.0], [3.0, None], [None, 1.0]]
+
+
+def test_pivot_by_name_layout():
+    times, columns, grid = pivot(ROWS, 'name')
+    assert columns == ['KG1.SZ1.AI', 'KG1.SZ1.I1', 'KG2.SZ1.AI']
+    assert grid.shape == (3, 3)
+    assert grid[1].tolist()[0] == 2.0 and grid[1].tolist()[2] == 3.0
+    assert math.isnan(grid[0, 2])
+
+
+def test_pivot_empty():
+    times, columns, grid = pivot([], 'channel')
+    assert len(times) == 0 and columns == [] and grid.shape == (0, 0)
+
+
+def test_iso_times_match_isoformat():
+    assert iso_times(pivot(ROWS)[0]) == ['1970-01-01T00:00:00', '1970-01-01T00:01:00', '1970-01-01T00:02:00']
+    assert iso_times(pivot([(0.5, 'X', 1.0)])[0]) == ['1970-01-01T00:00:00.500000']
+
+
+def test_pivot_args_parse():
+    args = PivotArgs.parse(MultiDict([
+        ('sensor', 'sens00'), ('start', '2024-01-01T00:00:00'), ('end', '2024-01-02T00:00:00'),
+        ('by', 'NAME'), ('name', 'A'), ('name', 'B'), ('compact', '1'),
+    ]))
+    assert (args.sensor, args.by, args.names, args.compact) == ('sens00', 'name', ['A', 'B'], True)
+
+
+@pytest.mark.parametrize('query', [
+    {'sensor': 'users', 'start': '2024-01-01', 'end': '2024-01-02'},
+    {'sensor': 'sens00', 'start': '2024-01-01'},
+    {'sensor': 'sens00', 'start': 'yesterday', 'end': '2024-01-02'},
+    {'sensor': 'sens00', 'start': '2024-01-01', 'end': '2024-01-02', 'by': 'table'},
+])
+def test_pivot_args_reject(query):
+    with pytest.raises(ValueError):
+        PivotArgs.parse(MultiDict(query))
@@ -0,0 +1,153 @@
+import asyncio
+import json
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from backend.app import db
+from backend.app.sockets import realtime
+from backend.app.sockets.realtime import AsyncSubscription, RealtimeHub, Subscription, _OVERFLOW, _QUEUE_SIZE
+
+T = datetime(2024, 1, 1, 12)
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+
+class _Conn:
+    """Newest row is (T, 'B'); polls answer `batches` in turn."""
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.polls = []
+
+    def execute(self, q, params=None):
+        if params is None:
+            return _Result([(T, 'B')])
+        self.polls.append(params)
+        return _Result(self.batches.pop(0) if self.batches else [])
+
+
+class _Engine:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @contextmanager
+    def connect(self):
+        yield self.conn
+
+
+def _quiet_init(init):
+    """Pollers whose thread the test drives itself."""
+
+    def wrapped(self, hub, table):
+        init(self, hub, table)
+        self.thread.start = lambda: None
+
+    return wrapped
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    monkeypatch.setattr(realtime._TablePoller, '__init__', _quiet_init(realtime._TablePoller.__init__))
+    hub = RealtimeHub()
+    hub.init_app(Flask(__name__))
+    return hub
+
+
+def test_subscription_overflow_ends_with_the_marker():
+    sub = Subscription(['sens00'])
+    for i in range(_QUEUE_SIZE + 5):
+        sub.deliver(i)
+    items = [sub.queue.get_nowait() for _ in range(sub.queue.qsize())]
+    assert sub.overflowed
+    assert len(items) == _QUEUE_SIZE and items[-1] is _OVERFLOW
+    sub.deliver('late')
+    assert sub.queue.empty()
+
+
+def test_one_poller_per_table_however_many_subscribers(hub):
+    a = hub.subscribe(['sens00', 'sens01'])
+    b = hub.subscribe(['sens00'])
+    assert hub.stats() == {'sens00': 2, 'sens01': 1}
+    hub.unsubscribe(a)
+    assert hub.stats() == {'sens00': 1, 'sens01': 0}
+    assert hub.pollers['sens00'].subscribers == {b}
+
+
+def test_poller_fans_out_rows_past_the_watermark_and_stops(hub, monkeypatch):
+    monkeypatch.setattr(realtime.settings, 'REALTIME_POLL_SECONDS', 0, raising=False)
+    conn = _Conn([[(T, 'C', '1.5', 'G'), (datetime(2024, 1, 1, 12, 1), 'A', None, None)]])
+    monkeypatch.setattr(type(db), 'engine', _Engine(conn), raising=False)
+    a, b = hub.subscribe(['sens00']), hub.subscribe(['sens00'])
+    poller = hub.pollers['sens00']
+    # Both clients leave once the first batch arrived
+    deliver = Subscription.deliver
+    for sub in (a, b):
+        sub.deliver = lambda message, sub=sub: (deliver(sub, message), hub.unsubscribe(sub))
+
+    poller._run()
+
+    assert conn.polls[0] == {'cursor_time': T, 'cursor_name': 'B', 'limit': realtime._POLL_LIMIT}
+    assert poller.watermark == (datetime(2024, 1, 1, 12, 1), 'A')
+    message = a.queue.get_nowait()
+    assert b.queue.get_nowait() == message
+    assert json.loads(message) == {'sensor': 'sens00', 'rows': [
+        {'mt_time': '2024-01-01T12:00:00', 'mt_name': 'C', 'mt_value': '1.5', 'mt_quality': 'G'},
+        {'mt_time': '2024-01-01T12:01:00', 'mt_name': 'A', 'mt_value': None, 'mt_quality': None},
+    ]}
+    assert 'sens00' not in hub.pollers
+
+
+def test_async_subscription_receives_messages_from_a_poller_thread():
+    async def main():
+        sub = AsyncSubscription(['sens00'], asyncio.get_running_loop())
+        await asyncio.to_thread(sub.deliver, {'table': 'sens00', 'rows': []})
+        return await asyncio.wait_for(sub.queue.get(), 1)
+
+    assert asyncio.run(main()) == {'table': 'sens00', 'rows': []}
+
+
+def test_async_subscription_overflow_ends_with_the_marker():
+    async def main():
+        sub = AsyncSubscription(['sens00'], asyncio.get_running_loop())
+        for i in range(_QUEUE_SIZE + 5):
+            sub.deliver(i)
+        await asyncio.sleep(0)
+        items = [sub.queue.get_nowait() for _ in range(sub.queue.qsize())]
+        return sub, items
+
+    sub, items = asyncio.run(main())
+    assert sub.overflowed
+    assert len(items) == _QUEUE_SIZE and items[-1] is _OVERFLOW
+
+
+def test_async_subscription_after_the_loop_closed_is_a_no_op():
+    loop = asyncio.new_event_loop()
+    sub = AsyncSubscription(['sens00'], loop)
+    loop.close()
+    sub.deliver({'table': 'sens00'})
+    assert sub.queue.empty()
+
+
+def test_check_tables(sensor_tables):
+    sensor_tables('sens00')
+    assert realtime.check_tables(['sens00']) is None
+    assert realtime.check_tables([])[1] == 400
+    assert realtime.check_tables(['users'])[1] == 400
+    assert realtime.check_tables(['sens00', 'sens07']) == ('Unknown sensor table(s): sens07', 404)
+
+
+def test_event_text():
+    assert realtime.event('{"table":"sens00"}') == 'event: rows\ndata: {"table":"sens00"}\n\n'
+    assert realtime.event(_OVERFLOW).startswith('event: overflow\n')
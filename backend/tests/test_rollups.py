@@ -0,0 +1,110 @@
+from datetime import datetime
+
+import pytest
+
+from backend.app.services import rollups as rollups_module
+from backend.app.services.rollups import RollupEngine, _floor, rollup_table
+
+WATERMARK = datetime(2024, 1, 20, 12, 30)
+
+
+class _Result:
+    def __init__(self, rows=(), scalar=None):
+        self.rows = list(rows)
+        self._scalar = scalar
+
+    def scalar(self):
+        return self._scalar
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class _Conn:
+    """Records statements; answers the state table lookups from `state` rows."""
+
+    def __init__(self, state=None):
+        self.state = state
+        self.sql = []
+
+    def execute(self, q, params=None):
+        sql = str(q)
+        self.sql.append((sql, params or {}))
+        if 'to_regclass' in sql:
+            return _Result(scalar=self.state is not None)
+        if 'SELECT table_name, tier, watermark' in sql:
+            return _Result(self.state)
+        return _Result()
+
+
+@pytest.fixture
+def engine():
+    return RollupEngine()
+
+
+def test_floor_snaps_to_the_bucket_start():
+    assert _floor(datetime(2024, 1, 20, 12, 34, 56), 60) == datetime(2024, 1, 20, 12, 34)
+    assert _floor(datetime(2024, 1, 20, 12, 34, 56), 86400) == datetime(2024, 1, 20)
+    assert rollup_table('sens00', '1h') == 'sens00_rollup_1h'
+
+
+@pytest.mark.parametrize('bucket, expected', [
+    (30, None),                  # finer than every tier
+    (60, '1m'),
+    (3599, '1m'),
+    (7200, '1h'),
+    (86400 * 7, '1d'),
+])
+def test_pick_tier_is_the_coarsest_tier_within_the_bucket(engine, bucket, expected):
+    conn = _Conn([('sens00', tier, WATERMARK) for tier in ('1m', '1h', '1d')])
+    picked = engine.pick_tier(conn, 'sens00', bucket)
+    assert (picked[0] if picked else None) == expected
+
+
+def test_pick_tier_skips_tiers_not_built_for_the_table(engine):
+    conn = _Conn([('sens00', '1m', WATERMARK), ('sens01', '1d', WATERMARK), ('sens00', '1h', None)])
+    assert engine.pick_tier(conn, 'sens00', 86400) == ('1m', 60, WATERMARK)
+    assert engine.pick_tier(conn, 'sens02', 86400) is None
+
+
+def test_watermarks_without_state_table(engine):
+    assert engine.watermarks(_Conn(None)) == {}
+
+
+def test_watermarks_are_cached_until_a_rewind(engine):
+    conn = _Conn([('sens00', '1h', WATERMARK)])
+    assert engine.watermarks(conn) == {('sens00', '1h'): WATERMARK}
+    conn.state = []
+    assert engine.watermarks(conn) == {('sens00', '1h'): WATERMARK}
+
+    engine.rewind(conn, 'sens00', datetime(2024, 1, 1))
+    update = [(sql, params) for sql, params in conn.sql if sql.lstrip().startswith('UPDATE')]
+    assert len(update) == 1
+    # Only moves watermarks back, never forward
+    assert 'watermark > :since' in update[0][0]
+    assert update[0][1] == {'t': 'sens00', 'since': datetime(2024, 1, 1)}
+    assert engine.watermarks(conn) == {}
+
+
+def test_query_buckets_aligns_to_the_tier_width(engine, monkeypatch):
+    monkeypatch.setattr(rollups_module, 'value_sql', lambda sensor: 'mt_value::double precision')
+    conn = _Conn([('sens00', '1h', WATERMARK)])
+    engine.query_buckets(conn, 'sens00', datetime(2024, 1, 1, 0, 20), datetime(2024, 1, 20), 5400, 100)
+    params = conn.sql[-1][1]
+    assert params['bucket'] == 3600
+    assert params['max_buckets'] == 150          # same time span at the narrower bucket
+    assert params['start_floor'] == datetime(2024, 1, 1)
+    assert params['cutoff'] == datetime(2024, 1, 20, 12)
+
+
+def test_query_buckets_without_rolled_up_history(engine):
+    conn = _Conn([('sens00', '1h', WATERMARK)])
+    # The window starts after the tier's watermark: nothing to read from it
+    assert engine.query_buckets(conn, 'sens00', datetime(2024, 1, 21), datetime(2024, 1, 22), 3600, 100) is None
+    assert engine.query_buckets(conn, 'sens00', datetime(2024, 1, 1), datetime(2024, 1, 2), 30, 100) is None
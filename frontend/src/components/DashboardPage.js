@@ -3,7 +3,6 @@ import axios from 'axios';
 import DashboardLayout from '../layout/DashboardLayout';
 import FilterDrawerContent from './FilterDrawerContent';
 import SensorDataDashboard from './SensorDataDashboard';
-import { pivotSensorData } from '../utils/pivotSensorData';
 
 
 function groupDataBySensorType(rows) {
@@ -34,12 +33,16 @@ export default function DashboardPage() {
     if (sensorType) url += `sensor_type=${encodeURIComponent(sensorType)}`;
     // Make request
     axios.get(url)
-      .then(res => setData(res.data))
+      .then(res => setData(
+        // Oversized requests come back as AVG buckets (X-Query-Guard: downsampled)
+        res.headers['x-query-guard'] === 'downsampled'
+          ? res.data.map(b => ({ mt_name: b.mt_name, mt_value: b.avg, mt_time: b.bucket_start }))
+          : res.data
+      ))
       .catch(err => console.error(err));
   };
 
   const groupedData = groupDataBySensorType(data);
-  const pivotedData = pivotSensorData(data);
 
   // Drawer content
   const drawerContent = (
@@ -55,7 +58,6 @@ export default function DashboardPage() {
   const mainContent = (
     <SensorDataDashboard
       groupedData={groupedData}
-      pivotedData={pivotedData}
     />
   );
 
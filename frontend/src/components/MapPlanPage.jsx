@@ -3,6 +3,7 @@ import { Box, Button, Typography, Slider, FormControl, InputLabel, Select, MenuI
 import ArrowBackIosNewIcon from "@mui/icons-material/ArrowBackIosNew";
 import { Link, useLocation, useNavigate } from "react-router-dom";
 import DashboardLayout from "../layout/DashboardLayout";
+import { fetchLocationStatus, fetchSensorDataBatch } from "../services/api";
 import dataUrl from "../maps/data.ini";
 import catalog from "../maps/catalog.json";
 
@@ -72,6 +73,28 @@ function parseIni(text) {
   return out;
 }
 
+// Newest row per sensor code from batch results; rows are newest first, mt_names like KG2.SZ5.AI
+function latestByCode(sensors, results) {
+  const token = (t)=> String(t||'').replace(/\s+/g,'').toUpperCase().replace(/(\D)0+(?=\d)/g,'$1');
+  const byCode = {};
+  (results||[]).forEach(res=>{
+    if (!res || !res.data) return;
+    const table = res.sensor;
+    const candidates = sensors.filter(s=> `sens${String(s.collector).padStart(2,'0')}` === table);
+    for (const row of (res.data.rows||[])){
+      const tokens = String(row.mt_name||'').split('.').slice(0, -1).map(token);
+      const kg = tokens.find(t=> t.startsWith('KG'));
+      for (const s of candidates){
+        const key = String(s.code||'').toUpperCase();
+        if (byCode[key] || !tokens.includes(token(s.code))) continue;
+        if (kg && s.kg != null && kg !== `KG${s.kg}`) continue;
+        byCode[key] = { code: s.code, value: row.mt_value, time: row.mt_time, mt_name: row.mt_name };
+      }
+    }
+  });
+  return byCode;
+}
+
 function polyLength(pts) {
   let L = 0; for (let i=1;i<pts.length;i++){ const dx=pts[i][0]-pts[i-1][0]; const dy=pts[i][1]-pts[i-1][1]; L += Math.hypot(dx,dy);} return L;
 }
@@ -177,7 +200,7 @@ function stitchSegments(segments, distance=12, angleDeg=35){
   return segs;
 }
 
-function PlanSvg({ plan, width=1024, height=600, strokeWidth=6, glow=false, showOverlay=false, overlayOpacity=0.25, svgRef, activePairKey=null, activeGroupIndex=null, labelBaseDist=18, labelRings=4, inlineLabels=false, overrideViewBox=null, onPointerMove=null, suppressHover=false }){
+function PlanSvg({ plan, width=1024, height=600, strokeWidth=6, glow=false, showOverlay=false, overlayOpacity=0.25, svgRef, activePairKey=null, activeGroupIndex=null, labelBaseDist=18, labelRings=4, inlineLabels=false, overrideViewBox=null, onPointerMove=null, suppressHover=false, statusByCode=null }){
   const [hover, setHover] = React.useState(null); // {x,y,label,groupName,code}
   const [hoverData, setHoverData] = React.useState({ loading:false, value:null, time:null, placeholder:false });
   const [scale, setScale] = React.useState(1);
@@ -190,38 +213,26 @@ function PlanSvg({ plan, width=1024, height=600, strokeWidth=6, glow=false, show
     }catch(_e){}
   }, [svgRef, width, height, plan]);
 
-  // Fetch latest sample for hovered sensor (only for demo sensors 1/2/3 to avoid heavy queries)
+  // Latest sample for the hovered sensor, from the values the page loaded
   React.useEffect(()=>{
     let alive = true;
     async function load(){
       try{
         if (!hover || !hover.code) { if (alive) setHoverData({ loading:false, value:null, time:null, placeholder:false }); return; }
         const code = String(hover.code || '').toUpperCase();
-        const m = code.match(/^SZ\s*([0-9]+)$/);
-        const n = m ? m[1] : String(hover.label||'');
-        if (!['1','2','3'].includes(n)) { if (alive) setHoverData({ loading:false, value:null, time:null, placeholder:true }); return; }
-        const now = new Date();
-        const start = new Date(now.getTime() - 7*24*3600*1000).toISOString();
-        const end = now.toISOString();
-        const name = `SZ${n}`;
-        if (alive) setHoverData({ loading:true, value:null, time:null, placeholder:false });
-        const url = `/api/sensor-data/filtered?sensor_type=${encodeURIComponent(name)}&start=${encodeURIComponent(start)}&end=${encodeURIComponent(end)}`;
-        const r = await fetch(url);
-        if (!r.ok) { if (alive) setHoverData({ loading:false, value:null, time:null, placeholder:true }); return; }
-        const arr = await r.json();
-        // pick the newest by mt_time
-        let latest = null;
-        for (const it of arr){ if (it.mt_time && (!latest || new Date(it.mt_time) > new Date(latest.mt_time))) latest = it; }
-        if (alive){
-          if (latest){ setHoverData({ loading:false, value: latest.mt_value, time: latest.mt_time, placeholder:false }); }
-          else { setHoverData({ loading:false, value:null, time:null, placeholder:true }); }
+        // Latest values are loaded by the page: no request per hover
+        if (statusByCode){
+          const st = statusByCode[code];
+          if (alive) setHoverData({ loading:false, value: st?.value ?? null, time: st?.time ?? null, placeholder: !st?.time });
+          return;
         }
+        if (alive) setHoverData({ loading:false, value:null, time:null, placeholder:true });
       }catch(_e){ if (alive) setHoverData({ loading:false, value:null, time:null, placeholder:true }); }
     }
     // small debounce
     const t = setTimeout(load, 120);
     return ()=>{ alive=false; clearTimeout(t); };
-  }, [hover]);
+  }, [hover, statusByCode]);
   const fallback = ["#e74c3c","#2ecc71","#40c4ff","#ffd740","#ab47bc","#ff9100","#69f0ae","#ff8a80","#82b1ff","#ffff00"];
   // Improved label layout: place along polyline normal, avoid overlaps and keep clearance from paths
   const layoutLabels = (lines)=>{
@@ -499,6 +510,7 @@ export default function MapPlanPage(){
 
   const svgRef = useRef(null);
   const [raw, setRaw] = useState(null); // grouped lines JSON
+  const [statusByCode, setStatusByCode] = useState(null); // latest value per sensor code (/api/locations/<map>/status)
   const [sensors, setSensors] = useState([]);
   const [sensorsSource, setSensorsSource] = useState('auto');
   const [manualPairMap, setManualPairMap] = useState(null); // optional { pairs: { "kp|kg": "groupName" } }
@@ -534,6 +546,43 @@ export default function MapPlanPage(){
     return ()=>{ alive=false };
   },[mapKey]);
 
+  // Live values for every sensor on the map in one request, refreshed every 30 s
+  useEffect(()=>{
+    let alive = true;
+    if (mapKey === 'map') { setStatusByCode(null); return; }
+    const load = ()=> fetchLocationStatus(mapKey).then(st=>{
+      if (!alive) return;
+      const byCode = {};
+      (st.sensors||[]).forEach(s=>{
+        const key = String(s.code||'').toUpperCase();
+        if (!byCode[key] || (!byCode[key].time && s.time)) byCode[key] = s;
+      });
+      setStatusByCode(byCode);
+    }).catch(()=>{ if (alive) setStatusByCode(null); });
+    load();
+    const timer = setInterval(load, 30000);
+    return ()=>{ alive=false; clearInterval(timer); };
+  },[mapKey]);
+
+  // Base map has no location manifest on the backend: newest rows of all its sensor tables in one batch request
+  useEffect(()=>{
+    let alive = true;
+    if (mapKey !== 'map' || !sensors.length) return;
+    const load = ()=>{
+      const tables = Array.from(new Set(sensors.map(s=> `sens${String(s.collector).padStart(2,'0')}`)));
+      const end = new Date();
+      const start = new Date(end.getTime() - 7*24*3600*1000);
+      const specs = tables.map(sensor=> ({ sensor, start: start.toISOString(), end: end.toISOString(), order: 'desc', limit: 1000 }));
+      fetchSensorDataBatch(specs).then(results=>{
+        if (!alive) return;
+        setStatusByCode(latestByCode(sensors, results));
+      }).catch(()=>{ if (alive) setStatusByCode(null); });
+    };
+    load();
+    const timer = setInterval(load, 30000);
+    return ()=>{ alive=false; clearInterval(timer); };
+  },[mapKey, sensors]);
+
   // Try load optional manual pair map: <map>.pairmap.json
   useEffect(()=>{
     let alive=true;
@@ -1076,7 +1125,7 @@ export default function MapPlanPage(){
   const mainContent = (
     <Box sx={{ position:'relative', width:'100%', height:'calc(100vh - 12px)', overflow:'hidden' }}>
       <PlanSvg svgRef={svgRef} plan={plan} width={plan.width} height={plan.height} strokeWidth={strokeWidth} glow={glow} showOverlay={overlayBase} overlayOpacity={overlayOpacity} activePairKey={activePairKey} activeGroupIndex={focusGroup} labelBaseDist={labelBaseDist} labelRings={labelRings} inlineLabels={inlineLabels}
-               onPointerMove={(p)=> { if (lensOn) setLensPos(p); }} />
+               statusByCode={statusByCode} onPointerMove={(p)=> { if (lensOn) setLensPos(p); }} />
       {lensOn && (
         <Box sx={{ position:'absolute', left: Math.max(0, lensPos.clientX - lensSize/2), top: Math.max(0, lensPos.clientY - lensSize/2), width:lensSize, height:lensSize, border:'2px solid #90a4ae', borderRadius:1, boxShadow:3, overflow:'hidden', bgcolor:'#1e1f22' }}
              onWheel={(e)=>{
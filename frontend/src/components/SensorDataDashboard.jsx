@@ -7,7 +7,7 @@ import SensorDataGraph from "./SensorDataGraph";
 const PREFERRED_ORDER = ["I1", "Analog", "AI21", "AI22"];
 const COLORS = ["#1976d2", "#dc004e", "#388e3c", "#f57c00", "#9c27b0", "#00acc1", "#8d6e63"];
 
-export default function SensorDataDashboard({ groupedData = {}, pivotedData }) {
+export default function SensorDataDashboard({ groupedData = {} }) {
   const keys = Object.keys(groupedData || {});
   if (!keys.length) {
     return (
@@ -39,7 +39,7 @@ export default function SensorDataDashboard({ groupedData = {}, pivotedData }) {
         ))}
       </Grid>
 
-      {/* if you want a table below, render it here with your SensorDataTable + pivotedData */}
+      {/* for a table below, render SensorDataTable with fetchSensorPivot(table, start, end) */}
     </Box>
   );
 }
@@ -1,10 +1,11 @@
 // src/components/SensorDataTable.jsx
 import React from 'react';
 
+// Renders the response of fetchSensorPivot: { columns: ['mt_time', ...], rows: [[...], ...] }
 function SensorDataTable({ data }) {
-  // Hardcode headers based on the pivoted data structure
-  const headers = ['mt_time', 'I1', 'Analog', 'AI21', 'AI22'];
-  
+  const headers = data?.columns || [];
+  const rows = data?.rows || [];
+
   return (
     <div style={{ padding: '20px' }}>
       <h2>Sensor Data</h2>
@@ -17,10 +18,10 @@ function SensorDataTable({ data }) {
           </tr>
         </thead>
         <tbody>
-          {data.map(row => (
-            <tr key={row.mt_time}>
-              {headers.map(header => (
-                <td key={header}>{row[header] || '-'}</td>
+          {rows.map(row => (
+            <tr key={row[0]}>
+              {headers.map((header, i) => (
+                <td key={header}>{row[i] ?? '-'}</td>
               ))}
             </tr>
           ))}
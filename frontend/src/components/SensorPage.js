@@ -3,7 +3,6 @@ import { useParams, Link } from "react-router-dom";
 import DashboardLayout from "../layout/DashboardLayout";
 import FilterDrawerContent from "./FilterDrawerContent";
 import SensorDataDashboard from "./SensorDataDashboard";
-import { pivotSensorData } from "../utils/pivotSensorData";
 import { fetchSensorDataByTable, fetchSensorRange } from "../services/api";
 import { Button } from "@mui/material";
 import ArrowBackIosNewIcon from "@mui/icons-material/ArrowBackIosNew";
@@ -39,7 +38,7 @@ export default function SensorPage() {
   const [data, setData] = useState([]);
   const [loading, setLoading] = useState(false);
   const [err, setErr] = useState("");
-  const [nextAfter, setNextAfter] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
   const [usingDownsample, setUsingDownsample] = useState(false);
   const [latest, setLatest] = useState(null);
   const [activeQuick, setActiveQuick] = useState(null);
@@ -71,7 +70,7 @@ export default function SensorPage() {
           mt_quality: null,
         }));
         setData(rows);
-        setNextAfter(null);
+        setNextCursor(null);
       } else {
         const resp = await fetchSensorDataByTable(table, {
           start: useStart,
@@ -81,7 +80,7 @@ export default function SensorPage() {
         });
         const rows = Array.isArray(resp) ? resp : resp.rows || [];
         setData(rows);
-        setNextAfter(Array.isArray(resp) ? null : resp.next_after || null);
+        setNextCursor(Array.isArray(resp) ? null : resp.next_cursor || null);
       }
       // derive active quick after loading
       setActiveQuick(deriveActiveQuick(latest, startTime, endTime));
@@ -121,10 +120,9 @@ export default function SensorPage() {
   }, [table]);
 
   const groupedData = groupDataBySensorType(data);
-  const pivotedData = pivotSensorData(data);
 
   const loadMore = async () => {
-    if (usingDownsample || !nextAfter) return;
+    if (usingDownsample || !nextCursor) return;
     setLoading(true);
     setErr("");
     try {
@@ -133,11 +131,11 @@ export default function SensorPage() {
         end: endTime,
         order: "asc",
         limit: PAGE_SIZE,
-        after: nextAfter,
+        cursor: nextCursor,
       });
       const rows = Array.isArray(resp) ? resp : resp.rows || [];
       setData((prev) => [...prev, ...rows]);
-      setNextAfter(Array.isArray(resp) ? null : resp.next_after || null);
+      setNextCursor(Array.isArray(resp) ? null : resp.next_cursor || null);
     } catch (e) {
       setErr(String(e));
     } finally {
@@ -236,8 +234,8 @@ export default function SensorPage() {
         <div style={{ color: "#e7e7e7" }}>Loading…</div>
       ) : (
         <>
-          <SensorDataDashboard groupedData={groupedData} pivotedData={pivotedData} />
-          {!usingDownsample && nextAfter && (
+          <SensorDataDashboard groupedData={groupedData} />
+          {!usingDownsample && nextCursor && (
             <div style={{ marginTop: 8 }}>
               <Button onClick={loadMore} variant="contained" size="small">
                 Load more data ({PAGE_SIZE} rows)
@@ -1,3 +1,5 @@
+import { decodeColumns } from "../utils/decodeColumns";
+
 // axios is unused; rely on fetch for now
 
 // export async function getSensorData() {
@@ -26,8 +28,63 @@ export async function fetchSensorRange(table) {
   return res.json(); // { min_time, max_time, approx_rows }
 }
 
+// Latest value of every mt_name across all (or the given) sensXX tables
+export async function fetchSensorSnapshot(tables = []) {
+  const params = new URLSearchParams();
+  tables.forEach((t) => params.append("sensor", t));
+  const res = await fetch(`/api/sensor-data/snapshot?` + params.toString());
+  if (!res.ok) throw new Error("Failed to fetch sensor snapshot");
+  return res.json(); // { generated_at, values: [{ table, mt_name, mt_time, mt_value, mt_quality }, ...] }
+}
+
+// Current value/quality/age of every sensor on a map (<name>.sensors.json), in one call
+export async function fetchLocationStatus(name) {
+  const res = await fetch(`/api/locations/${encodeURIComponent(name)}/status`);
+  if (!res.ok) throw new Error("Failed to fetch location status");
+  return res.json(); // { location, generated_at, matched, sensors: [{ idx, code, kg, value, quality, time, age_seconds, channels }, ...] }
+}
+
+// Valve open-time limit violations (newest first); filters: { sensor, location, name, start, end, open, limit }
+export async function fetchEvents(filters = {}) {
+  const params = new URLSearchParams();
+  Object.entries(filters).forEach(([k, v]) => {
+    if (v === undefined || v === null || v === "") return;
+    (Array.isArray(v) ? v : [v]).forEach((item) => params.append(k, item));
+  });
+  const res = await fetch(`/api/events?${params.toString()}`);
+  if (!res.ok) throw new Error("Failed to fetch events");
+  return res.json(); // { events: [{ mt_name, location, code, started_at, ended_at, duration_seconds, limit_seconds, ... }], watermarks }
+}
+
+// Intervals without readings longer than minGap seconds, for one or more tables (sensor: "sens00" or ["sens00", ...])
+export async function fetchSensorGaps(sensor, start, end, { minGap, by, names } = {}) {
+  const params = new URLSearchParams({ start, end });
+  (Array.isArray(sensor) ? sensor : [sensor]).forEach((s) => params.append("sensor", s));
+  if (minGap) params.set("min_gap", String(minGap));
+  if (by) params.set("by", by);
+  (names || []).forEach((n) => params.append("name", n));
+  const res = await fetch(`/api/sensor-data/gaps?${params.toString()}`);
+  if (!res.ok) throw new Error("Failed to fetch sensor gaps");
+  return res.json(); // { min_gap, by, tables: { sens00: { source, gaps: [{ mt_name, start, end, seconds, leading, trailing }], total_seconds, truncated } } }
+}
+
+// One row per mt_time, one column per channel (last mt_name segment), pivoted server-side
+// options: { by: 'channel' | 'name', names: [mt_name, ...] }
+export async function fetchSensorPivot(table, start, end, options = {}) {
+  const { by, names = [] } = options;
+  const params = new URLSearchParams({ sensor: table, start, end });
+  if (by) params.set("by", by);
+  names.forEach((n) => params.append("name", n));
+  const res = await fetch(`/api/sensor-data/pivot?` + params.toString());
+  if (!res.ok) throw new Error("Failed to fetch pivoted sensor data");
+  return res.json(); // { columns: ["mt_time", ...], rows: [[mt_time, value, ...], ...], truncated }
+}
+
 // Flexible by-table fetch; supports raw pagination and downsample
-// options: { start, end, limit, offset, order, after, before, downsample, target_points }
+// options: { start, end, limit, offset, order, after, before, cursor, downsample, target_points, algorithm, compact }
+// cursor: pass the previous page's next_cursor (preferred over offset/after)
+// algorithm: 'lttb' | 'minmax' | 'm4' returns shape-preserving { mt_time, mt_name, mt_value } points
+// compact: returns parallel arrays { t (epoch ms), n, v, q, ... } instead of one object per row
 export async function fetchSensorDataByTable(table, options = {}) {
   const {
     start,
@@ -37,8 +94,11 @@ export async function fetchSensorDataByTable(table, options = {}) {
     order,
     after,
     before,
+    cursor,
     downsample,
     target_points,
+    algorithm,
+    compact,
   } = options;
 
   const params = new URLSearchParams({ sensor: table, limit });
@@ -48,8 +108,11 @@ export async function fetchSensorDataByTable(table, options = {}) {
   if (order) params.set("order", order);
   if (after) params.set("after", after);
   if (before) params.set("before", before);
+  if (cursor) params.set("cursor", cursor);
   if (downsample) params.set("downsample", String(downsample));
   if (target_points) params.set("target_points", String(target_points));
+  if (algorithm) params.set("algorithm", algorithm);
+  if (compact) params.set("compact", "1");
 
   const res = await fetch(`/api/sensor-data/by-table?` + params.toString());
   if (!res.ok) throw new Error("Failed to fetch sensor data");
@@ -59,3 +122,58 @@ export async function fetchSensorDataByTable(table, options = {}) {
 export async function fetchSensorDataByTableDownsample(table, opts = {}) {
   return fetchSensorDataByTable(table, { ...opts, downsample: true });
 }
+
+// Same as fetchSensorDataByTable but asks for packed column buffers
+// (see utils/decodeColumns.js) instead of one JSON object per row
+export async function fetchSensorColumnsByTable(table, options = {}) {
+  const { start, end, limit = 1000, order, after, before, cursor, downsample, target_points, algorithm } = options;
+  const params = new URLSearchParams({ sensor: table, limit });
+  if (start) params.set("start", start);
+  if (end) params.set("end", end);
+  if (order) params.set("order", order);
+  if (after) params.set("after", after);
+  if (before) params.set("before", before);
+  if (cursor) params.set("cursor", cursor);
+  if (downsample) params.set("downsample", String(downsample));
+  if (target_points) params.set("target_points", String(target_points));
+  if (algorithm) params.set("algorithm", algorithm);
+
+  const res = await fetch(`/api/sensor-data/by-table?` + params.toString(), {
+    headers: { Accept: "application/vnd.mtrix.columns" },
+  });
+  if (!res.ok) throw new Error("Failed to fetch sensor data");
+  return decodeColumns(await res.arrayBuffer());
+}
+
+// Many sensors in one round trip. specs: [{ sensor, start, end, downsample, target_points, algorithm, limit }]
+// Resolves to results in spec order: [{ index, sensor, data } | { index, sensor, error }]
+export async function fetchSensorDataBatch(specs) {
+  const res = await fetch("/api/sensor-data/batch", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ queries: specs }),
+  });
+  if (!res.ok) throw new Error("Failed to fetch sensor data batch");
+  const text = await res.text();
+  const results = new Array(specs.length);
+  text.split("\n").forEach((line) => {
+    if (!line) return;
+    const item = JSON.parse(line);
+    results[item.index] = item;
+  });
+  return results;
+}
+
+// Live rows pushed by the backend (Server-Sent Events) instead of polling.
+// onRows({ sensor, rows }) is called for every batch; returns an unsubscribe function.
+export function subscribeSensorStream(tables, onRows, onOverflow) {
+  const params = new URLSearchParams();
+  tables.forEach((t) => params.append("sensor", t));
+  const source = new EventSource(`/api/stream?` + params.toString());
+  source.addEventListener("rows", (e) => onRows(JSON.parse(e.data)));
+  source.addEventListener("overflow", () => {
+    // Server dropped us for falling behind; callers should re-sync via by-table
+    if (onOverflow) onOverflow();
+  });
+  return () => source.close();
+}
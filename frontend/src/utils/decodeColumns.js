@@ -0,0 +1,27 @@
+// src/utils/decodeColumns.js
+// Decode the packed columnar layout (Accept: application/vnd.mtrix.columns):
+// 'MTC1' | uint32 LE header length | header JSON | 8-byte aligned column buffers.
+// Returns { rows, meta, columns: { name: TypedArray | string[] } }; timestamp
+// columns stay as epoch-millisecond Float64Arrays (cheap to feed to charts).
+export function decodeColumns(buffer) {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic !== "MTC1") throw new Error("Not a columnar payload");
+  const headerLen = view.getUint32(4, true);
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLen)));
+  const base = 8 + headerLen;
+  const columns = {};
+  header.columns.forEach((col) => {
+    const offset = base + col.offset;
+    if (col.type === "float64") {
+      columns[col.name] = new Float64Array(buffer, offset, col.length / 8);
+    } else if (col.type === "int64") {
+      const ints = new BigInt64Array(buffer, offset, col.length / 8);
+      columns[col.name] = Float64Array.from(ints, Number);
+    } else if (col.type === "dict32") {
+      const codes = new Uint32Array(buffer, offset, col.length / 4);
+      columns[col.name] = Array.from(codes, (c) => col.dictionary[c]);
+    }
+  });
+  return { rows: header.rows, meta: header.meta, columns };
+}
@@ -15,8 +15,13 @@ const python = resolvePython();
 const isWin = process.platform === "win32";
 const port = process.env.BACKEND_PORT || process.env.PORT || "5000";
 
-// Prefer Waitress on Windows, Gunicorn on POSIX
-const args = isWin
+// BACKEND_SERVER=asgi serves the hot read endpoints on asyncpg via Uvicorn
+// (see backend/app/asgi.py); otherwise prefer Waitress on Windows, Gunicorn on POSIX
+const server = (process.env.BACKEND_SERVER || "").toLowerCase();
+const isAsgi = server === "asgi";
+const args = isAsgi
+  ? ["-m", "uvicorn", "asgi:app", "--host", "0.0.0.0", "--port", port]
+  : isWin
   ? ["-m", "waitress", "--host=0.0.0.0", `--port=${port}`, "main:app"]
   : ["-m", "gunicorn", "-b", `0.0.0.0:${port}`, "main:app"];
 
@@ -24,10 +29,13 @@ const child = spawn(python, args, { stdio: "inherit", env: process.env });
 child.on("exit", (code) => process.exit(code ?? 0));
 child.on("error", (err) => {
   console.error("Failed to start production server:", err?.message || err);
+  const pkgs = isAsgi
+    ? (isWin ? "-r backend\\requirements-asgi.txt" : "-r backend/requirements-asgi.txt")
+    : isWin ? "waitress" : "gunicorn";
   console.error(
     isWin
-      ? "Install with: .\\.venv\\Scripts\\pip install waitress"
-      : "Install with: ./.venv/bin/pip install gunicorn"
+      ? `Install with: .\\.venv\\Scripts\\pip install ${pkgs}`
+      : `Install with: ./.venv/bin/pip install ${pkgs}`
   );
   process.exit(1);
 });